@@ -0,0 +1,85 @@
+"""Measures memory used by memory history storage to keep 1M deals, compared to storing deals as dicts. Run from the
+repository root: python -m benchmarks.historyMemory"""
+import asyncio
+import gc
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from lib.metaApi.historyItemsMemoryStorage import HistoryItemsMemoryStorage
+from lib.metaApi.historyRecord import HistoryRecord
+from lib.metaApi.memoryHistoryStorage import MemoryHistoryStorage
+import pytz
+
+deal_count = 1000000
+
+
+def create_deals():
+    start_time = datetime(2020, 1, 1, tzinfo=pytz.utc)
+    symbols = ['EURUSD', 'GBPUSD', 'USDJPY', 'AUDNZD', 'XAUUSD']
+    for i in range(deal_count):
+        yield {
+            'id': str(100000000 + i), 'platform': 'mt5', 'type': 'DEAL_TYPE_BUY' if i % 2 else 'DEAL_TYPE_SELL',
+            'time': start_time + timedelta(seconds=i * 30), 'brokerTime': '2020-01-01 02:00:00.000',
+            'commission': -0.07, 'entryType': 'DEAL_ENTRY_IN' if i % 2 else 'DEAL_ENTRY_OUT',
+            # symbols are parsed from json packets, so each deal has its own string object
+            'symbol': ''.join(list(symbols[i % len(symbols)])), 'magic': 1000, 'orderId': str(100000000 + i),
+            'positionId': str(100000000 + i // 2), 'reason': 'DEAL_REASON_EXPERT', 'volume': 0.01,
+            'price': 1.12345, 'profit': 1.5, 'swap': 0, 'comment': 'comment', 'brokerComment': 'comment',
+            'accountCurrencyExchangeRate': 1
+        }
+
+
+def measure(name, load):
+    gc.collect()
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    result = load()
+    duration = time.perf_counter() - start_time
+    gc.collect()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f'{name}: {memory / 1024 / 1024:.0f} MB, {memory / deal_count:.0f} bytes per deal, '
+          f'loaded in {duration:.1f} s')
+    return result
+
+
+def load_dicts():
+    deals = list(create_deals())
+    by_time = HistoryItemsMemoryStorage(lambda deal: (deal['time'].timestamp(), int(deal['id'])), 'time')
+    by_time.insert_many(map(lambda deal: ((deal['time'], deal['id'], deal['entryType']), deal), deals))
+    return by_time
+
+
+def load_records():
+    deals = map(HistoryRecord, create_deals())
+    by_time = HistoryItemsMemoryStorage(lambda deal: (deal['time'].timestamp(), int(deal['id'])), 'time')
+    by_time.insert_many(map(lambda deal: ((deal['time'], deal['id'], deal['entryType']), deal), deals))
+    return by_time
+
+
+def load_storage():
+    storage = MemoryHistoryStorage()
+    deals = list(create_deals())
+    asyncio.run(storage.initialize('benchmarkAccountId', 'MetaApi'))
+    storage._add_existing_deals(deals)
+    del deals
+    return storage
+
+
+def main():
+    dicts = measure('dicts in time index', load_dicts)
+    del dicts
+    records = measure('compact records in time index', load_records)
+    del records
+    storage = measure('memory history storage', load_storage)
+    durations = []
+    for i in range(5):
+        start_time = time.perf_counter()
+        deals = storage.get_deals_by_time_range(datetime(2020, 1, 1, tzinfo=pytz.utc),
+                                                datetime(2020, 1, 2, tzinfo=pytz.utc))
+        durations.append(time.perf_counter() - start_time)
+    print(f'converted {len(deals)} deals of a day to dicts in {min(durations) * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
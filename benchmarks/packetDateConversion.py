@@ -0,0 +1,68 @@
+"""Measures conversion of ISO date strings in websocket packets. Run from the repository root:
+python -m benchmarks.packetDateConversion"""
+import re
+import timeit
+from copy import deepcopy
+import iso8601
+from lib.clients.metaApi.packetDateConverter import convert_packet_dates
+
+
+def legacy_convert_iso_time_to_date(packet):
+    if not isinstance(packet, str):
+        for field in packet:
+            value = packet[field]
+            if isinstance(value, str) and re.search('time|Time', field) and not \
+                    re.search('brokerTime|BrokerTime|timeframe', field):
+                packet[field] = iso8601.parse_date(value)
+            if isinstance(value, list):
+                for item in value:
+                    legacy_convert_iso_time_to_date(item)
+            if isinstance(value, dict):
+                legacy_convert_iso_time_to_date(value)
+        if packet and 'timestamps' in packet:
+            for field in packet['timestamps']:
+                packet['timestamps'][field] = iso8601.parse_date(packet['timestamps'][field])
+        if packet and 'type' in packet and packet['type'] == 'prices':
+            if 'prices' in packet:
+                for price in packet['prices']:
+                    if 'timestamps' in price:
+                        for field in price['timestamps']:
+                            if isinstance(price['timestamps'][field], str):
+                                price['timestamps'][field] = iso8601.parse_date(price['timestamps'][field])
+
+
+def create_packets():
+    specifications = [{
+        'symbol': f'SYMBOL{i}', 'tickSize': 0.00001, 'minVolume': 0.01, 'maxVolume': 200, 'volumeStep': 0.01,
+        'digits': 5, 'contractSize': 100000, 'startTime': '2020-04-15T02:45:06.521Z',
+        'expirationTime': '2030-04-15T02:45:06.521Z', 'executionMode': 'SYMBOL_TRADE_EXECUTION_MARKET',
+        'tradeSessions': {'MONDAY': [{'from': '00:00', 'to': '23:59'}]}
+    } for i in range(1000)]
+    prices = [{
+        'symbol': f'SYMBOL{i}', 'bid': 1.0839, 'ask': 1.08397, 'profitTickValue': 1, 'lossTickValue': 1,
+        'time': '2020-04-15T02:45:06.521Z', 'brokerTime': '2020-04-15 05:45:06.521',
+        'timestamps': {'eventGenerated': '2020-04-15T02:45:06.521Z'}
+    } for i in range(100)]
+    return {
+        'specifications': {'type': 'specifications', 'accountId': 'accountId', 'specifications': specifications},
+        'prices': {'type': 'prices', 'accountId': 'accountId', 'prices': prices, 'equity': 100,
+                   'timestamps': {'eventGenerated': '2020-04-15T02:45:06.521Z'}}
+    }
+
+
+def measure(convert, packet, number):
+    copies = [deepcopy(packet) for i in range(number)]
+    iterator = iter(copies)
+    return timeit.timeit(lambda: convert(next(iterator)), number=number) / number
+
+
+def main():
+    for name, packet in create_packets().items():
+        legacy = measure(legacy_convert_iso_time_to_date, packet, 20)
+        current = measure(convert_packet_dates, packet, 20)
+        print(f'{name}: legacy {legacy * 1000:.2f} ms, current {current * 1000:.2f} ms, '
+              f'speedup {legacy / current:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
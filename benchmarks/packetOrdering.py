@@ -0,0 +1,124 @@
+"""Measures restoring order of shuffled synchronization packet streams, e.g. after a reconnect of many instances.
+Run from the repository root: python -m benchmarks.packetOrdering"""
+import random
+import time
+from datetime import datetime
+from typing import Dict, List
+from lib.clients.metaApi.packetOrderer import PacketOrderer
+
+
+class LegacyPacketOrderer(PacketOrderer):
+    """Packet orderer with the former wait list which was re-sorted on every out-of-order packet and drained with
+    pop(0)."""
+
+    def restore_order(self, packet: Dict) -> List[Dict]:
+        instance_id = packet['accountId'] + ':' + str(packet['instanceIndex'] if 'instanceIndex' in packet else 0) + \
+            ':' + (packet['host'] if 'host' in packet else '0')
+        if 'sequenceNumber' not in packet:
+            return [packet]
+        if packet['type'] == 'synchronizationStarted' and 'synchronizationId' in packet and (
+                instance_id not in self._lastSessionStartTimestamp or self._lastSessionStartTimestamp[instance_id] <
+                packet['sequenceTimestamp']):
+            # synchronization packet sequence just started
+            self._isOutOfOrderEmitted[instance_id] = False
+            self._sequenceNumberByInstance[instance_id] = packet['sequenceNumber']
+            self._lastSessionStartTimestamp[instance_id] = packet['sequenceTimestamp']
+            self._packetsByInstance[instance_id] = \
+                list(filter(lambda wait_packet: wait_packet['packet']['sequenceTimestamp'] >=
+                            packet['sequenceTimestamp'],
+                            (self._packetsByInstance[instance_id] if instance_id in
+                             self._packetsByInstance else [])))
+            return [packet] + self._find_next_packets_from_wait_list(instance_id)
+        elif instance_id in self._lastSessionStartTimestamp and \
+                packet['sequenceTimestamp'] < self._lastSessionStartTimestamp[instance_id]:
+            # filter out previous packets
+            return []
+        elif instance_id in self._sequenceNumberByInstance and \
+                packet['sequenceNumber'] == self._sequenceNumberByInstance[instance_id]:
+            # let the duplicate s/n packet to pass through
+            return [packet]
+        elif instance_id in self._sequenceNumberByInstance and \
+                packet['sequenceNumber'] == self._sequenceNumberByInstance[instance_id] + 1:
+            # in-order packet was received
+            self._sequenceNumberByInstance[instance_id] += 1
+            self._lastSessionStartTimestamp[instance_id] = packet['sequenceTimestamp'] if 'sequenceTimestamp' \
+                in packet else self._lastSessionStartTimestamp[instance_id]
+            return [packet] + self._find_next_packets_from_wait_list(instance_id)
+        else:
+            # out-of-order packet was received, add it to the wait list
+            self._packetsByInstance[instance_id] = self._packetsByInstance[instance_id] \
+                if instance_id in self._packetsByInstance else []
+            wait_list = self._packetsByInstance[instance_id]
+            wait_list.append({
+                'instanceId': instance_id,
+                'accountId': packet['accountId'],
+                'instanceIndex': packet['instanceIndex'] if 'instanceIndex' in packet else 0,
+                'sequenceNumber': packet['sequenceNumber'],
+                'packet': packet,
+                'receivedAt': datetime.now()
+            })
+            wait_list.sort(key=lambda i: i['sequenceNumber'])
+            while len(wait_list) > self._waitListSizeLimit:
+                wait_list.pop(0)
+            return []
+
+    def _find_next_packets_from_wait_list(self, instance_id) -> List:
+        result = []
+        wait_list = self._packetsByInstance[instance_id] if instance_id in self._packetsByInstance else []
+        while len(wait_list) and (wait_list[0]['sequenceNumber'] in [
+                self._sequenceNumberByInstance[instance_id], self._sequenceNumberByInstance[instance_id] + 1] or
+                wait_list[0]['packet']['sequenceTimestamp'] < self._lastSessionStartTimestamp[instance_id]):
+            if wait_list[0]['packet']['sequenceTimestamp'] >= self._lastSessionStartTimestamp[instance_id]:
+                result.append(wait_list[0]['packet'])
+                if wait_list[0]['packet']['sequenceNumber'] == self._sequenceNumberByInstance[instance_id] + 1:
+                    self._sequenceNumberByInstance[instance_id] += 1
+                    self._lastSessionStartTimestamp[instance_id] = wait_list[0]['packet']['sequenceTimestamp'] if \
+                        'sequenceTimestamp' in wait_list[0]['packet'] else self._lastSessionStartTimestamp[instance_id]
+            wait_list.pop(0)
+        if not len(wait_list) and instance_id in self._packetsByInstance:
+            del self._packetsByInstance[instance_id]
+        return result
+
+
+def create_streams(instance_count, packet_count):
+    streams = []
+    for i in range(instance_count):
+        common_fields = {'accountId': f'accountId{i}', 'instanceIndex': 0, 'host': 'ps-mpa-1'}
+        start_packet = {**common_fields, 'type': 'synchronizationStarted', 'synchronizationId': 'synchronizationId',
+                        'sequenceNumber': 0, 'sequenceTimestamp': 1603124267178}
+        packets = [{**common_fields, 'type': 'prices', 'sequenceNumber': j,
+                    'sequenceTimestamp': 1603124267178 + j} for j in range(1, packet_count)]
+        random.shuffle(packets)
+        streams.append([start_packet] + packets)
+    # packets of different instances arrive interleaved
+    return [packet for packets in zip(*streams) for packet in packets]
+
+
+def measure(orderer_class, packets, wait_list_size):
+    orderer = orderer_class(None, 60)
+    orderer._waitListSizeLimit = wait_list_size
+    start_time = time.perf_counter()
+    restored_count = 0
+    for packet in packets:
+        restored_count += len(orderer.restore_order(packet))
+    duration = time.perf_counter() - start_time
+    assert restored_count == len(packets)
+    return duration
+
+
+def main():
+    random.seed(0)
+    for instance_count, packet_count in [(100, 100), (10, 1000), (1, 10000)]:
+        packets = create_streams(instance_count, packet_count)
+        current = measure(PacketOrderer, packets, packet_count)
+        line = f'{instance_count} instances, {packet_count} shuffled packets each: ' \
+            f'{current / len(packets) * 1000000:.1f} us per packet'
+        if packet_count <= 1000:
+            legacy = measure(LegacyPacketOrderer, packets, packet_count)
+            line += f', sorted list wait list {legacy / len(packets) * 1000000:.1f} us per packet, ' \
+                f'speedup {legacy / current:.1f}x'
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Measures processing of recorded packets by terminal state and history storage, replaying packets through the
+websocket client without network. Replays a recording of the account if account id and optionally replay speed are
+specified, otherwise records and replays a synthetic stream. Run from the repository root:
+python -m benchmarks.packetReplay [accountId [speed]]"""
+import asyncio
+import glob
+import os
+import sys
+from lib.clients.metaApi.metaApiWebsocket_client import MetaApiWebsocketClient
+from lib.clients.metaApi.packetLogger import PacketLogger
+from lib.clients.metaApi.packetReplayer import PacketReplayer
+from lib.metaApi.memoryHistoryStorage import MemoryHistoryStorage
+from lib.metaApi.terminalState import TerminalState
+
+account_id = 'packetReplayBenchmark'
+packet_count = 20000
+symbols = ['EURUSD', 'GBPUSD', 'USDJPY', 'AUDNZD', 'XAUUSD']
+
+
+async def record(packet_logger: PacketLogger):
+    common_fields = {'accountId': account_id, 'instanceIndex': 0, 'host': 'ps-mpa-1'}
+    sequence_timestamp = 1603124267178
+    packets = [
+        {**common_fields, 'type': 'synchronizationStarted', 'synchronizationId': 'synchronizationId',
+         'sequenceNumber': 1, 'sequenceTimestamp': sequence_timestamp},
+        {**common_fields, 'type': 'accountInformation', 'synchronizationId': 'synchronizationId',
+         'sequenceNumber': 2, 'sequenceTimestamp': sequence_timestamp,
+         'accountInformation': {'platform': 'mt5', 'broker': 'Broker', 'currency': 'USD', 'server': 'Broker-Demo',
+                                'balance': 10000, 'equity': 10000, 'margin': 0, 'freeMargin': 10000,
+                                'leverage': 100}},
+        {**common_fields, 'type': 'positions', 'synchronizationId': 'synchronizationId', 'sequenceNumber': 3,
+         'sequenceTimestamp': sequence_timestamp, 'positions': [{
+             'id': str(i), 'type': 'POSITION_TYPE_BUY', 'symbol': symbols[i % len(symbols)], 'magic': 0,
+             'time': '2020-04-15T02:45:06.521Z', 'updateTime': '2020-04-15T02:45:06.521Z', 'openPrice': 1.1,
+             'currentPrice': 1.1, 'currentTickValue': 1, 'volume': 0.01, 'swap': 0, 'profit': 0, 'commission': 0
+         } for i in range(100)]}
+    ]
+    for i in range(4, packet_count):
+        packets.append({**common_fields, 'type': 'prices', 'sequenceNumber': i,
+                        'sequenceTimestamp': sequence_timestamp + i, 'equity': 10000 + i % 100 / 10, 'prices': [{
+                            'symbol': symbol, 'bid': 1.1 + i % 100 / 100000, 'ask': 1.1001 + i % 100 / 100000,
+                            'profitTickValue': 1, 'lossTickValue': 1, 'time': '2020-04-15T02:45:06.521Z',
+                            'brokerTime': '2020-04-15 05:45:06.521'} for symbol in symbols]})
+        if i % 100 == 0:
+            packets.append({**common_fields, 'type': 'deals', 'sequenceNumber': i, 'sequenceTimestamp':
+                            sequence_timestamp + i, 'deals': [{
+                                'id': str(i), 'type': 'DEAL_TYPE_BUY', 'entryType': 'DEAL_ENTRY_IN',
+                                'symbol': symbols[i % len(symbols)], 'magic': 0, 'time': '2020-04-15T02:45:06.521Z',
+                                'volume': 0.01, 'price': 1.1, 'commission': 0, 'swap': 0, 'profit': 0,
+                                'positionId': str(i), 'orderId': str(i)}]})
+    for i, packet in enumerate(packets):
+        packet_logger.log_packet(packet)
+        if i % 1000 == 0:
+            await packet_logger._append_logs()
+    await packet_logger._append_logs()
+
+
+async def main():
+    recorded_account_id = sys.argv[1] if len(sys.argv) > 1 else None
+    speed = float(sys.argv[2]) if len(sys.argv) > 2 else None
+    packet_logger = PacketLogger({'recordPrices': True})
+    packet_logger.start()
+    if not recorded_account_id:
+        await record(packet_logger)
+    client = MetaApiWebsocketClient(None, 'token', {'application': 'MetaApi', 'disableInternalJobs': True})
+    replayed_account_id = recorded_account_id or account_id
+    listeners = [TerminalState(replayed_account_id, None), MemoryHistoryStorage()]
+    try:
+        stats = await PacketReplayer(client, packet_logger).replay(replayed_account_id, listeners, speed=speed)
+    finally:
+        packet_logger.stop()
+        await client.close()
+        client._latencyService.stop()
+        if not recorded_account_id:
+            for file_path in glob.glob(f'./.metaapi/logs/*/{account_id}.*'):
+                os.remove(file_path)
+    print(f'{stats["packets"]} packets replayed in {stats["durationInSeconds"]:.2f} seconds, '
+          f'{stats["packetsPerSecond"]:.0f} packets per second, {stats["skippedPackets"]} packets skipped, '
+          f'max delay {stats["maxDelayInSeconds"] * 1000:.1f} ms')
+    for name, listener_stats in stats['listeners'].items():
+        print(f'{name}: {listener_stats["events"]} events, average {listener_stats["averageInMs"]:.3f} ms, '
+              f'p99 {listener_stats["p99InMs"]:.3f} ms, max {listener_stats["maxInMs"]:.3f} ms')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,29 @@
+"""Measures encoding of terminal data used for terminal state hashes. Run from the repository root:
+python -m benchmarks.terminalDataEncoding"""
+import timeit
+from lib.metaApi.models import G1Encoder, G2Encoder, encode_g1, encode_g2
+
+
+def create_specifications():
+    return [{
+        'symbol': f'SYMBOL{i}', 'tickSize': 0.00001, 'minVolume': 0.01, 'maxVolume': 200.0, 'volumeStep': 0.01,
+        'contractSize': 100000.0, 'digits': 5, 'exchange': '', 'executionMode': 'SYMBOL_TRADE_EXECUTION_MARKET',
+        'fillingModes': ['SYMBOL_FILLING_FOK', 'SYMBOL_FILLING_IOC'], 'hedgedMarginUsesLargerLeg': False,
+        'path': f'Forex\\Majors/SYMBOL{i}', 'swapLong': -0.5, 'swapShort': 0.25, 'tradeMode': 'SYMBOL_TRADE_MODE_FULL',
+        'tradeSessions': {'MONDAY': [{'from': '00:00', 'to': '23:59'}], 'TUESDAY': [{'from': '00:00', 'to': '23:59'}]}
+    } for i in range(1000)]
+
+
+def main():
+    specifications = create_specifications()
+    for name, encoder_class, encode in [('g1', G1Encoder, encode_g1), ('g2', G2Encoder, encode_g2)]:
+        assert encode(specifications) == ''.join(encoder_class(ensure_ascii=False).iterencode(specifications))
+        legacy = timeit.timeit(lambda: ''.join(encoder_class(ensure_ascii=False).iterencode(specifications)),
+                               number=20) / 20
+        current = timeit.timeit(lambda: encode(specifications), number=20) / 20
+        print(f'{name} 1000 specifications: generator encoder {legacy * 1000:.2f} ms, '
+              f'single-pass encoder {current * 1000:.2f} ms, speedup {legacy / current:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
 from .metaApi.metaApi import MetaApi
 from .metaApi.historyStorage import HistoryStorage
 from .metaApi.memoryHistoryStorage import MemoryHistoryStorage
+from .metaApi.sqliteHistoryStorage import SqliteHistoryStorage
 from .clients.metaApi.synchronizationListener import SynchronizationListener
 from .metaApi.models import format_error, format_date, date
 from metaapi_cloud_copyfactory_sdk import CopyFactory, StopoutListener, UserLogListener, TransactionListener
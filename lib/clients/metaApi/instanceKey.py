@@ -0,0 +1,119 @@
+from typing import Dict, Iterable, List, Tuple
+from weakref import WeakValueDictionary
+
+_keys_by_parts: 'WeakValueDictionary[Tuple, InstanceKey]' = WeakValueDictionary()
+_keys_by_value: 'WeakValueDictionary[str, InstanceKey]' = WeakValueDictionary()
+
+
+class InstanceKey(str):
+    """Interned key of an account instance, e.g. accountId:region:instanceNumber:host. The key is a string equal to
+    the former instance id string, so it can be used wherever an instance id was used, and keeps its parts so that
+    they do not have to be recovered by splitting the string. There is a single key object per instance while the key
+    is in use."""
+
+    parts: Tuple[str, ...]
+    """Key parts, the first part is account id."""
+
+    @staticmethod
+    def of(*parts) -> 'InstanceKey':
+        """Returns the key of instance with the specified parts.
+
+        Args:
+            parts: Account id followed by other key parts, e.g. region, instance number and host.
+
+        Returns:
+            Instance key.
+        """
+        key = _keys_by_parts.get(parts)
+        if key is None:
+            key = InstanceKey.parse(':'.join(map(str, parts)))
+            _keys_by_parts[parts] = key
+        return key
+
+    @staticmethod
+    def parse(value: str) -> 'InstanceKey':
+        """Returns the key of instance with the specified instance id.
+
+        Args:
+            value: Instance id, e.g. accountId:region:instanceNumber:host.
+
+        Returns:
+            Instance key.
+        """
+        if isinstance(value, InstanceKey):
+            return value
+        key = _keys_by_value.get(value)
+        if key is None:
+            key = InstanceKey(value)
+            key.parts = tuple(value.split(':'))
+            _keys_by_value[value] = key
+        return key
+
+    @property
+    def account_id(self) -> str:
+        """Returns account id.
+
+        Returns:
+            Account id.
+        """
+        return self.parts[0]
+
+
+class InstanceDict(dict):
+    """Dictionary keyed by instance keys which also indexes the keys by account id, so that instances of an account
+    are found without scanning all keys. String keys are converted to instance keys."""
+
+    def __init__(self, items: Dict = None):
+        """Inits the dictionary.
+
+        Args:
+            items: Initial items.
+        """
+        super().__init__()
+        # keys of each account are kept in a dict to preserve insertion order
+        self._keysByAccount: Dict[str, Dict[InstanceKey, None]] = {}
+        for key, value in (items or {}).items():
+            self[key] = value
+
+    def __setitem__(self, key: str, value):
+        key = InstanceKey.parse(key)
+        super().__setitem__(key, value)
+        self._keysByAccount.setdefault(key.account_id, {})[key] = None
+
+    def __delitem__(self, key: str):
+        super().__delitem__(key)
+        key = InstanceKey.parse(key)
+        account_keys = self._keysByAccount[key.account_id]
+        account_keys.pop(key, None)
+        if not len(account_keys):
+            del self._keysByAccount[key.account_id]
+
+    def pop(self, key: str, *default):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        return super().pop(key, *default)
+
+    def clear(self):
+        super().clear()
+        self._keysByAccount.clear()
+
+    def get_account_keys(self, account_id: str) -> List[InstanceKey]:
+        """Returns keys of account instances.
+
+        Args:
+            account_id: Account id.
+
+        Returns:
+            Keys of account instances.
+        """
+        return list(self._keysByAccount.get(account_id, {}).keys())
+
+    def account_ids(self) -> Iterable[str]:
+        """Returns ids of accounts which have keys in the dictionary.
+
+        Returns:
+            Account ids.
+        """
+        return self._keysByAccount.keys()
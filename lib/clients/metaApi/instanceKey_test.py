@@ -0,0 +1,34 @@
+from .instanceKey import InstanceDict, InstanceKey
+
+
+class TestInstanceKey:
+
+    def test_intern_keys(self):
+        """Should return the same key object for the same instance."""
+        key = InstanceKey.of('accountId', 'vint-hill', 0, 'ps-mpa-1')
+        assert key == 'accountId:vint-hill:0:ps-mpa-1'
+        assert key is InstanceKey.of('accountId', 'vint-hill', 0, 'ps-mpa-1')
+        assert key is InstanceKey.parse('accountId:vint-hill:0:ps-mpa-1')
+        assert key.account_id == 'accountId'
+        assert key.parts == ('accountId', 'vint-hill', '0', 'ps-mpa-1')
+        assert {'accountId:vint-hill:0:ps-mpa-1': True}[key]
+
+
+class TestInstanceDict:
+
+    def test_index_keys_by_account(self):
+        """Should find keys of account instances."""
+        instances = InstanceDict({'accountId:vint-hill:0:ps-mpa-1': 1})
+        instances[InstanceKey.of('accountId', 'new-york', 0, 'ps-mpa-2')] = 2
+        instances['accountId2:vint-hill:0:ps-mpa-1'] = 3
+        assert instances.get_account_keys('accountId') == ['accountId:vint-hill:0:ps-mpa-1',
+                                                           'accountId:new-york:0:ps-mpa-2']
+        assert instances.get_account_keys('account') == []
+        assert list(instances.account_ids()) == ['accountId', 'accountId2']
+        assert instances['accountId:new-york:0:ps-mpa-2'] == 2
+        del instances['accountId:vint-hill:0:ps-mpa-1']
+        assert instances.pop('accountId:new-york:0:ps-mpa-2') == 2
+        assert instances.get_account_keys('accountId') == []
+        assert list(instances.account_ids()) == ['accountId2']
+        instances.clear()
+        assert list(instances.account_ids()) == []
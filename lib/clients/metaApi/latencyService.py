@@ -3,6 +3,7 @@ from typing import List, Dict
 from datetime import datetime
 import asyncio
 import socketio
+from .instanceKey import InstanceDict, InstanceKey
 
 
 class LatencyService:
@@ -20,8 +21,8 @@ class LatencyService:
         self._token = token
         self._connectTimeout = connect_timeout
         self._latencyCache = {}
-        self._connectedInstancesCache = {}
-        self._synchronizedInstancesCache = {}
+        self._connectedInstancesCache = InstanceDict()
+        self._synchronizedInstancesCache = InstanceDict()
         self._refreshPromisesByRegion = {}
         self._waitConnectPromises: Dict[str, asyncio.Future] = {}
         self._logger = LoggerManager.get_logger('LatencyService')
@@ -75,8 +76,8 @@ class LatencyService:
             region = self._websocketClient.get_account_region(account_id)
             primary_account_id = self._websocketClient.accounts_by_replica_id[account_id]
             instances = self._get_account_instances(primary_account_id)
-            for instance_id in list(filter(lambda instance_id:
-                                           instance_id.startswith(f'{primary_account_id}:{region}'), instances)):
+            for instance_id in list(filter(lambda instance_id: self._get_region_from_instance(instance_id) == region,
+                                           instances)):
                 self._disconnect_instance(instance_id)
         except Exception as err:
             self._logger.error(f'Failed to process on_unsubscribe event for instance {account_id}', err)
@@ -175,8 +176,7 @@ class LatencyService:
         return instances[0]
 
     def _get_account_instances(self, account_id: str):
-        return list(filter(lambda instance_id: instance_id.startswith(f'{account_id}:'),
-                           self._connectedInstancesCache.keys()))
+        return self._connectedInstancesCache.get_account_keys(account_id)
 
     def _get_account_regions(self, account_id: str):
         regions = []
@@ -189,11 +189,11 @@ class LatencyService:
 
     @staticmethod
     def _get_account_id_from_instance(instance_id: str):
-        return instance_id.split(':')[0]
+        return InstanceKey.parse(instance_id).account_id
 
     @staticmethod
     def _get_region_from_instance(instance_id: str):
-        return instance_id.split(':')[1]
+        return InstanceKey.parse(instance_id).parts[1]
 
     def _disconnect_instance(self, instance_id: str):
         self._connectedInstancesCache[instance_id] = False
@@ -209,12 +209,8 @@ class LatencyService:
             await self._refresh_latency(region)
 
         # For every account, switch to a better region if such exists
-        account_ids = []
-        for instance_id in list(filter(lambda instance_id: self._connectedInstancesCache[instance_id],
-                                       self._connectedInstancesCache.keys())):
-            account_id = self._get_account_id_from_instance(instance_id)
-            if account_id not in account_ids:
-                account_ids.append(account_id)
+        account_ids = list(filter(lambda account_id: len(self.get_active_account_instances(account_id)),
+                                  self._connectedInstancesCache.account_ids()))
 
         sorted_regions = self.regions_sorted_by_latency
 
@@ -14,12 +14,14 @@ from ...metaApi.models import MetatraderHistoryOrders, MetatraderDeals, date, ra
     Margin, MarginOrder
 from .latencyListener import LatencyListener
 from .packetOrderer import PacketOrderer
+from .instanceKey import InstanceDict, InstanceKey
 from .packetLogger import PacketLogger
 from .synchronizationThrottler import SynchronizationThrottler
 from .subscriptionManager import SubscriptionManager
+from .slowEventMonitor import SlowEventMonitor
+from .packetDateConverter import convert_packet_dates
 import socketio
 import asyncio
-import re
 from random import random
 from datetime import datetime, timedelta
 from typing import Coroutine, List, Dict, Callable
@@ -27,7 +29,6 @@ from collections import deque
 from copy import copy
 from .latencyService import LatencyService
 import json
-import math
 from ...logger import LoggerManager
 
 
@@ -84,7 +85,7 @@ class MetaApiWebsocketClient:
         self._synchronizationListeners = {}
         self._latencyListeners = []
         self._reconnectListeners = []
-        self._connectedHosts = {}
+        self._connectedHosts = InstanceDict()
         self._socketInstances = {}
         self._socketInstancesByAccounts = {}
         self._regionsByAccounts = {}
@@ -94,6 +95,7 @@ class MetaApiWebsocketClient:
         self._subscriptionManager = SubscriptionManager(self)
         self._packetOrderer = PacketOrderer(self, opts['packetOrderingTimeout'])
         self._packetOrderer.start()
+        self._slowEventMonitor = SlowEventMonitor()
         self._status_timers = {}
         self._eventQueues = {}
         self._synchronizationFlags = {}
@@ -151,6 +153,29 @@ class MetaApiWebsocketClient:
         """
         return self._region
 
+    @property
+    def slow_event_counts(self) -> Dict[str, int]:
+        """Returns the number of events which took more than 1 second to process, by event name, e.g.
+        on_symbol_prices_updated.
+
+        Returns:
+            Dictionary of slow event counts by event name.
+        """
+        return self._slowEventMonitor.slow_event_counts
+
+    def get_queued_event_count(self, account_id: str = None) -> int:
+        """Returns the number of account events which are queued or being processed.
+
+        Args:
+            account_id: Account id to count events of, or None to count events of all accounts.
+
+        Returns:
+            Number of queued account events.
+        """
+        if account_id is not None:
+            return len(self._eventQueues.get(account_id, []))
+        return sum(map(len, self._eventQueues.values()))
+
     @property
     def socket_instances(self):
         """Returns the list of socket instance dictionaries."""
@@ -190,8 +215,7 @@ class MetaApiWebsocketClient:
         """
         connected_ids = []
         if instance_number in self._socketInstancesByAccounts:
-            for instance_id in self._connectedHosts.keys():
-                account_id = instance_id.split(':')[0]
+            for account_id in self._connectedHosts.account_ids():
                 account_region = self.get_account_region(account_id)
                 if account_id not in connected_ids and account_id in self._socketInstancesByAccounts[instance_number] \
                     and (self._socketInstancesByAccounts[instance_number][account_id] == socket_instance_index or
@@ -495,6 +519,7 @@ class MetaApiWebsocketClient:
         self._synchronizationListeners = {}
         self._latencyListeners = []
         self._packetOrderer.stop()
+        self._slowEventMonitor.stop()
 
     def stop(self):
         """Stops the client."""
@@ -1253,7 +1278,7 @@ class MetaApiWebsocketClient:
         if request['type'] not in ignored_request_types:
             if not connected_instance:
                 connected_instance = await self._latencyService.wait_connected_instance(account_id)
-            active_region = connected_instance.split(':')[1]
+            active_region = InstanceKey.parse(connected_instance).parts[1]
             account_id = self._accountReplicas[primary_account_id][active_region]
 
         instance_number = 0
@@ -1263,7 +1288,7 @@ class MetaApiWebsocketClient:
             instance_number = request['instanceIndex']
         else:
             if connected_instance:
-                instance_number = int(connected_instance.split(':')[2])
+                instance_number = int(InstanceKey.parse(connected_instance).parts[2])
 
             if 'application' not in request or request['application'] != 'RPC':
                 request = copy(request)
@@ -1397,27 +1422,7 @@ class MetaApiWebsocketClient:
                     self._format_request(value)
 
     def _convert_iso_time_to_date(self, packet):
-        if not isinstance(packet, str):
-            for field in packet:
-                value = packet[field]
-                if isinstance(value, str) and re.search('time|Time', field) and not \
-                        re.search('brokerTime|BrokerTime|timeframe', field):
-                    packet[field] = date(value)
-                if isinstance(value, list):
-                    for item in value:
-                        self._convert_iso_time_to_date(item)
-                if isinstance(value, dict):
-                    self._convert_iso_time_to_date(value)
-            if packet and 'timestamps' in packet:
-                for field in packet['timestamps']:
-                    packet['timestamps'][field] = date(packet['timestamps'][field])
-            if packet and 'type' in packet and packet['type'] == 'prices':
-                if 'prices' in packet:
-                    for price in packet['prices']:
-                        if 'timestamps' in price:
-                            for field in price['timestamps']:
-                                if isinstance(price['timestamps'][field], str):
-                                    price['timestamps'][field] = date(price['timestamps'][field])
+        convert_packet_dates(packet)
 
     async def _process_synchronization_packet(self, data):
         try:
@@ -1428,14 +1433,14 @@ class MetaApiWebsocketClient:
             region = self.get_account_region(data['accountId'])
             primary_account_id = self._accountsByReplicaId[data['accountId']] if data['accountId'] in \
                 self._accountsByReplicaId else data['accountId']
-            instance_id = primary_account_id + ':' + region + ':' + str(instance_number) + ':' + \
-                (data['host'] if 'host' in data else '0')
+            instance_id = InstanceKey.of(primary_account_id, region, instance_number,
+                                         data['host'] if 'host' in data else '0')
             instance_index = region + ':' + str(instance_number) + ':' + (data['host'] if 'host' in data else '0')
 
             def is_only_active_instance():
-                active_instance_ids = list(
-                    filter(lambda instance: instance.startswith(
-                        primary_account_id + ':' + region + ':' + str(instance_number)), self._connectedHosts.keys()))
+                active_instance_ids = list(filter(
+                    lambda instance: instance.parts[1] == region and instance.parts[2] == str(instance_number),
+                    self._connectedHosts.get_account_keys(primary_account_id)))
                 return len(active_instance_ids) == 1 and active_instance_ids[0] == instance_id
 
             def cancel_disconnect_timer():
@@ -1512,11 +1517,11 @@ class MetaApiWebsocketClient:
                             on_connected_tasks.append(self._process_event(
                                 run_on_connected(listener),
                                 f'{primary_account_id}:{instance_index}:on_connected'))
-                        self._subscriptionManager.cancel_subscribe(data['accountId'] + ':' + str(instance_number))
+                        self._subscriptionManager.cancel_subscribe(InstanceKey.of(data['accountId'], instance_number))
                     if data['replicas'] == 1:
                         self._subscriptionManager.cancel_account(data['accountId'])
                     else:
-                        self._subscriptionManager.cancel_subscribe(data['accountId'] + ':' + str(instance_number))
+                        self._subscriptionManager.cancel_subscribe(InstanceKey.of(data['accountId'], instance_number))
                     if len(on_connected_tasks) > 0:
                         await asyncio.gather(*on_connected_tasks)
             elif data['type'] == 'disconnected':
@@ -1844,7 +1849,7 @@ class MetaApiWebsocketClient:
                             and (self._subscriptionManager.is_disconnected_retry_mode(
                             data['accountId'], instance_number) or not
                             self._subscriptionManager.is_account_subscribing(data['accountId'], instance_number)):
-                        self._subscriptionManager.cancel_subscribe(data['accountId'] + ':' + str(instance_number))
+                        self._subscriptionManager.cancel_subscribe(InstanceKey.of(data['accountId'], instance_number))
                         await asyncio.sleep(0.01)
                         self._logger.info(f'it seems like we are not connected to a ' +
                                           'running API server yet, retrying subscription for account ' + instance_id)
@@ -2013,51 +2018,51 @@ class MetaApiWebsocketClient:
                     if len(on_symbol_prices_updated_tasks) > 0:
                         await asyncio.gather(*on_symbol_prices_updated_tasks)
 
-                for price in prices:
-                    on_symbol_price_updated_tasks: List[Coroutine] = []
+                price_listeners = list(filter(
+                    lambda listener: not (isinstance(listener, SynchronizationListener) and
+                                          listener.batched_prices_only),
+                    self._synchronizationListeners[primary_account_id])) if primary_account_id in \
+                    self._synchronizationListeners else []
+                if len(price_listeners):
+                    for price in prices:
+                        on_symbol_price_updated_tasks: List[Coroutine] = []
 
-                    if primary_account_id in self._synchronizationListeners:
-                        for listener in self._synchronizationListeners[primary_account_id]:
+                        for listener in price_listeners:
                             def run_on_symbol_price_updated(listener: SynchronizationListener):
                                 return lambda: listener.on_symbol_price_updated(instance_index, price)
 
                             on_symbol_price_updated_tasks.append(
                                 self._process_event(run_on_symbol_price_updated(listener),
                                                     f'{primary_account_id}:{instance_index}:on_symbol_price_updated'))
-                        if len(on_symbol_price_updated_tasks) > 0:
-                            await asyncio.gather(*on_symbol_price_updated_tasks)
-
-                for price in prices:
-                    if 'timestamps' in price:
-                        price['timestamps']['clientProcessingFinished'] = datetime.now()
-                        on_symbol_price_tasks: List[Coroutine] = []
-
-                        for listener in self._latencyListeners:
-                            def run_on_symbol_price(listener: LatencyListener):
-                                return lambda: listener.on_symbol_price(primary_account_id, price['symbol'],
-                                                                        price['timestamps'])
-
-                            on_symbol_price_tasks.append(
-                                self._process_event(run_on_symbol_price(listener),
-                                                    f'{primary_account_id}:{instance_index}:on_symbol_price'))
-                        if len(on_symbol_price_tasks) > 0:
-                            await asyncio.gather(*on_symbol_price_tasks)
+                        await asyncio.gather(*on_symbol_price_updated_tasks)
+
+                latency_prices = list(filter(lambda price: 'timestamps' in price, prices))
+                for price in latency_prices:
+                    price['timestamps']['clientProcessingFinished'] = datetime.now()
+                if len(latency_prices) and len(self._latencyListeners):
+                    on_symbol_price_tasks: List[Coroutine] = []
+
+                    for listener in self._latencyListeners:
+                        def run_on_symbol_price(listener: LatencyListener):
+                            async def on_symbol_price():
+                                for price in latency_prices:
+                                    try:
+                                        await listener.on_symbol_price(primary_account_id, price['symbol'],
+                                                                       price['timestamps'])
+                                    except Exception as err:
+                                        self._logger.error(f'{primary_account_id}:{instance_index}:on_symbol_price: '
+                                                           'event failed with error ' + string_format_error(err))
+                            return on_symbol_price
+
+                        on_symbol_price_tasks.append(
+                            self._process_event(run_on_symbol_price(listener),
+                                                f'{primary_account_id}:{instance_index}:on_symbol_price'))
+                    await asyncio.gather(*on_symbol_price_tasks)
         except Exception as err:
             self._logger.error('Failed to process incoming synchronization packet ' + string_format_error(err))
 
     async def _process_event(self, callable, label: str, throw_error: bool = False):
-        start_time = datetime.now().timestamp()
-        is_long_event = False
-        is_event_done = False
-
-        async def check_long_event():
-            await asyncio.sleep(1)
-            if not is_event_done:
-                nonlocal is_long_event
-                is_long_event = True
-                self._logger.warn(f'{label}: event is taking more than 1 second to process')
-
-        asyncio.create_task(check_long_event())
+        event = self._slowEventMonitor.event_started(label)
         try:
             await callable()
         except Exception as err:
@@ -2065,9 +2070,8 @@ class MetaApiWebsocketClient:
                 raise err
 
             self._logger.error(f'{label}: event failed with error ' + string_format_error(err))
-        is_event_done = True
-        if is_long_event:
-            self._logger.warn(f'{label}: finished in {math.floor(datetime.now().timestamp() - start_time)} seconds')
+        finally:
+            self._slowEventMonitor.event_finished(event)
 
     async def _fire_reconnected(self, instance_number: int, socket_instance_index: int, region: str):
         try:
@@ -1,4 +1,5 @@
 from .metaApiWebsocket_client import MetaApiWebsocketClient
+from .instanceKey import InstanceDict
 from socketio import AsyncServer
 from aiohttp import web
 from ...metaApi.models import date, format_date
@@ -12,6 +13,7 @@ from datetime import datetime, timedelta
 from freezegun import freeze_time
 from ..timeoutException import TimeoutException
 from ..domain_client import DomainClient
+from .synchronizationListener import SynchronizationListener
 from asyncio import sleep
 import json
 sio = None
@@ -93,10 +95,10 @@ async def run_around_tests():
         'vint-hill': 'accountId',
         'new-york': 'accountIdReplica'
     }
-    client._connectedHosts = {
+    client._connectedHosts = InstanceDict({
         'accountId:vint-hill:0:ps-mpa-1': 'ps-mpa-1',
         'accountId:new-york:0:ps-mpa-2': 'ps-mpa-2'
-    }
+    })
     await client.connect(0, 'new-york')
     await client.connect(1, 'vint-hill')
     await client.connect(0, 'vint-hill')
@@ -219,9 +221,9 @@ async def test_retry_connection_if_timed_out():
     client._accountReplicas['accountId'] = {
         'vint-hill': 'accountId'
     }
-    client._connectedHosts = {
+    client._connectedHosts = InstanceDict({
         'accountId:vint-hill:0:ps-mpa-1': 'ps-mpa-1'
-    }
+    })
     client._latencyService.wait_connected_instance = AsyncMock(return_value='accountId:vint-hill:0:ps-mpa-1')
     actual = await client.get_positions('accountId')
     positions[0]['time'] = date(positions[0]['time'])
@@ -276,9 +278,9 @@ async def test_wait_for_connected_instance_before_sending_requests():
     client._accountReplicas['accountId'] = {
         'vint-hill': 'accountId'
     }
-    client._connectedHosts = {
+    client._connectedHosts = InstanceDict({
         'accountId:vint-hill:0:ps-mpa-1': 'ps-mpa-1'
-    }
+    })
     client._latencyService.on_connected = AsyncMock()
     client._latencyService.on_disconnected = MagicMock()
     client._latencyService.on_unsubscribe = MagicMock()
@@ -385,7 +387,7 @@ async def test_delay_region_deletion():
             client._regionsByAccounts['accountId'] = {'region': 'vint-hill', 'connections': 1,
                                                       'lastUsed': datetime.now().timestamp()}
             client._socketInstancesByAccounts = {0: {'accountId': 0}, 1: {'accountId': 0}}
-            client._connectedHosts = {'accountId:0:ps-mpa-1': 'ps-mpa-1'}
+            client._connectedHosts = InstanceDict({'accountId:0:ps-mpa-1': 'ps-mpa-1'})
             await client.connect(1, 'vint-hill')
             await client.connect(0, 'vint-hill')
             client._socketInstances['vint-hill'][0][0]['synchronizationThrottler']._accountsBySynchronizationIds = {}
@@ -435,7 +437,7 @@ async def test_clear_cache_including_accounts_with_several_replicas():
             client._regionsByAccounts['accountId'] = {'region': 'vint-hill', 'connections': 1,
                                                       'lastUsed': datetime.now().timestamp()}
             client._socketInstancesByAccounts = {0: {'accountId': 0}, 1: {'accountId': 0}}
-            client._connectedHosts = {'accountId:0:ps-mpa-1': 'ps-mpa-1'}
+            client._connectedHosts = InstanceDict({'accountId:0:ps-mpa-1': 'ps-mpa-1'})
             await client.connect(1, 'vint-hill')
             await client.connect(0, 'vint-hill')
             client._socketInstances['vint-hill'][0][0]['synchronizationThrottler']._accountsBySynchronizationIds = {}
@@ -468,7 +470,7 @@ async def test_clear_cache_added_on_sync_packet():
             client._regionsByAccounts['accountId'] = {'region': 'vint-hill', 'connections': 1,
                                                       'lastUsed': datetime.now().timestamp()}
             client._socketInstancesByAccounts = {0: {'accountId': 0}, 1: {'accountId': 0}}
-            client._connectedHosts = {'accountId:0:ps-mpa-1': 'ps-mpa-1'}
+            client._connectedHosts = InstanceDict({'accountId:0:ps-mpa-1': 'ps-mpa-1'})
             await client.connect(1, 'vint-hill')
             await client.connect(0, 'vint-hill')
             client._socketInstances['vint-hill'][0][0]['synchronizationThrottler']._accountsBySynchronizationIds = {}
@@ -2797,6 +2799,47 @@ class TestMarketDataSynchronization:
         listener.on_books_updated.assert_called_with('vint-hill:1:ps-mpa-1', books, 100, 200, 400, 40000, None)
         listener.on_symbol_price_updated.assert_called_with('vint-hill:1:ps-mpa-1', prices[0])
 
+    @pytest.mark.asyncio
+    async def test_not_dispatch_symbol_prices_to_batched_listeners(self, sub_active):
+        """Should not invoke per-symbol price events for listeners processing batched prices only."""
+
+        prices = [{
+            'symbol': 'AUDNZD',
+            'bid': 1.05916,
+            'ask': 1.05927,
+            'profitTickValue': 0.602,
+            'lossTickValue': 0.60203
+        }, {
+            'symbol': 'EURUSD',
+            'bid': 1.08916,
+            'ask': 1.08927,
+            'profitTickValue': 1,
+            'lossTickValue': 1
+        }]
+
+        class BatchedListener(SynchronizationListener):
+            batched_prices_only = True
+
+        batched_listener = BatchedListener()
+        batched_listener.on_symbol_prices_updated = AsyncMock()
+        batched_listener.on_symbol_price_updated = AsyncMock()
+        listener = MagicMock()
+        listener.on_symbol_prices_updated = AsyncMock()
+        listener.on_symbol_price_updated = AsyncMock()
+        client.add_synchronization_listener('accountId', batched_listener)
+        client.add_synchronization_listener('accountId', listener)
+        await sio.emit('synchronization', {'type': 'prices', 'accountId': 'accountId', 'prices': prices,
+                                           'equity': 100, 'margin': 200, 'freeMargin': 400, 'marginLevel': 40000,
+                                           'instanceIndex': 1, 'host': 'ps-mpa-1'})
+        await sleep(0.1)
+        batched_listener.on_symbol_prices_updated.assert_called_with('vint-hill:1:ps-mpa-1', prices, 100, 200, 400,
+                                                                     40000, None)
+        batched_listener.on_symbol_price_updated.assert_not_called()
+        listener.on_symbol_prices_updated.assert_called_with('vint-hill:1:ps-mpa-1', prices, 100, 200, 400, 40000,
+                                                             None)
+        assert listener.on_symbol_price_updated.call_count == 2
+        listener.on_symbol_price_updated.assert_called_with('vint-hill:1:ps-mpa-1', prices[1])
+
 
 class TestServerSideSynchronization:
 
@@ -0,0 +1,106 @@
+import re
+from typing import Dict
+from ...metaApi.models import date
+
+_position_date_fields = ('time', 'updateTime')
+_order_date_fields = ('time', 'doneTime', 'expirationTime')
+_deal_date_fields = ('time',)
+_specification_date_fields = ('startTime', 'expirationTime')
+_market_data_date_fields = ('time',)
+
+date_fields_by_packet_type = {
+    'authenticated': {},
+    'disconnected': {},
+    'status': {},
+    'keepalive': {},
+    'noop': {},
+    'synchronizationStarted': {},
+    'accountInformation': {},
+    'dealSynchronizationFinished': {},
+    'orderSynchronizationFinished': {},
+    'downgradeSubscription': {},
+    'positions': {'positions': _position_date_fields},
+    'orders': {'orders': _order_date_fields},
+    'historyOrders': {'historyOrders': _order_date_fields},
+    'deals': {'deals': _deal_date_fields},
+    'specifications': {'specifications': _specification_date_fields},
+    'update': {
+        'updatedPositions': _position_date_fields,
+        'updatedOrders': _order_date_fields,
+        'historyOrders': _order_date_fields,
+        'deals': _deal_date_fields
+    },
+    'prices': {
+        'prices': _market_data_date_fields,
+        'candles': _market_data_date_fields,
+        'ticks': _market_data_date_fields,
+        'books': _market_data_date_fields
+    }
+}
+"""Date fields of packet items by packet type and item list field."""
+
+_date_paths_by_packet_type = {packet_type: tuple(fields.items()) for packet_type, fields in
+                              date_fields_by_packet_type.items()}
+
+
+def convert_packet_dates(packet: Dict):
+    """Converts ISO date strings of a websocket packet into datetime objects in place. Packets of known types are
+    converted using a precompiled list of date fields, the other packets are walked recursively.
+
+    Args:
+        packet: Packet to convert.
+    """
+    date_paths = _date_paths_by_packet_type.get(packet.get('type')) if isinstance(packet, dict) else None
+    if date_paths is None:
+        convert_dates_recursively(packet)
+        return
+    for list_field, fields in date_paths:
+        items = packet.get(list_field)
+        if items:
+            for item in items:
+                for field in fields:
+                    value = item.get(field)
+                    if isinstance(value, str):
+                        item[field] = date(value)
+                timestamps = item.get('timestamps')
+                if timestamps:
+                    _convert_timestamps(timestamps)
+    timestamps = packet.get('timestamps')
+    if timestamps:
+        _convert_timestamps(timestamps)
+
+
+def convert_dates_recursively(packet):
+    """Converts ISO date strings into datetime objects in place by walking all fields of an object. A string field is
+    treated as a date if its name contains time, except for broker time and timeframe fields.
+
+    Args:
+        packet: Object to convert.
+    """
+    if not isinstance(packet, str):
+        for field in packet:
+            value = packet[field]
+            if isinstance(value, str) and re.search('time|Time', field) and not \
+                    re.search('brokerTime|BrokerTime|timeframe', field):
+                packet[field] = date(value)
+            if isinstance(value, list):
+                for item in value:
+                    convert_dates_recursively(item)
+            if isinstance(value, dict):
+                convert_dates_recursively(value)
+        if packet and 'timestamps' in packet:
+            for field in packet['timestamps']:
+                packet['timestamps'][field] = date(packet['timestamps'][field])
+        if packet and 'type' in packet and packet['type'] == 'prices':
+            if 'prices' in packet:
+                for price in packet['prices']:
+                    if 'timestamps' in price:
+                        for field in price['timestamps']:
+                            if isinstance(price['timestamps'][field], str):
+                                price['timestamps'][field] = date(price['timestamps'][field])
+
+
+def _convert_timestamps(timestamps: Dict):
+    for field, value in timestamps.items():
+        if isinstance(value, str):
+            timestamps[field] = date(value)
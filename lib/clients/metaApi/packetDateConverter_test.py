@@ -0,0 +1,81 @@
+from .packetDateConverter import convert_packet_dates, convert_dates_recursively
+from ...metaApi.models import date
+from copy import deepcopy
+from datetime import datetime, timezone
+
+timestamps = {'eventGenerated': '2020-04-15T02:45:06.521Z', 'serverProcessingStarted': '2020-04-15T02:45:06.621Z'}
+position = {'id': '46214692', 'type': 'POSITION_TYPE_BUY', 'symbol': 'GBPUSD', 'magic': 1000,
+            'time': '2020-04-15T02:45:06.521Z', 'updateTime': '2020-04-15T02:45:06.521Z',
+            'brokerTime': '2020-04-15 05:45:06.521', 'openPrice': 1.26101, 'volume': 0.07}
+order = {'id': '46871284', 'type': 'ORDER_TYPE_BUY_LIMIT', 'state': 'ORDER_STATE_PLACED', 'symbol': 'AUDNZD',
+         'time': '2020-04-20T08:38:58.270Z', 'brokerTime': '2020-04-20 11:38:58.270',
+         'doneTime': '2020-04-20T08:39:58.270+00:00', 'doneBrokerTime': '2020-04-20 11:39:58.270',
+         'expirationTime': '2020-04-21T08:38:58Z'}
+deal = {'id': '33230099', 'type': 'DEAL_TYPE_BALANCE', 'time': '2020-04-15T02:45:06.521Z',
+        'brokerTime': '2020-04-15 05:45:06.521', 'profit': 10000}
+specification = {'symbol': 'EURUSD', 'tickSize': 0.00001, 'startTime': '2020-04-15T02:45:06.521Z',
+                 'expirationTime': '2030-04-15T02:45:06Z', 'tradeSessions': {'MONDAY': [{'from': '00:00',
+                                                                                         'to': '23:59'}]}}
+price = {'symbol': 'EURUSD', 'bid': 1.0839, 'ask': 1.08397, 'time': '2020-04-15T02:45:06.521Z',
+         'brokerTime': '2020-04-15 05:45:06.521', 'timestamps': dict(timestamps)}
+candle = {'symbol': 'EURUSD', 'timeframe': '1m', 'time': '2020-04-15T02:45:00.000Z',
+          'brokerTime': '2020-04-15 05:45:00.000', 'open': 1.0839}
+tick = {'symbol': 'EURUSD', 'time': '2020-04-15T02:45:06.521Z', 'brokerTime': '2020-04-15 05:45:06.521',
+        'bid': 1.0839}
+book = {'symbol': 'EURUSD', 'time': '2020-04-15T02:45:06.521Z', 'brokerTime': '2020-04-15 05:45:06.521',
+        'book': [{'type': 'BOOK_TYPE_SELL', 'price': 1.08397, 'volume': 10}]}
+packets = [
+    {'type': 'authenticated', 'accountId': 'accountId', 'host': 'ps-mpa-0', 'sessionId': 'sessionId'},
+    {'type': 'accountInformation', 'accountId': 'accountId', 'accountInformation': {'balance': 100},
+     'timestamps': dict(timestamps)},
+    {'type': 'positions', 'accountId': 'accountId', 'positions': [position], 'timestamps': dict(timestamps)},
+    {'type': 'orders', 'accountId': 'accountId', 'orders': [order]},
+    {'type': 'historyOrders', 'accountId': 'accountId', 'historyOrders': [order]},
+    {'type': 'deals', 'accountId': 'accountId', 'deals': [deal]},
+    {'type': 'specifications', 'accountId': 'accountId', 'specifications': [specification],
+     'removedSymbols': ['AUDNZD']},
+    {'type': 'update', 'accountId': 'accountId', 'updatedPositions': [position], 'removedPositionIds': ['1'],
+     'updatedOrders': [order], 'completedOrderIds': ['2'], 'historyOrders': [order], 'deals': [deal],
+     'timestamps': dict(timestamps)},
+    {'type': 'prices', 'accountId': 'accountId', 'prices': [price], 'candles': [candle], 'ticks': [tick],
+     'books': [book], 'equity': 100, 'timestamps': dict(timestamps)}
+]
+
+
+class TestPacketDateConverter:
+
+    def test_convert_packets_same_as_walking_all_fields(self):
+        """Should convert packets of known types the same way as walking all packet fields."""
+        for packet in packets:
+            expected = deepcopy(packet)
+            convert_dates_recursively(expected)
+            actual = deepcopy(packet)
+            convert_packet_dates(actual)
+            assert actual == expected
+
+    def test_convert_dates(self):
+        """Should convert date fields and keep broker time and timeframe fields as strings."""
+        packet = deepcopy(packets[-1])
+        convert_packet_dates(packet)
+        assert packet['prices'][0]['time'] == datetime(2020, 4, 15, 2, 45, 6, 521000, tzinfo=timezone.utc)
+        assert packet['prices'][0]['timestamps']['eventGenerated'] == date('2020-04-15T02:45:06.521Z')
+        assert packet['prices'][0]['brokerTime'] == '2020-04-15 05:45:06.521'
+        assert packet['candles'][0]['timeframe'] == '1m'
+        assert packet['timestamps']['serverProcessingStarted'] == date('2020-04-15T02:45:06.621Z')
+
+    def test_walk_packets_of_unknown_types(self):
+        """Should walk all fields of packets with unknown types."""
+        packet = {'type': 'response', 'requestId': 'requestId', 'accountId': 'accountId',
+                  'response': {'positions': [{'id': '1', 'openTime': '2020-04-15T02:45:06.521Z'}]},
+                  'timestamps': {'serverProcessingFinished': '2020-04-15T02:45:06.621Z'}}
+        convert_packet_dates(packet)
+        assert packet['response']['positions'][0]['openTime'] == date('2020-04-15T02:45:06.521Z')
+        assert packet['timestamps']['serverProcessingFinished'] == date('2020-04-15T02:45:06.621Z')
+
+    def test_not_convert_converted_dates(self):
+        """Should not fail on packets which are already converted."""
+        packet = deepcopy(packets[2])
+        convert_packet_dates(packet)
+        expected = deepcopy(packet)
+        convert_packet_dates(packet)
+        assert packet == expected
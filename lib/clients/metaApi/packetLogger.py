@@ -1,17 +1,28 @@
 import os
-from typing import Dict, List, Optional
+import struct
+from bisect import bisect_left, bisect_right
+from typing import AsyncIterator, Dict, Iterator, List, Optional
 from typing_extensions import TypedDict
 import json
 import math
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import asyncio
-import functools
 import shutil
-from copy import deepcopy
+import threading
+from collections import OrderedDict
+from itertools import groupby
+from operator import itemgetter
 from ...metaApi.models import date, string_format_error
+from ...metaApi.fileIOExecutor import FileIOExecutor
 from ..optionsValidator import OptionsValidator
+from .priceRecordFormat import FILE_MAGIC, PriceRecordEncoder, get_log_time, read_chunks
 from ...logger import LoggerManager
 
+_INDEX_MAGIC = b'PLX1'
+_index_header = struct.Struct('<4sd')
+_index_entry = struct.Struct('<dQ')
+_files_per_account = 3
+
 
 class PacketLoggerOpts(TypedDict, total=False):
     """Packet logger options."""
@@ -26,6 +37,13 @@ class PacketLoggerOpts(TypedDict, total=False):
     """Whether to compress specifications packets. Default is true."""
     compressPrices: Optional[bool]
     """Whether to compress price packets. Default is true."""
+    recordPrices: Optional[bool]
+    """Whether to record all price packets into compact binary price files instead of the log files. Price packets
+    are recorded losslessly and can be read with read_prices. Default is false."""
+    openFileAccountLimit: Optional[int]
+    """Maximum number of accounts to keep files open for between writes. Each account keeps up to 3 files open:
+    the log file, its time index and the price file. Files of the least recently written accounts are closed when
+    the limit is reached. Default is 32."""
 
 
 class PacketLogger:
@@ -48,13 +66,29 @@ class PacketLogger:
             'packetLogger.compressSpecifications')
         self._compressPrices = validator.validate_boolean(
             opts['compressPrices'] if 'compressPrices' in opts else None, True, 'packetLogger.compressPrices')
+        self._recordPrices = validator.validate_boolean(
+            opts['recordPrices'] if 'recordPrices' in opts else None, False, 'packetLogger.recordPrices')
+        open_file_account_limit = validator.validate_non_zero(
+            opts['openFileAccountLimit'] if 'openFileAccountLimit' in opts else None, 32,
+            'packetLogger.openFileAccountLimit')
+        self._priceEncoders = {}
         self._previousPrices = {}
         self._lastSNPacket = {}
         self._writeQueue = {}
         self._root = './.metaapi/logs'
+        self._fileHandles = OrderedDict()
+        self._fileHandlesLock = threading.Lock()
+        self._accountFolders = {}
+        self._maxOpenFiles = math.ceil(open_file_account_limit) * _files_per_account
+        self._indexLineInterval = 1000
+        self._readBlockSize = 1024 * 1024
+        self._lastLogSecond = None
+        self._lastLogSecondString = None
+        self._lastLogFolder = None
         self._logger = LoggerManager.get_logger('PacketLogger')
         self._recordInterval: asyncio.Task or None = None
         self._deleteOldLogsInterval: asyncio.Task or None = None
+        self._fileIOExecutor = FileIOExecutor.get_instance()
         if not os.path.exists('./.metaapi'):
             os.mkdir('./.metaapi')
 
@@ -66,60 +100,74 @@ class PacketLogger:
             self._previousPrices[account_id] = {}
 
     def log_packet(self, packet: Dict):
-        """Processes packets and pushes them into save queue.
+        """Processes packets and pushes them into save queue. The packet is serialized immediately, so it can be
+        modified by the caller afterwards.
 
         Args:
             packet: Packet to log.
         """
+        packet_type = packet['type']
+        if packet_type == 'status':
+            return
+        account_id = packet['accountId']
         instance_index = packet['instanceIndex'] if 'instanceIndex' in packet else 0
-        packet = deepcopy(packet)
-        if packet['accountId'] not in self._writeQueue:
-            self._writeQueue[packet['accountId']] = {'isWriting': False, 'queue': []}
-        if packet['type'] == 'status':
+        if account_id not in self._writeQueue:
+            self._writeQueue[account_id] = {'isWriting': False, 'queue': []}
+        if packet_type == 'prices' and self._recordPrices:
+            if account_id not in self._priceEncoders:
+                self._priceEncoders[account_id] = PriceRecordEncoder()
+            self._priceEncoders[account_id].add(packet, get_log_time(datetime.now()))
             return
-        if packet['accountId'] not in self._lastSNPacket:
-            self._lastSNPacket[packet['accountId']] = {}
-        if packet['type'] in ['keepalive', 'noop']:
-            self._lastSNPacket[packet['accountId']][instance_index] = packet
+        if account_id not in self._lastSNPacket:
+            self._lastSNPacket[account_id] = {}
+        if packet_type in ['keepalive', 'noop']:
+            self._lastSNPacket[account_id][instance_index] = packet['sequenceNumber'] if 'sequenceNumber' in packet \
+                else None
             return
-        queue: List = self._writeQueue[packet['accountId']]['queue']
-        if packet['accountId'] not in self._previousPrices:
-            self._previousPrices[packet['accountId']] = {}
-        prev_price = self._previousPrices[packet['accountId']][instance_index] if \
-            instance_index in self._previousPrices[packet['accountId']] else None
-        if packet['type'] != 'prices':
+        queue: List = self._writeQueue[account_id]['queue']
+        if account_id not in self._previousPrices:
+            self._previousPrices[account_id] = {}
+        prev_price = self._previousPrices[account_id][instance_index] if \
+            instance_index in self._previousPrices[account_id] else None
+        if packet_type != 'prices':
             if prev_price is not None:
-                self._record_prices(packet['accountId'], instance_index)
-            if packet['type'] == 'specifications' and self._compressSpecifications:
-                queue.append(json.dumps({'type': packet['type'], 'sequenceNumber': packet['sequenceNumber'] if
-                                         'sequenceNumber' in packet else None, 'sequenceTimestamp':
-                                         packet['sequenceTimestamp'] if 'sequenceTimestamp' in packet else None,
-                                         'instanceIndex': instance_index}))
+                self._record_prices(account_id, instance_index)
+            if packet_type == 'specifications' and self._compressSpecifications:
+                self._enqueue(queue, json.dumps({
+                    'type': packet_type,
+                    'sequenceNumber': packet['sequenceNumber'] if 'sequenceNumber' in packet else None,
+                    'sequenceTimestamp': packet['sequenceTimestamp'] if 'sequenceTimestamp' in packet else None,
+                    'instanceIndex': instance_index}))
             else:
-                queue.append(json.dumps(packet))
+                self._enqueue(queue, json.dumps(packet))
         else:
+            message = json.dumps(packet)
             if not self._compressPrices:
-                queue.append(json.dumps(packet))
+                self._enqueue(queue, message)
             else:
+                sequence_number = packet['sequenceNumber'] if 'sequenceNumber' in packet else None
                 if prev_price is not None:
-                    valid_sequence_numbers = [prev_price['last']['sequenceNumber'],
-                                              prev_price['last']['sequenceNumber'] + 1]
-                    if instance_index in self._lastSNPacket[packet['accountId']] and 'sequenceNumber' in \
-                            self._lastSNPacket[packet['accountId']][instance_index]:
-                        valid_sequence_numbers.append(
-                            self._lastSNPacket[packet['accountId']][instance_index]['sequenceNumber'] + 1)
-                    if packet['sequenceNumber'] not in valid_sequence_numbers:
-                        self._record_prices(packet['accountId'], instance_index)
-                        self._ensure_previous_price_object(packet['accountId'])
-                        self._previousPrices[packet['accountId']][instance_index] = {'first': packet, 'last': packet}
-                        queue.append(json.dumps(packet))
+                    valid_sequence_numbers = [prev_price['last'], prev_price['last'] + 1]
+                    last_sn = self._lastSNPacket[account_id][instance_index] if \
+                        instance_index in self._lastSNPacket[account_id] else None
+                    if last_sn is not None:
+                        valid_sequence_numbers.append(last_sn + 1)
+                    if sequence_number not in valid_sequence_numbers:
+                        self._record_prices(account_id, instance_index)
+                        if sequence_number is not None:
+                            self._ensure_previous_price_object(account_id)
+                            self._previousPrices[account_id][instance_index] = {
+                                'first': sequence_number, 'last': sequence_number, 'lastMessage': message}
+                        self._enqueue(queue, message)
                     else:
-                        self._previousPrices[packet['accountId']][instance_index]['last'] = packet
+                        prev_price['last'] = sequence_number
+                        prev_price['lastMessage'] = message
                 else:
-                    if 'sequenceNumber' in packet:
-                        self._ensure_previous_price_object(packet['accountId'])
-                        self._previousPrices[packet['accountId']][instance_index] = {'first': packet, 'last': packet}
-                    queue.append(json.dumps(packet))
+                    if sequence_number is not None:
+                        self._ensure_previous_price_object(account_id)
+                        self._previousPrices[account_id][instance_index] = {
+                            'first': sequence_number, 'last': sequence_number, 'lastMessage': message}
+                    self._enqueue(queue, message)
 
     async def read_logs(self, account_id: str, date_after: datetime = None, date_before: datetime = None):
         """Returns log messages within date bounds as an array of objects.
@@ -129,21 +177,94 @@ class PacketLogger:
             date_after: Date to get logs after.
             date_before: Date to get logs before.
         """
-        folders = os.listdir(self._root)
-        folders.sort()
         packets = []
-        for folder in folders:
-            file_path = f'{self._root}/{folder}/{account_id}.log'
-            if os.path.exists(file_path):
-                contents = open(file_path, "r").readlines()
-                messages = list(map(lambda message: {'date': date(message[1:24]), 'message':
-                                    message[26:].replace('\n', '')}, contents))
+        async for messages in self.stream_logs(account_id, date_after, date_before):
+            packets += messages
+        return packets
+
+    async def stream_logs(self, account_id: str, date_after: datetime = None,
+                          date_before: datetime = None) -> AsyncIterator[List[Dict]]:
+        """Streams log messages within date bounds in batches, so that the logs are not loaded into memory at once.
+        Log folders outside of date bounds are skipped by name and the time index of log files is used to read only
+        the part of a log file within date bounds.
+
+        Args:
+            account_id: Account id.
+            date_after: Date to get logs after.
+            date_before: Date to get logs before.
+
+        Returns:
+            Async iterator over lists of log messages with date and message fields.
+        """
+        messages = self.iterate_logs(account_id, date_after, date_before)
+        try:
+            while True:
+                batch = await self._fileIOExecutor.run(next, messages, None)
+                if batch is None:
+                    break
+                yield batch
+        finally:
+            messages.close()
+
+    async def read_prices(self, account_id: str, date_after: datetime = None, date_before: datetime = None) -> \
+            List[Dict]:
+        """Returns price packets recorded in binary price files within date bounds. Chunks of price files outside of
+        date bounds are skipped without decoding.
+
+        Args:
+            account_id: Account id.
+            date_after: Date to get price packets after.
+            date_before: Date to get price packets before.
+
+        Returns:
+            List of dictionaries with date and packet fields.
+        """
+        return await self._fileIOExecutor.run(lambda: list(self.iterate_prices(account_id, date_after, date_before)))
+
+    def iterate_logs(self, account_id: str, date_after: datetime = None,
+                     date_before: datetime = None) -> Iterator[List[Dict]]:
+        """Returns an iterator which reads log messages within date bounds in batches. Files are read lazily as the
+        iterator advances, so the iterator should be advanced in file IO thread, see stream_logs.
+
+        Args:
+            account_id: Account id.
+            date_after: Date to get logs after.
+            date_before: Date to get logs before.
+
+        Returns:
+            Iterator over lists of log messages with date and message fields.
+        """
+        start_time = date_after.timestamp() if date_after else None
+        end_time = date_before.timestamp() if date_before else None
+        for file_path in self._get_log_file_paths(account_id, start_time, end_time):
+            for lines in self._iterate_log_file(file_path, start_time, end_time):
+                messages = list(map(lambda line: {'date': date(line[1:24]), 'message': line[26:]}, lines))
                 if date_after:
                     messages = list(filter(lambda message: message['date'] > date_after, messages))
                 if date_before:
                     messages = list(filter(lambda message: message['date'] < date_before, messages))
-                packets += messages
-        return packets
+                if len(messages):
+                    yield messages
+
+    def iterate_prices(self, account_id: str, date_after: datetime = None,
+                       date_before: datetime = None) -> Iterator[Dict]:
+        """Returns an iterator which reads price packets recorded in binary price files within date bounds. Files are
+        read and decoded one chunk at a time as the iterator advances, so the iterator should be advanced in file IO
+        thread.
+
+        Args:
+            account_id: Account id.
+            date_after: Date to get price packets after.
+            date_before: Date to get price packets before.
+
+        Returns:
+            Iterator over dictionaries with date and packet fields.
+        """
+        start_time = date_after.timestamp() if date_after else None
+        end_time = date_before.timestamp() if date_before else None
+        for time, packet in self._iterate_price_files(account_id, start_time, end_time):
+            if (start_time is None or time > start_time) and (end_time is None or time < end_time):
+                yield {'date': date(time), 'packet': packet}
 
     def get_file_path(self, account_id) -> str:
         """Returns path for account log file.
@@ -154,8 +275,7 @@ class PacketLogger:
         Returns:
             File path.
         """
-        file_index = math.floor(datetime.now().hour / self._logFileSizeInHours)
-        folder_name = f'{datetime.now().strftime("%Y-%m-%d")}-{file_index if file_index > 9 else "0" + str(file_index)}'
+        folder_name = self._get_folder_name(datetime.now())
         if not os.path.exists(f'{self._root}/{folder_name}'):
             os.mkdir(f'{self._root}/{folder_name}')
         return f'{self._root}/{folder_name}/{account_id}.log'
@@ -184,6 +304,31 @@ class PacketLogger:
         self._recordInterval = None
         self._deleteOldLogsInterval.cancel()
         self._deleteOldLogsInterval = None
+        with self._fileHandlesLock:
+            self._close_files(list(self._fileHandles.keys()))
+
+    def _get_folder_name(self, time: datetime) -> str:
+        file_index = math.floor(time.hour / self._logFileSizeInHours)
+        return f'{time.strftime("%Y-%m-%d")}-{file_index if file_index > 9 else "0" + str(file_index)}'
+
+    def _enqueue(self, queue: List, message: str):
+        """Adds a message to account write queue along with the time it was logged at. Date formatting is done once
+        per second.
+
+        Args:
+            queue: Account write queue.
+            message: Message to log.
+        """
+        now = datetime.now()
+        second = now.replace(microsecond=0)
+        if second != self._lastLogSecond:
+            self._lastLogSecond = second
+            self._lastLogSecondString = second.strftime('%Y-%m-%d %H:%M:%S')
+            self._lastLogFolder = self._get_folder_name(second)
+        # log lines are dated by local time, which goes back on DST fall-back, so the UTC epoch of the message is
+        # kept for the time index
+        queue.append((self._lastLogFolder,
+                      f'[{self._lastLogSecondString}.{now.microsecond // 1000:03d}] {message}\r', now.timestamp()))
 
     def _record_prices(self, account_id: str, instance_number: int):
         """Records price packet messages to log files.
@@ -191,39 +336,264 @@ class PacketLogger:
         Args:
             account_id: Account id.
         """
-        prev_price = self._previousPrices[account_id][instance_number] if instance_number \
-            in self._previousPrices[account_id] else {'first': {}, 'last': {}}
+        prev_price = self._previousPrices[account_id][instance_number]
         queue = self._writeQueue[account_id]['queue']
         del self._previousPrices[account_id][instance_number]
         if not len(self._previousPrices[account_id].keys()):
             del self._previousPrices[account_id]
-        if prev_price['first']['sequenceNumber'] != prev_price['last']['sequenceNumber']:
-            queue.append(json.dumps(prev_price['last']))
-            queue.append(f'Recorded price packets {prev_price["first"]["sequenceNumber"]}'
-                         f'-{prev_price["last"]["sequenceNumber"]}, instanceIndex: {instance_number}')
+        if prev_price['first'] != prev_price['last']:
+            self._enqueue(queue, prev_price['lastMessage'])
+            self._enqueue(queue, f'Recorded price packets {prev_price["first"]}-{prev_price["last"]}, '
+                                 f'instanceIndex: {instance_number}')
 
     async def _append_logs(self):
         """Writes logs to files."""
-        for account_id in self._writeQueue:
-            queue = self._writeQueue[account_id]
-            if (not queue['isWriting']) and len(queue['queue']):
-                queue['isWriting'] = True
-                try:
-                    file_path = self.get_file_path(account_id)
-                    write_string = functools.reduce(
-                        lambda a, b: a + f'[{datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]}] {b}\r',
-                        queue['queue'], '')
-                    queue['queue'] = []
-                    f = open(file_path, "a+")
-                    f.write(write_string)
-                    f.close()
-                except Exception as err:
-                    self._logger.error(f'{account_id}: Failed to record packet log ' + string_format_error(err))
-                queue['isWriting'] = False
+        await asyncio.gather(*[self._append_account_logs(account_id, queue) for account_id, queue in
+                               list(self._writeQueue.items()) if (not queue['isWriting']) and
+                               (len(queue['queue']) or account_id in self._priceEncoders)])
+
+    async def _append_account_logs(self, account_id: str, queue: Dict):
+        """Writes account logs to file.
+
+        Args:
+            account_id: Account id.
+            queue: Account write queue.
+        """
+        queue['isWriting'] = True
+        try:
+            writes = []
+            for folder_name, items in groupby(queue['queue'], itemgetter(0)):
+                items = list(items)
+                writes.append((folder_name, list(map(itemgetter(1), items)), list(map(itemgetter(2), items))))
+            queue['queue'] = []
+            # the encoder is dropped with its chunk, so that no encoder is kept for accounts which stopped receiving
+            # prices
+            encoder = self._priceEncoders.pop(account_id, None)
+            price_chunk = encoder.flush() if encoder else None
+            await self._fileIOExecutor.run(self._write_log_files, account_id, writes, price_chunk)
+        except Exception as err:
+            self._logger.error(f'{account_id}: Failed to record packet log ' + string_format_error(err))
+        queue['isWriting'] = False
+
+    def _write_log_files(self, account_id: str, writes: List[tuple], price_chunk: bytes = None):
+        with self._fileHandlesLock:
+            for folder_name, lines, times in writes:
+                f = self._get_file_handle(account_id, folder_name, 'log')
+                index = bytearray()
+                # index the first line of each write and every indexLineInterval lines by UTC epoch, so that a time
+                # range is found without parsing the whole file
+                for i in range(0, len(lines), self._indexLineInterval):
+                    index += _index_entry.pack(times[i], f.tell())
+                    f.write(''.join(lines[i:i + self._indexLineInterval]).encode('utf-8'))
+                f.flush()
+                index_file = self._get_file_handle(account_id, folder_name, 'idx')
+                if index_file.tell() == 0:
+                    index_file.write(_index_header.pack(_INDEX_MAGIC, self._logFileSizeInHours))
+                index_file.write(index)
+                index_file.flush()
+            if price_chunk:
+                f = self._get_file_handle(account_id, self._get_folder_name(datetime.now()), 'prices')
+                if f.tell() == 0:
+                    f.write(FILE_MAGIC)
+                f.write(price_chunk)
+                f.flush()
+
+    def _get_file_handle(self, account_id: str, folder_name: str, extension: str):
+        file_path = f'{self._root}/{folder_name}/{account_id}.{extension}'
+        if file_path in self._fileHandles:
+            self._fileHandles.move_to_end(file_path)
+            return self._fileHandles[file_path]
+        previous_folder_name = self._accountFolders.get(account_id)
+        if previous_folder_name != folder_name:
+            # log file period has ended, the files of previous period are not written anymore
+            if previous_folder_name is not None:
+                self._close_files(list(map(lambda file_extension: f'{self._root}/{previous_folder_name}/'
+                                           f'{account_id}.{file_extension}', ['log', 'idx', 'prices'])))
+            self._accountFolders[account_id] = folder_name
+        if not os.path.exists(f'{self._root}/{folder_name}'):
+            os.makedirs(f'{self._root}/{folder_name}', exist_ok=True)
+        elif extension == 'idx':
+            self._check_index_header(file_path)
+        f = open(file_path, 'ab')
+        self._fileHandles[file_path] = f
+        if len(self._fileHandles) > self._maxOpenFiles:
+            self._fileHandles.popitem(last=False)[1].close()
+        return f
+
+    def _check_index_header(self, file_path: str):
+        """Marks the file size of a log folder as unknown in the header of an existing index file if the folder was
+        written with a different file size setting, since the folder name then does not define its time range.
+
+        Args:
+            file_path: Index file path.
+        """
+        header = self._read_index_header(file_path)
+        if header is not None and header != self._logFileSizeInHours:
+            with open(file_path, 'r+b') as f:
+                f.write(_index_header.pack(_INDEX_MAGIC, 0))
+
+    def _close_files(self, file_paths: List[str]):
+        for file_path in file_paths:
+            if file_path in self._fileHandles:
+                self._fileHandles.pop(file_path).close()
+
+    def _get_log_file_paths(self, account_id: str, start_time: Optional[float],
+                            end_time: Optional[float]) -> List[str]:
+        folders = os.listdir(self._root)
+        folders.sort()
+        file_paths = []
+        for folder in folders:
+            file_path = f'{self._root}/{folder}/{account_id}.log'
+            if not os.path.exists(file_path):
+                continue
+            if start_time is not None or end_time is not None:
+                folder_bounds = self._get_folder_bounds(folder, self._read_index_header(file_path[:-len('.log')] +
+                                                                                        '.idx'))
+                if folder_bounds and ((start_time is not None and folder_bounds[1] <= start_time) or
+                                      (end_time is not None and folder_bounds[0] >= end_time)):
+                    continue
+            file_paths.append(file_path)
+        return file_paths
+
+    @staticmethod
+    def _get_folder_bounds(folder: str, log_file_size_in_hours: Optional[float]) -> Optional[tuple]:
+        """Returns the time range of messages in a log folder, which is derived from the folder name and the file
+        size setting the folder was written with. Log lines and folder names are both dated by local time, so the
+        range holds on DST fall-back as well.
+
+        Args:
+            folder: Folder name, e.g. 2020-10-10-01.
+            log_file_size_in_hours: File size setting recorded in the index header of the folder.
+
+        Returns:
+            Start and end time of the folder in seconds or None if the range is unknown.
+        """
+        if not log_file_size_in_hours:
+            return None
+        try:
+            start = datetime.strptime(folder[:10], '%Y-%m-%d') + \
+                timedelta(hours=int(folder[11:]) * log_file_size_in_hours)
+        except ValueError:
+            return None
+        return get_log_time(start), get_log_time(start + timedelta(hours=log_file_size_in_hours))
+
+    @staticmethod
+    def _read_index_header(index_path: str) -> Optional[float]:
+        """Reads the file size setting a log folder was written with from the header of its index file.
+
+        Args:
+            index_path: Index file path.
+
+        Returns:
+            File size in hours, 0 if the folder was written with different settings, or None if the index file is
+            missing or has unknown format.
+        """
+        try:
+            with open(index_path, 'rb') as f:
+                data = f.read(_index_header.size)
+        except OSError:
+            return None
+        if len(data) < _index_header.size:
+            return None
+        magic, log_file_size_in_hours = _index_header.unpack(data)
+        return log_file_size_in_hours if magic == _INDEX_MAGIC else None
+
+    @staticmethod
+    def _get_epoch_range(log_time: float) -> tuple:
+        """Returns the range of UTC epochs a log time may correspond to. A local time is ambiguous on DST fall-back
+        and does not exist on DST spring-forward, in which case the two interpretations of it differ.
+
+        Args:
+            log_time: Local time treated as UTC in seconds, as used by log line dates.
+
+        Returns:
+            Earliest and latest UTC epoch in seconds.
+        """
+        local_time = datetime.fromtimestamp(log_time, timezone.utc).replace(tzinfo=None)
+        times = local_time.replace(fold=0).timestamp(), local_time.replace(fold=1).timestamp()
+        return min(times), max(times)
+
+    def _get_log_file_range(self, file_path: str, start_time: Optional[float], end_time: Optional[float]) -> tuple:
+        """Returns the byte range of a log file which contains the messages within time bounds, according to the
+        time index of the file. The index is kept by UTC epoch, which increases as messages are appended even when
+        local time of log lines goes back on DST fall-back, so the range starts at the last index entry not later
+        than the earliest epoch of start time and ends at the first index entry not earlier than the latest epoch of
+        end time. The whole file is scanned if the index is missing or has unknown format.
+
+        Args:
+            file_path: Log file path.
+            start_time: Start time in seconds.
+            end_time: End time in seconds.
+
+        Returns:
+            Start and end offset of the range.
+        """
+        file_size = os.path.getsize(file_path)
+        index_path = file_path[:-len('.log')] + '.idx'
+        if (start_time is None and end_time is None) or self._read_index_header(index_path) is None:
+            return 0, file_size
+        with open(index_path, 'rb') as f:
+            data = f.read()[_index_header.size:]
+        entries = list(_index_entry.iter_unpack(data[:len(data) - len(data) % _index_entry.size]))
+        times = list(map(lambda entry: entry[0], entries))
+        start_offset = 0
+        end_offset = file_size
+        if start_time is not None:
+            position = bisect_right(times, self._get_epoch_range(start_time)[0])
+            if position > 0:
+                start_offset = min(entries[position - 1][1], file_size)
+        if end_time is not None:
+            position = bisect_left(times, self._get_epoch_range(end_time)[1])
+            if position < len(entries):
+                end_offset = min(entries[position][1], file_size)
+        return start_offset, max(start_offset, end_offset)
+
+    def _iterate_log_file(self, file_path: str, start_time: Optional[float],
+                          end_time: Optional[float]) -> Iterator[List[str]]:
+        offset, end_offset = self._get_log_file_range(file_path, start_time, end_time)
+        with open(file_path, 'rb') as f:
+            f.seek(offset)
+            remainder = b''
+            while offset < end_offset:
+                data = remainder + f.read(min(self._readBlockSize, end_offset - offset))
+                offset = f.tell()
+                if offset < end_offset:
+                    # keep the incomplete last line for the next block
+                    last_line_end = data.rfind(b'\r') + 1
+                    data, remainder = data[:last_line_end], data[last_line_end:]
+                else:
+                    remainder = b''
+                lines = data.decode('utf-8').splitlines()
+                if len(lines):
+                    yield lines
+
+    def _iterate_price_files(self, account_id: str, start_time: Optional[float],
+                             end_time: Optional[float]) -> Iterator[tuple]:
+        folders = os.listdir(self._root)
+        folders.sort()
+        for folder in folders:
+            file_path = f'{self._root}/{folder}/{account_id}.prices'
+            if os.path.exists(file_path):
+                with open(file_path, 'rb') as f:
+                    if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+                        self._logger.warn(f'{account_id}: skipping price file {file_path} with unknown format')
+                        continue
+                    try:
+                        for record in read_chunks(f, start_time, end_time):
+                            yield record
+                    except Exception as err:
+                        self._logger.warn(f'{account_id}: failed to read price file {file_path} ' +
+                                          string_format_error(err))
 
     async def _delete_old_data(self):
         """Deletes folders when the folder limit is exceeded."""
-        contents = os.listdir(self._root)
-        contents.sort()
-        for folder_name in list(reversed(contents))[self._fileNumberLimit:]:
-            shutil.rmtree(f'{self._root}/{folder_name}')
+        await self._fileIOExecutor.run(self._delete_old_folders)
+
+    def _delete_old_folders(self):
+        with self._fileHandlesLock:
+            contents = os.listdir(self._root)
+            contents.sort()
+            for folder_name in list(reversed(contents))[self._fileNumberLimit:]:
+                self._close_files(list(filter(lambda file_path: file_path.startswith(
+                    f'{self._root}/{folder_name}/'), self._fileHandles.keys())))
+                shutil.rmtree(f'{self._root}/{folder_name}')
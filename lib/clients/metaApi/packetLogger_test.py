@@ -1,13 +1,16 @@
 import pytest
 from mock import patch
 from .packetLogger import PacketLogger
+from .priceRecordFormat import PriceRecordEncoder
 from typing import Dict
 from copy import deepcopy
 from ...metaApi.models import date
 from asyncio import sleep
 import shutil
+import threading
 import json
 import os
+import time
 from freezegun import freeze_time
 start_time = '2020-10-10 00:00:01.000'
 packets = {}
@@ -230,6 +233,99 @@ class TestPacketLogger:
         assert result[2]['message'] == 'Recorded price packets 1-4, instanceIndex: 7'
         assert json.loads(result[3]['message']) == change_sn(packets['prices'], 6)
 
+    @pytest.mark.asyncio
+    async def test_record_packets_as_they_were_logged(self):
+        """Should record packets as they were when logged if packets are modified afterwards."""
+        account_information = deepcopy(packets['accountInformation'])
+        first_prices = deepcopy(packets['prices'])
+        last_prices = change_sn(packets['prices'], 3)
+        packet_logger.log_packet(account_information)
+        packet_logger.log_packet(first_prices)
+        packet_logger.log_packet(change_sn(packets['prices'], 2))
+        packet_logger.log_packet(last_prices)
+        account_information['accountInformation']['balance'] = 0
+        first_prices['prices'] = []
+        last_prices['prices'] = []
+        packet_logger.log_packet(change_sn(packets['prices'], 5))
+        await sleep(0.04)
+        result = await packet_logger.read_logs('accountId')
+        assert json.loads(result[0]['message']) == packets['accountInformation']
+        assert json.loads(result[1]['message']) == packets['prices']
+        assert json.loads(result[2]['message']) == change_sn(packets['prices'], 3)
+        assert result[3]['message'] == 'Recorded price packets 1-3, instanceIndex: 7'
+        assert json.loads(result[4]['message']) == change_sn(packets['prices'], 5)
+
+    @pytest.mark.asyncio
+    async def test_record_price_packets_in_binary_files(self):
+        """Should record all price packets to binary price files if price recording enabled."""
+        global packet_logger
+        packet_logger.stop()
+        packet_logger = PacketLogger({'recordPrices': True})
+        packet_logger.start()
+        packet_logger.log_packet(packets['prices'])
+        packet_logger.log_packet(change_sn(packets['prices'], 2))
+        packet_logger.log_packet(change_sn(packets['prices'], 3))
+        packet_logger.log_packet(packets['accountInformation'])
+        await sleep(0.04)
+        packet_logger.log_packet(change_sn(packets['prices'], 4))
+        await sleep(0.04)
+        prices = await packet_logger.read_prices('accountId')
+        assert list(map(lambda record: record['packet'], prices)) == [
+            packets['prices'], change_sn(packets['prices'], 2), change_sn(packets['prices'], 3),
+            change_sn(packets['prices'], 4)]
+        result = await packet_logger.read_logs('accountId')
+        assert len(result) == 1
+        assert json.loads(result[0]['message']) == packets['accountInformation']
+
+    @pytest.mark.asyncio
+    async def test_encode_price_packets_when_logged(self):
+        """Should encode price packets when logged and write only encoded chunks in file IO thread."""
+        global packet_logger
+        packet_logger.stop()
+        packet_logger = PacketLogger({'recordPrices': True})
+        packet_logger.start()
+        threads = []
+        add = PriceRecordEncoder.add
+
+        def record_thread(encoder, packet, time):
+            threads.append(threading.current_thread())
+            add(encoder, packet, time)
+
+        packet = deepcopy(packets['prices'])
+        with patch('lib.clients.metaApi.packetLogger.PriceRecordEncoder.add', new=record_thread):
+            packet_logger.log_packet(packet)
+            packet['prices'][0]['bid'] = 2
+            assert threads == [threading.main_thread()]
+            write_log_files = packet_logger._write_log_files
+            with patch.object(packet_logger, '_write_log_files', wraps=write_log_files) as write_log_files_mock:
+                await packet_logger._append_logs()
+            assert isinstance(write_log_files_mock.call_args[0][2], bytes)
+        assert 'accountId' not in packet_logger._priceEncoders
+        prices = await packet_logger.read_prices('accountId')
+        assert list(map(lambda record: record['packet'], prices)) == [packets['prices']]
+
+    @pytest.mark.asyncio
+    async def test_read_prices_within_bounds(self):
+        """Should read recorded price packets within bounds."""
+        global packet_logger
+        packet_logger.stop()
+        packet_logger = PacketLogger({'recordPrices': True})
+        packet_logger.start()
+        with freeze_time(start_time) as frozen_datetime:
+            packet_logger.log_packet(packets['prices'])
+            await sleep(0.04)
+            frozen_datetime.move_to('2020-10-10 01:00:01.000')
+            packet_logger.log_packet(change_sn(packets['prices'], 2))
+            packet_logger.log_packet(change_sn(packets['prices'], 3))
+            await sleep(0.04)
+            frozen_datetime.move_to('2020-10-10 01:30:01.000')
+            packet_logger.log_packet(change_sn(packets['prices'], 4))
+            await sleep(0.04)
+            prices = await packet_logger.read_prices('accountId', date('2020-10-10 00:30:00.000'),
+                                                     date('2020-10-10 01:30:00.000'))
+            assert list(map(lambda record: record['packet']['sequenceNumber'], prices)) == [2, 3]
+            assert prices[0]['date'] == date('2020-10-10 01:00:01.000')
+
     @pytest.mark.asyncio
     async def test_read_logs_within_bounds(self):
         """Should read logs within bounds."""
@@ -286,3 +382,153 @@ class TestPacketLogger:
             folder_list = os.listdir(folder)
             folder_list.sort()
             assert folder_list == ['2020-10-10-01', '2020-10-10-02', '2020-10-10-03']
+
+    @pytest.mark.asyncio
+    async def test_rotate_files_at_file_size_boundary(self):
+        """Should write messages to the file of the period they were logged in."""
+        with freeze_time('2020-10-10 03:59:59.900') as frozen_datetime:
+            packet_logger.log_packet(packets['accountInformation'])
+            frozen_datetime.move_to('2020-10-10 04:00:00.100')
+            packet_logger.log_packet(change_sn(packets['accountInformation'], 2))
+            await sleep(0.04)
+            with open(folder + '2020-10-10-00/accountId.log') as f:
+                assert len(f.readlines()) == 1
+            with open(folder + '2020-10-10-01/accountId.log') as f:
+                assert len(f.readlines()) == 1
+            result = await packet_logger.read_logs('accountId')
+            assert list(map(lambda message: message['date'], result)) == \
+                [date('2020-10-10 03:59:59.900'), date('2020-10-10 04:00:00.100')]
+            assert json.loads(result[1]['message']) == change_sn(packets['accountInformation'], 2)
+            assert list(packet_logger._fileHandles.keys()) == [folder + '2020-10-10-01/accountId.log',
+                                                               folder + '2020-10-10-01/accountId.idx']
+
+    @pytest.mark.asyncio
+    async def test_limit_open_files(self):
+        """Should keep a limited number of log files open."""
+        global packet_logger
+        packet_logger.stop()
+        packet_logger = PacketLogger({'openFileAccountLimit': 1})
+        packet_logger.start()
+        assert packet_logger._maxOpenFiles == 3
+        packet_logger._maxOpenFiles = 2
+        for i in range(3):
+            packet_logger.log_packet({**packets['accountInformation'], 'accountId': f'accountId{i}'})
+            await sleep(0.04)
+        packet_logger.log_packet({**packets['accountInformation'], 'accountId': 'accountId0'})
+        await sleep(0.04)
+        assert len(packet_logger._fileHandles) == 2
+        assert len(await packet_logger.read_logs('accountId0')) == 2
+        assert len(await packet_logger.read_logs('accountId1')) == 1
+
+    @pytest.mark.asyncio
+    async def test_read_logs_using_time_index(self):
+        """Should read only the part of log file within bounds using time index."""
+        packet_logger._indexLineInterval = 2
+        packet_logger._readBlockSize = 100
+        with freeze_time(start_time) as frozen_datetime:
+            for i in range(10):
+                frozen_datetime.move_to(f'2020-10-10 00:{i:02d}:01.000')
+                packet_logger.log_packet(change_sn(packets['accountInformation'], i))
+                if i % 3 == 2:
+                    await sleep(0.04)
+            await sleep(0.04)
+        file_path = folder + '2020-10-10-00/accountId.log'
+        assert packet_logger._get_log_file_range(file_path, None, None) == (0, os.path.getsize(file_path))
+        start_offset, end_offset = packet_logger._get_log_file_range(
+            file_path, date('2020-10-10 00:04:30.000').timestamp(), date('2020-10-10 00:06:30.000').timestamp())
+        assert 0 < start_offset < end_offset < os.path.getsize(file_path)
+        with open(file_path, 'rb') as f:
+            f.seek(start_offset)
+            assert f.read(end_offset - start_offset).count(b'\r') == 5
+        result = await packet_logger.read_logs('accountId', date('2020-10-10 00:04:30.000'),
+                                               date('2020-10-10 00:06:30.000'))
+        assert list(map(lambda message: json.loads(message['message'])['sequenceNumber'], result)) == [5, 6]
+        result = await packet_logger.read_logs('accountId')
+        assert list(map(lambda message: json.loads(message['message'])['sequenceNumber'], result)) == \
+            list(range(10))
+
+    @pytest.mark.asyncio
+    async def test_skip_folders_outside_of_bounds(self):
+        """Should skip log folders outside of bounds."""
+        with freeze_time(start_time) as frozen_datetime:
+            packet_logger.log_packet(packets['accountInformation'])
+            await sleep(0.04)
+            frozen_datetime.move_to('2020-10-10 05:10:00.000')
+            packet_logger.log_packet(packets['accountInformation'])
+            await sleep(0.04)
+            frozen_datetime.move_to('2020-10-10 09:10:00.000')
+            packet_logger.log_packet(packets['accountInformation'])
+            await sleep(0.04)
+        assert packet_logger._get_log_file_paths('accountId', date('2020-10-10 04:00:00.000').timestamp(),
+                                                 date('2020-10-10 08:00:00.000').timestamp()) == \
+            [folder + '2020-10-10-01/accountId.log']
+        assert packet_logger._get_log_file_paths('accountId', date('2020-10-10 05:00:00.000').timestamp(),
+                                                 None) == \
+            [folder + '2020-10-10-01/accountId.log', folder + '2020-10-10-02/accountId.log']
+        assert len(await packet_logger.read_logs('accountId', date('2020-10-10 04:00:00.000'),
+                                                 date('2020-10-10 08:00:00.000'))) == 1
+
+    @pytest.mark.asyncio
+    async def test_skip_folders_written_with_other_file_size(self):
+        """Should derive folder bounds from the file size setting the folder was written with."""
+        global packet_logger
+        packet_logger.stop()
+        packet_logger = PacketLogger({'fileNumberLimit': 3, 'logFileSizeInHours': 1})
+        packet_logger.start()
+        with freeze_time('2020-10-10 01:10:00.000'):
+            packet_logger.log_packet(packets['accountInformation'])
+            await sleep(0.04)
+        packet_logger.stop()
+        packet_logger = PacketLogger({'fileNumberLimit': 3, 'logFileSizeInHours': 4})
+        packet_logger.start()
+        assert len(await packet_logger.read_logs('accountId', date('2020-10-10 01:00:00.000'),
+                                                 date('2020-10-10 02:00:00.000'))) == 1
+        with freeze_time('2020-10-10 05:10:00.000'):
+            packet_logger.log_packet(packets['accountInformation'])
+            await sleep(0.04)
+        assert packet_logger._read_index_header(folder + '2020-10-10-01/accountId.idx') == 0
+        assert len(await packet_logger.read_logs('accountId', date('2020-10-10 01:00:00.000'),
+                                                 date('2020-10-10 02:00:00.000'))) == 1
+        assert len(await packet_logger.read_logs('accountId', date('2020-10-10 05:00:00.000'),
+                                                 date('2020-10-10 06:00:00.000'))) == 1
+
+    @pytest.mark.asyncio
+    async def test_read_logs_on_dst_fall_back(self):
+        """Should read logs within bounds when local time goes back on DST fall-back."""
+        tz = os.environ.get('TZ')
+        os.environ['TZ'] = 'Europe/London'
+        time.tzset()
+        try:
+            packet_logger._indexLineInterval = 1
+            # local time goes back from 02:00 BST to 01:00 GMT on 2020-10-25
+            lines = ['[2020-10-25 01:30:00.000] first\r', '[2020-10-25 01:10:00.000] second\r',
+                     '[2020-10-25 01:40:00.000] third\r']
+            times = [date('2020-10-25T00:30:00Z').timestamp(), date('2020-10-25T01:10:00Z').timestamp(),
+                     date('2020-10-25T01:40:00Z').timestamp()]
+            packet_logger._write_log_files('accountId', [('2020-10-25-00', lines, times)])
+            result = await packet_logger.read_logs('accountId', date('2020-10-25 01:00:00.000'),
+                                                   date('2020-10-25 01:20:00.000'))
+            assert list(map(lambda message: message['message'], result)) == ['second']
+            result = await packet_logger.read_logs('accountId', date('2020-10-25 01:20:00.000'),
+                                                   date('2020-10-25 01:50:00.000'))
+            assert list(map(lambda message: message['message'], result)) == ['first', 'third']
+        finally:
+            if tz is None:
+                del os.environ['TZ']
+            else:
+                os.environ['TZ'] = tz
+            time.tzset()
+
+    @pytest.mark.asyncio
+    async def test_stream_logs(self):
+        """Should stream log messages in batches."""
+        packet_logger._readBlockSize = 100
+        for i in range(5):
+            packet_logger.log_packet(change_sn(packets['accountInformation'], i))
+        await sleep(0.04)
+        batches = []
+        async for messages in packet_logger.stream_logs('accountId'):
+            batches.append(messages)
+        assert len(batches) == 5
+        assert list(map(lambda messages: json.loads(messages[0]['message']), batches)) == \
+            list(map(lambda i: change_sn(packets['accountInformation'], i), range(5)))
@@ -1,10 +1,14 @@
 import asyncio
+import heapq
+from itertools import count
 from typing import Dict, List
 from datetime import datetime
+from .instanceKey import InstanceDict, InstanceKey
 
 
 class PacketOrderer:
-    """Class which orders the synchronization packets."""
+    """Class which orders the synchronization packets. Out-of-order packets of each instance wait in a heap ordered by
+    sequence number, so that adding and draining packets takes logarithmic time."""
 
     def __init__(self, out_of_order_listener, ordering_timeout_in_seconds: float):
         """Inits the class.
@@ -18,15 +22,16 @@ class PacketOrderer:
         self._isOutOfOrderEmitted = {}
         self._waitListSizeLimit = 100
         self._outOfOrderInterval = None
-        self._sequenceNumberByInstance = {}
-        self._lastSessionStartTimestamp = {}
-        self._packetsByInstance = {}
+        self._sequenceNumberByInstance = InstanceDict()
+        self._lastSessionStartTimestamp = InstanceDict()
+        self._packetsByInstance = InstanceDict()
+        self._waitListCounter = count()
 
     def start(self):
         """Initializes the packet orderer"""
-        self._sequenceNumberByInstance = {}
-        self._lastSessionStartTimestamp = {}
-        self._packetsByInstance = {}
+        self._sequenceNumberByInstance = InstanceDict()
+        self._lastSessionStartTimestamp = InstanceDict()
+        self._packetsByInstance = InstanceDict()
 
         async def emit_events():
             while True:
@@ -49,10 +54,10 @@ class PacketOrderer:
             packet: Packet to process.
 
         """
-        instance_id = packet['accountId'] + ':' + str(packet['instanceIndex'] if 'instanceIndex' in packet else 0) + \
-            ':' + (packet['host'] if 'host' in packet else '0')
         if 'sequenceNumber' not in packet:
             return [packet]
+        instance_id = InstanceKey.of(packet['accountId'], packet['instanceIndex'] if 'instanceIndex' in packet else 0,
+                                     packet['host'] if 'host' in packet else '0')
         if packet['type'] == 'synchronizationStarted' and 'synchronizationId' in packet and (
                 instance_id not in self._lastSessionStartTimestamp or self._lastSessionStartTimestamp[instance_id] <
                 packet['sequenceTimestamp']):
@@ -60,11 +65,12 @@ class PacketOrderer:
             self._isOutOfOrderEmitted[instance_id] = False
             self._sequenceNumberByInstance[instance_id] = packet['sequenceNumber']
             self._lastSessionStartTimestamp[instance_id] = packet['sequenceTimestamp']
-            self._packetsByInstance[instance_id] = \
-                list(filter(lambda wait_packet: wait_packet['packet']['sequenceTimestamp'] >=
-                            packet['sequenceTimestamp'],
-                            (self._packetsByInstance[instance_id] if instance_id in
-                             self._packetsByInstance else [])))
+            wait_list = list(filter(lambda wait_item: wait_item[2]['packet']['sequenceTimestamp'] >=
+                                    packet['sequenceTimestamp'],
+                                    (self._packetsByInstance[instance_id] if instance_id in
+                                     self._packetsByInstance else [])))
+            heapq.heapify(wait_list)
+            self._packetsByInstance[instance_id] = wait_list
             return [packet] + self._find_next_packets_from_wait_list(instance_id)
         elif instance_id in self._lastSessionStartTimestamp and \
                 packet['sequenceTimestamp'] < self._lastSessionStartTimestamp[instance_id]:
@@ -86,17 +92,18 @@ class PacketOrderer:
             self._packetsByInstance[instance_id] = self._packetsByInstance[instance_id] \
                 if instance_id in self._packetsByInstance else []
             wait_list = self._packetsByInstance[instance_id]
-            wait_list.append({
+            # heap items are ordered by sequence number and then by arrival, the counter also keeps packet dicts
+            # from being compared
+            heapq.heappush(wait_list, (packet['sequenceNumber'], next(self._waitListCounter), {
                 'instanceId': instance_id,
                 'accountId': packet['accountId'],
                 'instanceIndex': packet['instanceIndex'] if 'instanceIndex' in packet else 0,
                 'sequenceNumber': packet['sequenceNumber'],
                 'packet': packet,
                 'receivedAt': datetime.now()
-            })
-            wait_list.sort(key=lambda i: i['sequenceNumber'])
+            }))
             while len(wait_list) > self._waitListSizeLimit:
-                wait_list.pop(0)
+                heapq.heappop(wait_list)
             return []
 
     def on_stream_closed(self, instance_id: str):
@@ -118,47 +125,41 @@ class PacketOrderer:
         Args:
             reconnect_account_ids: Reconnected account ids.
         """
-        for instance_id in list(self._packetsByInstance.keys()):
-            if self._get_account_id_from_instance(instance_id) in reconnect_account_ids:
-                del self._packetsByInstance[instance_id]
-        for instance_id in list(self._lastSessionStartTimestamp.keys()):
-            if self._get_account_id_from_instance(instance_id) in reconnect_account_ids:
-                del self._lastSessionStartTimestamp[instance_id]
-        for instance_id in list(self._sequenceNumberByInstance.keys()):
-            if self._get_account_id_from_instance(instance_id) in reconnect_account_ids:
-                del self._sequenceNumberByInstance[instance_id]
-
-    def _get_account_id_from_instance(self, instance_id: str) -> str:
-        return instance_id.split(':')[0]
+        for account_id in reconnect_account_ids:
+            for instances in [self._packetsByInstance, self._lastSessionStartTimestamp,
+                              self._sequenceNumberByInstance]:
+                for instance_id in instances.get_account_keys(account_id):
+                    del instances[instance_id]
 
     def _find_next_packets_from_wait_list(self, instance_id) -> List:
         result = []
         wait_list = self._packetsByInstance[instance_id] if instance_id in self._packetsByInstance else []
-        while len(wait_list) and (wait_list[0]['sequenceNumber'] in [
+        while len(wait_list) and (wait_list[0][0] in [
                 self._sequenceNumberByInstance[instance_id], self._sequenceNumberByInstance[instance_id] + 1] or
-                wait_list[0]['packet']['sequenceTimestamp'] < self._lastSessionStartTimestamp[instance_id]):
-            if wait_list[0]['packet']['sequenceTimestamp'] >= self._lastSessionStartTimestamp[instance_id]:
-                result.append(wait_list[0]['packet'])
-                if wait_list[0]['packet']['sequenceNumber'] == self._sequenceNumberByInstance[instance_id] + 1:
+                wait_list[0][2]['packet']['sequenceTimestamp'] < self._lastSessionStartTimestamp[instance_id]):
+            packet = heapq.heappop(wait_list)[2]['packet']
+            if packet['sequenceTimestamp'] >= self._lastSessionStartTimestamp[instance_id]:
+                result.append(packet)
+                if packet['sequenceNumber'] == self._sequenceNumberByInstance[instance_id] + 1:
                     self._sequenceNumberByInstance[instance_id] += 1
-                    self._lastSessionStartTimestamp[instance_id] = wait_list[0]['packet']['sequenceTimestamp'] if \
-                        'sequenceTimestamp' in wait_list[0]['packet'] else self._lastSessionStartTimestamp[instance_id]
-            wait_list.pop(0)
+                    self._lastSessionStartTimestamp[instance_id] = packet['sequenceTimestamp'] if \
+                        'sequenceTimestamp' in packet else self._lastSessionStartTimestamp[instance_id]
         if not len(wait_list) and instance_id in self._packetsByInstance:
             del self._packetsByInstance[instance_id]
         return result
 
     def _emit_out_of_order_events(self):
         for key, wait_list in self._packetsByInstance.items():
-            if len(wait_list) and \
-                    (wait_list[0][
-                         'receivedAt'].timestamp() + self._orderingTimeoutInSeconds) < datetime.now().timestamp():
-                instance_id = wait_list[0]['instanceId']
+            if not len(wait_list):
+                continue
+            wait_item = wait_list[0][2]
+            if (wait_item['receivedAt'].timestamp() + self._orderingTimeoutInSeconds) < datetime.now().timestamp():
+                instance_id = wait_item['instanceId']
                 if instance_id not in self._isOutOfOrderEmitted or not self._isOutOfOrderEmitted[instance_id]:
                     self._isOutOfOrderEmitted[instance_id] = True
                     # Do not emit onOutOfOrderPacket for packets that come before synchronizationStarted
                     if instance_id in self._sequenceNumberByInstance:
                         asyncio.create_task(self._outOfOrderListener.on_out_of_order_packet(
-                            wait_list[0]['accountId'], wait_list[0]['instanceIndex'],
+                            wait_item['accountId'], wait_item['instanceIndex'],
                             self._sequenceNumberByInstance[instance_id] + 1,
-                            wait_list[0]['sequenceNumber'], wait_list[0]['packet'], wait_list[0]['receivedAt']))
+                            wait_item['sequenceNumber'], wait_item['packet'], wait_item['receivedAt']))
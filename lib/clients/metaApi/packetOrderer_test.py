@@ -222,8 +222,8 @@ class TestPacketOrderer:
         }
         packet_orderer._sequenceNumberByInstance['accountId:0:ps-mpa-1'] = 1
         packet_orderer._packetsByInstance['accountId:0:ps-mpa-1'] = [
-            timed_out_packet,
-            not_timed_out_packet
+            (timed_out_packet['sequenceNumber'], 0, timed_out_packet),
+            (not_timed_out_packet['sequenceNumber'], 1, not_timed_out_packet)
         ]
         await asyncio.sleep(1)
         out_of_order_listener.on_out_of_order_packet.assert_called_once()
@@ -299,10 +299,10 @@ class TestPacketOrderer:
         }
         packet_orderer.restore_order(second_packet)
         assert len(packet_orderer._packetsByInstance['accountId:0:ps-mpa-1']) == 1
-        assert packet_orderer._packetsByInstance['accountId:0:ps-mpa-1'][0]['packet'] == second_packet
+        assert packet_orderer._packetsByInstance['accountId:0:ps-mpa-1'][0][2]['packet'] == second_packet
         packet_orderer.restore_order(third_packet)
         assert len(packet_orderer._packetsByInstance['accountId:0:ps-mpa-1']) == 1
-        assert packet_orderer._packetsByInstance['accountId:0:ps-mpa-1'][0]['packet'] == third_packet
+        assert packet_orderer._packetsByInstance['accountId:0:ps-mpa-1'][0][2]['packet'] == third_packet
 
     @pytest.mark.asyncio
     async def test_count_start_packets_with_no_sync_id_as_out_of_order(self):
@@ -316,7 +316,7 @@ class TestPacketOrderer:
         }
         assert packet_orderer.restore_order(start_packet) == []
         assert len(packet_orderer._packetsByInstance['accountId:0:ps-mpa-1']) == 1
-        assert packet_orderer._packetsByInstance['accountId:0:ps-mpa-1'][0]['packet'] == start_packet
+        assert packet_orderer._packetsByInstance['accountId:0:ps-mpa-1'][0][2]['packet'] == start_packet
 
     @pytest.mark.asyncio
     async def test_reset_on_reconnected(self):
@@ -342,8 +342,8 @@ class TestPacketOrderer:
         }
         packet_orderer._sequenceNumberByInstance['accountId:0:ps-mpa-1'] = 1
         packet_orderer._packetsByInstance['accountId:0:ps-mpa-1'] = [
-            timed_out_packet,
-            not_timed_out_packet
+            (timed_out_packet['sequenceNumber'], 0, timed_out_packet),
+            (not_timed_out_packet['sequenceNumber'], 1, not_timed_out_packet)
         ]
         packet_orderer.on_reconnected(['accountId'])
         await asyncio.sleep(1)
@@ -373,9 +373,27 @@ class TestPacketOrderer:
         }
         packet_orderer._sequenceNumberByInstance['accountId:0:ps-mpa-1'] = 1
         packet_orderer._packetsByInstance['accountId:0:ps-mpa-1'] = [
-            timed_out_packet,
-            not_timed_out_packet
+            (timed_out_packet['sequenceNumber'], 0, timed_out_packet),
+            (not_timed_out_packet['sequenceNumber'], 1, not_timed_out_packet)
         ]
         packet_orderer.on_stream_closed('accountId:0:ps-mpa-1')
         await asyncio.sleep(1)
         out_of_order_listener.on_out_of_order_packet.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_restore_order_of_shuffled_packets(self):
+        """Should restore order of shuffled packets and drop packets with lowest sequence numbers on overflow."""
+        packet_orderer._waitListSizeLimit = 5
+        start_packet = {'type': 'synchronizationStarted', 'sequenceTimestamp': 1603124267178, 'sequenceNumber': 1,
+                        'synchronizationId': 'synchronizationId', 'accountId': 'accountId', 'host': 'ps-mpa-1'}
+        packets = [{'type': 'prices', 'sequenceTimestamp': 1603124267178 + i, 'sequenceNumber': i,
+                    'accountId': 'accountId', 'host': 'ps-mpa-1'} for i in range(2, 9)]
+        packet_orderer.restore_order(start_packet)
+        for i in [5, 3, 6, 4, 8, 7]:
+            assert packet_orderer.restore_order(packets[i - 2]) == []
+        assert list(map(lambda wait_item: wait_item[0], sorted(
+            packet_orderer._packetsByInstance['accountId:0:ps-mpa-1']))) == [4, 5, 6, 7, 8]
+        assert packet_orderer.restore_order({**start_packet, 'sequenceNumber': 3,
+                                             'sequenceTimestamp': 1603124267180}) == \
+            [{**start_packet, 'sequenceNumber': 3, 'sequenceTimestamp': 1603124267180}] + packets[2:]
+        assert 'accountId:0:ps-mpa-1' not in packet_orderer._packetsByInstance
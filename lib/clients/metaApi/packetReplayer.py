@@ -0,0 +1,284 @@
+import asyncio
+import heapq
+import json
+import math
+from array import array
+from datetime import datetime
+from itertools import islice
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+from typing_extensions import TypedDict
+from .packetDateConverter import convert_packet_dates
+from .packetLogger import PacketLogger
+from .synchronizationListener import SynchronizationListener
+from ...metaApi.fileIOExecutor import FileIOExecutor
+
+
+class ListenerLatencyStats(TypedDict):
+    """Processing time of synchronization listener events."""
+
+    events: int
+    """Number of listener events processed."""
+    averageInMs: float
+    """Average event processing time in milliseconds."""
+    p99InMs: float
+    """99th percentile of event processing time in milliseconds."""
+    maxInMs: float
+    """Maximum event processing time in milliseconds."""
+
+
+class PacketReplayStats(TypedDict):
+    """Packet replay statistics."""
+
+    packets: int
+    """Number of packets queued for processing."""
+    skippedPackets: int
+    """Number of recorded packets which were not replayed, e.g. compressed specifications packets and packets
+    recorded before the first synchronization start of an instance."""
+    durationInSeconds: float
+    """Time from the start of replay until all queued packets were processed."""
+    packetsPerSecond: float
+    """Number of packets processed per second."""
+    maxDelayInSeconds: float
+    """Maximum time a packet was queued behind its schedule. Zero if replaying as fast as possible."""
+    listeners: Dict[str, ListenerLatencyStats]
+    """Event processing time by listener name."""
+
+
+class PacketReplayer:
+    """Replays packets recorded by packet logger through websocket client packet queue without network
+    connection, so that synchronization listeners can be benchmarked against recorded traffic. Packets are read from
+    packet log files and binary price files and queued in the order they were recorded, either at recorded speed,
+    accelerated or as fast as possible."""
+
+    def __init__(self, websocket_client, packet_logger: PacketLogger = None, region: str = 'vint-hill'):
+        """Inits the class.
+
+        Args:
+            websocket_client: MetaApi websocket client to queue packets to.
+            packet_logger: Packet logger to read recorded packets with.
+            region: Region to register replayed accounts in.
+        """
+        self._websocketClient = websocket_client
+        self._packetLogger = packet_logger or PacketLogger()
+        self._region = region
+
+    async def replay(self, account_id: str, listeners: List[SynchronizationListener] = None,
+                     date_after: datetime = None, date_before: datetime = None,
+                     speed: float = None) -> PacketReplayStats:
+        """Replays recorded packets of an account and waits until they are processed.
+
+        Args:
+            account_id: Account id.
+            listeners: Synchronization listeners to receive replayed packets and measure the latency of.
+            date_after: Date to replay packets recorded after.
+            date_before: Date to replay packets recorded before.
+            speed: Replay speed relative to recorded speed, e.g. 1 to replay at recorded speed or 10 to replay
+            10 times faster. Packets are replayed as fast as possible if not specified.
+
+        Returns:
+            A coroutine resolving with replay statistics.
+        """
+        listeners = listeners or []
+        durations = {}
+        instrumented_names = []
+        in_flight = [0]
+        sessions = {}
+        packet_count = 0
+        skipped_count = 0
+        max_delay = 0
+        loop = asyncio.get_event_loop()
+        first_record_time = None
+        self._websocketClient.add_account_cache(account_id, {self._region: account_id})
+        try:
+            for listener in listeners:
+                name = self._get_listener_name(listener, durations)
+                durations[name] = array('d')
+                instrumented_names.append(self._instrument_listener(listener, durations[name], in_flight))
+                self._websocketClient.add_synchronization_listener(account_id, listener)
+            start_time = loop.time()
+            async for record in self._read_records(account_id, date_after, date_before):
+                packet = record['packet']
+                if not self._prepare_packet(packet, sessions):
+                    skipped_count += 1
+                    continue
+                if speed:
+                    record_time = record['date'].timestamp()
+                    if first_record_time is None:
+                        first_record_time = record_time
+                    delay = loop.time() - start_time - (record_time - first_record_time) / speed
+                    if delay < 0:
+                        await asyncio.sleep(-delay)
+                    else:
+                        max_delay = max(max_delay, delay)
+                        await asyncio.sleep(0)
+                else:
+                    await asyncio.sleep(0)
+                convert_packet_dates(packet)
+                self._websocketClient.queue_packet(packet)
+                packet_count += 1
+            while self._websocketClient.get_queued_event_count(account_id) or in_flight[0]:
+                await asyncio.sleep(0.001)
+            duration = loop.time() - start_time
+        finally:
+            for listener, names in zip(listeners, instrumented_names):
+                self._websocketClient.remove_synchronization_listener(account_id, listener)
+                for name in names:
+                    delattr(listener, name)
+            self._websocketClient.remove_account_cache(account_id)
+        return {
+            'packets': packet_count,
+            'skippedPackets': skipped_count,
+            'durationInSeconds': duration,
+            'packetsPerSecond': packet_count / duration if duration else 0,
+            'maxDelayInSeconds': max_delay,
+            'listeners': {name: self._get_latency_stats(listener_durations)
+                          for name, listener_durations in durations.items()}
+        }
+
+    async def _read_records(self, account_id: str, date_after: Optional[datetime],
+                            date_before: Optional[datetime]) -> AsyncIterator[Dict]:
+        """Reads packets recorded in log files and price files in the order they were recorded.
+
+        Args:
+            account_id: Account id.
+            date_after: Date to read packets recorded after.
+            date_before: Date to read packets recorded before.
+
+        Returns:
+            Async iterator over records with date and packet fields.
+        """
+        records = self._merge_records(account_id, date_after, date_before)
+        file_io_executor = FileIOExecutor.get_instance()
+        try:
+            while True:
+                batch = await file_io_executor.run(lambda: list(islice(records, 1000)))
+                if not len(batch):
+                    break
+                for record in batch:
+                    yield record
+        finally:
+            records.close()
+
+    def _merge_records(self, account_id: str, date_after: Optional[datetime],
+                       date_before: Optional[datetime]) -> Iterator[Dict]:
+        """Merges packets recorded in log files and price files lazily, so that only the chunks being merged are
+        loaded into memory. Record times have millisecond precision, so records logged within the same millisecond
+        are ordered by sequence.
+
+        Args:
+            account_id: Account id.
+            date_after: Date to read packets recorded after.
+            date_before: Date to read packets recorded before.
+
+        Returns:
+            Iterator over records with date and packet fields, which should be advanced in file IO thread.
+        """
+        def log_records():
+            for messages in self._packetLogger.iterate_logs(account_id, date_after, date_before):
+                for message in messages:
+                    try:
+                        packet = json.loads(message['message'])
+                    except ValueError:
+                        # not a packet, e.g. a note about compressed price packets
+                        continue
+                    yield {'date': message['date'], 'packet': packet}
+
+        yield from heapq.merge(log_records(), self._packetLogger.iterate_prices(account_id, date_after, date_before),
+                               key=lambda record: (record['date'], *self._get_sequence(record['packet'])))
+
+    @staticmethod
+    def _get_sequence(packet: Dict) -> tuple:
+        if not isinstance(packet, dict) or 'sequenceTimestamp' not in packet or 'sequenceNumber' not in packet:
+            return math.inf, math.inf
+        return packet['sequenceTimestamp'], packet['sequenceNumber']
+
+    @staticmethod
+    def _prepare_packet(packet: Dict, sessions: Dict) -> bool:
+        """Prepares a recorded packet for replay. Packet logger does not record all packets of a synchronization
+        sequence, e.g. status and keepalive packets and compressed price packets are omitted, so the packets of each
+        synchronization are renumbered to a gapless sequence in the order they were recorded, otherwise packet
+        orderer would wait for the missing packets.
+
+        Args:
+            packet: Recorded packet.
+            sessions: Sequence numbering state by instance.
+
+        Returns:
+            Whether the packet should be replayed.
+        """
+        if not isinstance(packet, dict) or 'type' not in packet or 'accountId' not in packet or \
+                packet['type'] in ['status', 'keepalive', 'noop']:
+            return False
+        if 'sequenceNumber' not in packet:
+            return True
+        instance = (packet['accountId'], packet['instanceIndex'] if 'instanceIndex' in packet else 0,
+                    packet['host'] if 'host' in packet else '0')
+        if packet['type'] == 'synchronizationStarted' and 'synchronizationId' in packet:
+            sessions[instance] = {
+                'recorded': packet['sequenceNumber'],
+                'replayed': sessions[instance]['replayed'] + 1 if instance in sessions else packet['sequenceNumber']
+            }
+        elif instance not in sessions:
+            # packets received before synchronization start can not be ordered
+            return False
+        elif packet['sequenceNumber'] != sessions[instance]['recorded']:
+            sessions[instance]['recorded'] = packet['sequenceNumber']
+            sessions[instance]['replayed'] += 1
+        packet['sequenceNumber'] = sessions[instance]['replayed']
+        return True
+
+    @staticmethod
+    def _get_listener_name(listener: SynchronizationListener, durations: Dict) -> str:
+        name = type(listener).__name__
+        index = 1
+        while name in durations:
+            index += 1
+            name = f'{type(listener).__name__}#{index}'
+        return name
+
+    @staticmethod
+    def _instrument_listener(listener: SynchronizationListener, durations: array, in_flight: List[int]) -> List[str]:
+        """Replaces event handlers of a listener instance with handlers which record processing time. The
+        listener class is not changed, so that the listener is handled by websocket client the same way.
+
+        Args:
+            listener: Synchronization listener.
+            durations: Array to add processing times to.
+            in_flight: Single item list with the number of events being processed.
+
+        Returns:
+            Names of replaced event handlers, which should be deleted from the listener instance to restore it.
+        """
+        loop = asyncio.get_event_loop()
+        names = []
+        for name in dir(type(listener)):
+            if not name.startswith('on_') or name in vars(listener) or \
+                    not asyncio.iscoroutinefunction(getattr(listener, name)):
+                continue
+
+            def instrument(handler):
+                async def instrumented_handler(*args, **kwargs):
+                    in_flight[0] += 1
+                    start_time = loop.time()
+                    try:
+                        return await handler(*args, **kwargs)
+                    finally:
+                        durations.append(loop.time() - start_time)
+                        in_flight[0] -= 1
+                return instrumented_handler
+
+            setattr(listener, name, instrument(getattr(listener, name)))
+            names.append(name)
+        return names
+
+    @staticmethod
+    def _get_latency_stats(durations: array) -> ListenerLatencyStats:
+        if not len(durations):
+            return {'events': 0, 'averageInMs': 0, 'p99InMs': 0, 'maxInMs': 0}
+        sorted_durations = sorted(durations)
+        return {
+            'events': len(durations),
+            'averageInMs': sum(durations) / len(durations) * 1000,
+            'p99InMs': sorted_durations[min(len(durations) - 1, math.ceil(len(durations) * 0.99) - 1)] * 1000,
+            'maxInMs': sorted_durations[-1] * 1000
+        }
@@ -0,0 +1,154 @@
+import asyncio
+import pytest
+import shutil
+from collections import deque
+from freezegun import freeze_time
+from mock import MagicMock
+from .metaApiWebsocket_client import MetaApiWebsocketClient
+from .packetLogger import PacketLogger
+from .packetReplayer import PacketReplayer
+from .synchronizationListener import SynchronizationListener
+from ...metaApi.models import date
+folder = './.metaapi/logs/'
+client: MetaApiWebsocketClient = None
+packet_logger: PacketLogger = None
+
+
+class RecordingListener(SynchronizationListener):
+
+    def __init__(self):
+        super().__init__()
+        self.events = []
+
+    async def on_synchronization_started(self, instance_index: str, specifications_updated: bool = True,
+                                         positions_updated: bool = True, orders_updated: bool = True,
+                                         synchronization_id: str = None):
+        self.events.append(('on_synchronization_started', synchronization_id))
+
+    async def on_account_information_updated(self, instance_index: str, account_information):
+        self.events.append(('on_account_information_updated', account_information['balance']))
+
+    async def on_symbol_price_updated(self, instance_index: str, price):
+        self.events.append(('on_symbol_price_updated', price['bid'], price['time']))
+
+
+def create_prices_packet(sequence_number: int, bid: float):
+    return {'type': 'prices', 'accountId': 'accountId', 'host': 'ps-mpa-1', 'instanceIndex': 0,
+            'sequenceNumber': sequence_number, 'sequenceTimestamp': 1603124267178 + sequence_number,
+            'prices': [{'symbol': 'EURUSD', 'bid': bid, 'ask': bid + 0.0001, 'time': '2020-04-15T02:45:06.521Z',
+                        'brokerTime': '2020-04-15 05:45:06.521'}]}
+
+
+def create_packets():
+    return [
+        create_prices_packet(1, 1.1),
+        {'type': 'synchronizationStarted', 'accountId': 'accountId', 'host': 'ps-mpa-1', 'instanceIndex': 0,
+         'sequenceNumber': 2, 'sequenceTimestamp': 1603124267180, 'synchronizationId': 'synchronizationId'},
+        {'type': 'accountInformation', 'accountId': 'accountId', 'host': 'ps-mpa-1', 'instanceIndex': 0,
+         'sequenceNumber': 3, 'sequenceTimestamp': 1603124267181, 'synchronizationId': 'synchronizationId',
+         'accountInformation': {'balance': 1000, 'equity': 1000}},
+        {'type': 'specifications', 'accountId': 'accountId', 'host': 'ps-mpa-1', 'instanceIndex': 0,
+         'sequenceNumber': 4, 'sequenceTimestamp': 1603124267182, 'specifications': []},
+        create_prices_packet(6, 1.2),
+        create_prices_packet(7, 1.3)
+    ]
+
+
+@pytest.fixture(autouse=True)
+async def run_around_tests():
+    global client, packet_logger
+    client = MetaApiWebsocketClient(MagicMock(), 'token', {'application': 'application',
+                                                           'disableInternalJobs': True})
+    packet_logger = PacketLogger({'recordPrices': True})
+    packet_logger.start()
+    yield
+    packet_logger.stop()
+    await client.close()
+    client._latencyService.stop()
+    shutil.rmtree(folder)
+
+
+class TestPacketReplayer:
+
+    @pytest.mark.asyncio
+    async def test_replay_recorded_packets(self):
+        """Should replay recorded packets to listeners."""
+        for packet in create_packets():
+            packet_logger.log_packet(packet)
+        await packet_logger._append_logs()
+        listener = RecordingListener()
+        stats = await PacketReplayer(client, packet_logger).replay('accountId', [listener])
+        assert listener.events == [
+            ('on_synchronization_started', 'synchronizationId'),
+            ('on_account_information_updated', 1000),
+            ('on_symbol_price_updated', 1.2, date('2020-04-15T02:45:06.521Z')),
+            ('on_symbol_price_updated', 1.3, date('2020-04-15T02:45:06.521Z'))
+        ]
+        assert stats['packets'] == 4
+        assert stats['skippedPackets'] == 2
+        assert stats['listeners']['RecordingListener']['events'] >= 4
+        assert stats['listeners']['RecordingListener']['maxInMs'] >= \
+            stats['listeners']['RecordingListener']['averageInMs']
+        assert 'on_symbol_price_updated' not in vars(listener)
+        assert 'accountId' not in client._synchronizationListeners or \
+            listener not in client._synchronizationListeners['accountId']
+        assert client._regionsByAccounts['accountId']['connections'] == 0
+
+    @pytest.mark.asyncio
+    async def test_wait_for_events_of_replayed_account_only(self):
+        """Should wait only for events of the replayed account to be processed."""
+        for packet in create_packets():
+            packet_logger.log_packet(packet)
+        await packet_logger._append_logs()
+        client._eventQueues['otherAccountId'] = deque([MagicMock()])
+        listener = RecordingListener()
+        stats = await asyncio.wait_for(PacketReplayer(client, packet_logger).replay('accountId', [listener]), 3)
+        assert stats['packets'] == 4
+        assert client.get_queued_event_count() == 1
+        assert client.get_queued_event_count('otherAccountId') == 1
+        assert client.get_queued_event_count('accountId') == 0
+        del client._eventQueues['otherAccountId']
+
+    @pytest.mark.asyncio
+    async def test_merge_records_lazily(self):
+        """Should merge log and price records lazily in the order they were recorded."""
+        for packet in create_packets():
+            packet_logger.log_packet(packet)
+        await packet_logger._append_logs()
+        replayer = PacketReplayer(client, packet_logger)
+        records = replayer._merge_records('accountId', None, None)
+        first_record = next(records)
+        assert first_record['packet']['sequenceNumber'] == 1
+        records.close()
+        records = list(replayer._merge_records('accountId', None, None))
+        assert list(map(lambda record: record['packet']['sequenceNumber'], records)) == [1, 2, 3, 4, 6, 7]
+
+    @pytest.mark.asyncio
+    async def test_replay_at_recorded_speed(self):
+        """Should replay packets at recorded speed multiplied by replay speed."""
+        packets = create_packets()
+        with freeze_time('2020-10-10 00:00:01.000') as frozen_datetime:
+            for packet in packets[:3]:
+                packet_logger.log_packet(packet)
+            await packet_logger._append_logs()
+            frozen_datetime.move_to('2020-10-10 00:00:03.000')
+            for packet in packets[4:]:
+                packet_logger.log_packet(packet)
+            await packet_logger._append_logs()
+        listener = RecordingListener()
+        stats = await PacketReplayer(client, packet_logger).replay(
+            'accountId', [listener], date('2020-10-10 00:00:00.000'), date('2020-10-10 00:00:04.000'), speed=10)
+        assert len(listener.events) == 4
+        assert 0.2 <= stats['durationInSeconds'] < 1
+
+    def test_renumber_recorded_packets(self):
+        """Should renumber recorded packets of a synchronization to a gapless sequence."""
+        sessions = {}
+        packets = create_packets()
+        assert list(map(lambda packet: PacketReplayer._prepare_packet(packet, sessions), packets)) == \
+            [False, True, True, True, True, True]
+        assert list(map(lambda packet: packet['sequenceNumber'], packets[1:])) == [2, 3, 4, 5, 6]
+        assert not PacketReplayer._prepare_packet({'type': 'specifications', 'sequenceNumber': 5}, sessions)
+        restarted = {**packets[1], 'sequenceNumber': 100, 'sequenceTimestamp': 1603124267190}
+        assert PacketReplayer._prepare_packet(restarted, sessions)
+        assert restarted['sequenceNumber'] == 7
@@ -0,0 +1,434 @@
+"""Binary format of price packet records written by packet logger.
+
+A price file starts with FILE_MAGIC followed by chunks. Each chunk is a header (CHUNK_MAGIC, size of compressed
+payload, time of first and last record in seconds) followed by zlib-compressed records. Records of a chunk are
+encoded against the previous records of the same chunk: sequence numbers, times and bid/ask prices of each symbol
+are stored as varint deltas, and the remaining fields of packets and quotes are stored only when they change, as a
+JSON diff. Chunks do not depend on each other, so chunks outside a time range can be skipped without decompressing.
+Decoding reconstructs packets equal to the logged ones.
+"""
+import json
+import math
+import struct
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from ...metaApi.models import date
+
+FILE_MAGIC = b'MAPRC\x00\x00\x01'
+CHUNK_MAGIC = b'PRCH'
+_chunk_header = struct.Struct('<4sIdd')
+_price_scale = 10 ** 8
+_epoch = datetime(1970, 1, 1)
+_has_sequence_number = 1
+_has_sequence_timestamp = 2
+_has_prices = 4
+_has_packet_diff = 8
+_has_bid = 1
+_has_ask = 2
+_has_time = 4
+_has_broker_time = 8
+_has_quote_diff = 16
+_milliseconds = {f'{value:03d}': value for value in range(1000)}
+
+
+def _write_varint(buffer: bytearray, value: int):
+    while value > 0x7f:
+        buffer.append((value & 0x7f) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _write_signed(buffer: bytearray, value: int):
+    value = value * 2 if value >= 0 else -value * 2 - 1
+    if value < 0x80:
+        buffer.append(value)
+    else:
+        _write_varint(buffer, value)
+
+
+def _read_varint(data: bytes, position: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, position
+        shift += 7
+
+
+def _read_signed(data: bytes, position: int) -> Tuple[int, int]:
+    value, position = _read_varint(data, position)
+    return (value >> 1) if not value & 1 else -((value + 1) >> 1), position
+
+
+def _write_json(buffer: bytearray, value) -> bytes:
+    data = json.dumps(value, separators=(',', ':')).encode('utf-8')
+    _write_varint(buffer, len(data))
+    buffer.extend(data)
+    return data
+
+
+def _read_json(data: bytes, position: int):
+    size, position = _read_varint(data, position)
+    return json.loads(data[position:position + size].decode('utf-8')), position + size
+
+
+def _encode_price(value) -> Optional[int]:
+    if type(value) is not float or not math.isfinite(value):
+        return None
+    scaled = round(value * _price_scale)
+    return scaled if scaled / _price_scale == value else None
+
+
+def _encode_time(value) -> Optional[int]:
+    if not isinstance(value, str) or len(value) != 24 or value[-1] != 'Z':
+        return None
+    try:
+        time = date(value)
+    except ValueError:
+        return None
+    milliseconds = round(time.timestamp() * 1000)
+    return milliseconds if _format_time(milliseconds) == value else None
+
+
+def _format_time(milliseconds: int) -> str:
+    return (_epoch + timedelta(milliseconds=milliseconds)).isoformat(timespec='milliseconds') + 'Z'
+
+
+def _encode_broker_time(value) -> Optional[int]:
+    if not isinstance(value, str) or len(value) != 23:
+        return None
+    try:
+        time = date(value)
+    except ValueError:
+        return None
+    milliseconds = round(time.timestamp() * 1000)
+    return milliseconds if _format_broker_time(milliseconds) == value else None
+
+
+def _format_broker_time(milliseconds: int) -> str:
+    return (_epoch + timedelta(milliseconds=milliseconds)).isoformat(sep=' ', timespec='milliseconds')
+
+
+def _diff(previous: Dict, current: Dict) -> Optional[List]:
+    if previous == current:
+        return None
+    changed = {}
+    common_count = 0
+    for key, value in current.items():
+        if key in previous:
+            common_count += 1
+            if previous[key] != value:
+                changed[key] = value
+        else:
+            changed[key] = value
+    removed = [key for key in previous.keys() if key not in current] if common_count < len(previous) else []
+    return [changed, removed] if len(changed) or len(removed) else None
+
+
+def _apply_diff(previous: Dict, diff: List) -> Dict:
+    result = dict(previous)
+    result.update(diff[0])
+    for key in diff[1]:
+        del result[key]
+    return result
+
+
+class PriceRecordEncoder:
+    """Encodes price packets of an account into chunks of the binary price format."""
+
+    def __init__(self):
+        """Inits the encoder."""
+        self._buffer = bytearray()
+        self._reset()
+
+    @property
+    def pending(self) -> bool:
+        """Returns whether there are records which are not returned in a chunk yet.
+
+        Returns:
+            Whether there are pending records.
+        """
+        return len(self._buffer) > 0
+
+    def add(self, packet: Dict, time: float):
+        """Encodes a price packet. The packet is encoded immediately, so it may be modified after the call.
+
+        Args:
+            packet: Price packet.
+            time: Time the packet was logged at, in seconds.
+        """
+        buffer = self._buffer
+        milliseconds = round(time * 1000)
+        if self._firstTime is None:
+            self._firstTime = time
+            self._time = round(time * 1000)
+        self._lastTime = time
+        _write_signed(buffer, milliseconds - self._time)
+        self._time = milliseconds
+        sequence_number = packet.get('sequenceNumber')
+        sequence_timestamp = packet.get('sequenceTimestamp')
+        prices = packet.get('prices')
+        flags = 0
+        if type(sequence_number) is int:
+            flags |= _has_sequence_number
+        if type(sequence_timestamp) is int:
+            flags |= _has_sequence_timestamp
+        if isinstance(prices, list) and all(isinstance(quote, dict) for quote in prices):
+            flags |= _has_prices
+        rest = packet.copy()
+        if flags & _has_sequence_number:
+            del rest['sequenceNumber']
+        if flags & _has_sequence_timestamp:
+            del rest['sequenceTimestamp']
+        if flags & _has_prices:
+            del rest['prices']
+        diff = _diff(self._packetRest, rest)
+        if diff is not None:
+            flags |= _has_packet_diff
+        buffer.append(flags)
+        if flags & _has_sequence_number:
+            _write_signed(buffer, sequence_number - self._sequenceNumber)
+            self._sequenceNumber = sequence_number
+        if flags & _has_sequence_timestamp:
+            _write_signed(buffer, sequence_timestamp - self._sequenceTimestamp)
+            self._sequenceTimestamp = sequence_timestamp
+        if diff is not None:
+            # state is restored from the written diff, so that it matches decoder state even if the packet is
+            # modified later
+            self._packetRest = _apply_diff(self._packetRest, json.loads(_write_json(buffer, diff)))
+        if flags & _has_prices:
+            _write_varint(buffer, len(prices))
+            for quote in prices:
+                self._add_quote(quote)
+
+    def flush(self) -> Optional[bytes]:
+        """Returns a chunk of records encoded since the previous flush and starts a new chunk.
+
+        Returns:
+            Chunk bytes or None if there are no records.
+        """
+        if not self.pending:
+            return None
+        payload = zlib.compress(bytes(self._buffer))
+        chunk = _chunk_header.pack(CHUNK_MAGIC, len(payload), self._firstTime, self._lastTime) + payload
+        self._buffer = bytearray()
+        self._reset()
+        return chunk
+
+    def _reset(self):
+        self._seconds = {}
+        self._firstTime = None
+        self._lastTime = None
+        self._time = 0
+        self._sequenceNumber = 0
+        self._sequenceTimestamp = 0
+        self._packetRest = {}
+        self._symbols = {}
+        self._quotes = {}
+
+    def _add_quote(self, quote: Dict):
+        buffer = self._buffer
+        symbol = quote.get('symbol')
+        if not isinstance(symbol, str):
+            symbol = None
+            _write_varint(buffer, 0)
+        elif symbol in self._symbols:
+            _write_varint(buffer, self._symbols[symbol])
+        else:
+            self._symbols[symbol] = len(self._symbols) + 1
+            _write_varint(buffer, self._symbols[symbol])
+            data = symbol.encode('utf-8')
+            _write_varint(buffer, len(data))
+            buffer.extend(data)
+        state = self._quotes.get(symbol)
+        if state is None:
+            state = {'bid': 0, 'ask': 0, 'time': 0, 'brokerTimeOffset': 0, 'rest': {}}
+            self._quotes[symbol] = state
+        # coded fields are removed from a copy of the quote, which keeps the order of the remaining fields
+        rest = quote.copy()
+        if symbol is not None:
+            del rest['symbol']
+        flags = 0
+        bid = _encode_price(quote.get('bid'))
+        if bid is not None:
+            flags |= _has_bid
+            del rest['bid']
+        ask = _encode_price(quote.get('ask'))
+        if ask is not None:
+            flags |= _has_ask
+            del rest['ask']
+        time = self._encode_quote_time(quote.get('time'), _encode_time)
+        if time is not None:
+            flags |= _has_time
+            del rest['time']
+        broker_time = self._encode_quote_time(quote.get('brokerTime'), _encode_broker_time) \
+            if time is not None else None
+        if broker_time is not None:
+            flags |= _has_broker_time
+            del rest['brokerTime']
+        diff = _diff(state['rest'], rest)
+        if diff is not None:
+            flags |= _has_quote_diff
+        buffer.append(flags)
+        if bid is not None:
+            _write_signed(buffer, bid - state['bid'])
+            state['bid'] = bid
+        if ask is not None:
+            _write_signed(buffer, ask - state['ask'])
+            state['ask'] = ask
+        if time is not None:
+            _write_signed(buffer, time - state['time'])
+            state['time'] = time
+        if broker_time is not None:
+            _write_signed(buffer, broker_time - time - state['brokerTimeOffset'])
+            state['brokerTimeOffset'] = broker_time - time
+        if diff is not None:
+            state['rest'] = _apply_diff(state['rest'], json.loads(_write_json(buffer, diff)))
+
+    def _encode_quote_time(self, value, encode: Callable[[str], Optional[int]]) -> Optional[int]:
+        """Encodes a quote time, parsing and validating the part of the time up to seconds once per chunk, since
+        quotes of the same second share it.
+
+        Args:
+            value: Quote time string.
+            encode: Function which encodes a time string or returns None if the time is not encoded losslessly.
+
+        Returns:
+            Time in milliseconds or None if the time is not encoded losslessly.
+        """
+        if type(value) is not str or len(value) < 23:
+            return None
+        milliseconds = _milliseconds.get(value[20:23])
+        if milliseconds is None:
+            return None
+        key = value[:20] + value[23:]
+        if key in self._seconds:
+            second = self._seconds[key]
+        else:
+            second = encode(value[:20] + '000' + value[23:])
+            self._seconds[key] = second
+        return second + milliseconds if second is not None else None
+
+
+def read_chunks(f, start_time: float = None, end_time: float = None) -> Iterator[Tuple[float, Dict]]:
+    """Reads price packets from a price file. Chunks which are entirely outside of the time range are skipped without
+    decompressing them.
+
+    Args:
+        f: File opened in binary mode and positioned after FILE_MAGIC.
+        start_time: Time in seconds to read records from, inclusive, or None.
+        end_time: Time in seconds to read records till, inclusive, or None.
+
+    Returns:
+        Iterator of record time in seconds and packet pairs.
+    """
+    while True:
+        header = f.read(_chunk_header.size)
+        if not len(header):
+            return
+        if len(header) < _chunk_header.size:
+            raise ValueError('Price file is truncated')
+        magic, size, first_time, last_time = _chunk_header.unpack(header)
+        if magic != CHUNK_MAGIC:
+            raise ValueError('Price file is corrupted')
+        if (start_time is not None and last_time < start_time) or (end_time is not None and first_time > end_time):
+            f.seek(size, 1)
+            continue
+        payload = f.read(size)
+        if len(payload) < size:
+            raise ValueError('Price file is truncated')
+        for time, packet in _decode_chunk(zlib.decompress(payload), first_time):
+            if (start_time is None or time >= start_time) and (end_time is None or time <= end_time):
+                yield time, packet
+
+
+def _decode_chunk(data: bytes, first_time: float) -> Iterator[Tuple[float, Dict]]:
+    position = 0
+    time = round(first_time * 1000)
+    sequence_number = 0
+    sequence_timestamp = 0
+    packet_rest = {}
+    symbols = [None]
+    quotes = {}
+    while position < len(data):
+        delta, position = _read_signed(data, position)
+        time += delta
+        flags = data[position]
+        position += 1
+        packet = {}
+        if flags & _has_sequence_number:
+            delta, position = _read_signed(data, position)
+            sequence_number += delta
+        if flags & _has_sequence_timestamp:
+            delta, position = _read_signed(data, position)
+            sequence_timestamp += delta
+        if flags & _has_packet_diff:
+            diff, position = _read_json(data, position)
+            packet_rest = _apply_diff(packet_rest, diff)
+        packet.update(packet_rest)
+        if flags & _has_sequence_number:
+            packet['sequenceNumber'] = sequence_number
+        if flags & _has_sequence_timestamp:
+            packet['sequenceTimestamp'] = sequence_timestamp
+        if flags & _has_prices:
+            count, position = _read_varint(data, position)
+            prices = []
+            for i in range(count):
+                quote, position = _decode_quote(data, position, symbols, quotes)
+                prices.append(quote)
+            packet['prices'] = prices
+        yield time / 1000, packet
+
+
+def _decode_quote(data: bytes, position: int, symbols: List, quotes: Dict) -> Tuple[Dict, int]:
+    index, position = _read_varint(data, position)
+    if index == len(symbols):
+        size, position = _read_varint(data, position)
+        symbols.append(data[position:position + size].decode('utf-8'))
+        position += size
+    symbol = symbols[index]
+    state = quotes.get(symbol)
+    if state is None:
+        state = {'bid': 0, 'ask': 0, 'time': 0, 'brokerTimeOffset': 0, 'rest': {}}
+        quotes[symbol] = state
+    flags = data[position]
+    position += 1
+    quote = {'symbol': symbol} if symbol is not None else {}
+    if flags & _has_bid:
+        delta, position = _read_signed(data, position)
+        state['bid'] += delta
+        quote['bid'] = state['bid'] / _price_scale
+    if flags & _has_ask:
+        delta, position = _read_signed(data, position)
+        state['ask'] += delta
+        quote['ask'] = state['ask'] / _price_scale
+    if flags & _has_time:
+        delta, position = _read_signed(data, position)
+        state['time'] += delta
+        quote['time'] = _format_time(state['time'])
+    if flags & _has_broker_time:
+        delta, position = _read_signed(data, position)
+        state['brokerTimeOffset'] += delta
+        quote['brokerTime'] = _format_broker_time(state['time'] + state['brokerTimeOffset'])
+    if flags & _has_quote_diff:
+        diff, position = _read_json(data, position)
+        state['rest'] = _apply_diff(state['rest'], diff)
+    quote.update(state['rest'])
+    return quote, position
+
+
+def get_log_time(time: datetime) -> float:
+    """Returns time of a record in seconds, using the same clock as the dates of text log lines, i.e. local time
+    treated as UTC and truncated to milliseconds.
+
+    Args:
+        time: Local time.
+
+    Returns:
+        Time in seconds.
+    """
+    return time.replace(microsecond=time.microsecond // 1000 * 1000, tzinfo=timezone.utc).timestamp()
@@ -0,0 +1,69 @@
+from .priceRecordFormat import PriceRecordEncoder, read_chunks
+from copy import deepcopy
+import io
+import json
+
+
+def create_packet(sequence_number: int, bid: float, ask: float):
+    return {
+        'type': 'prices', 'accountId': 'accountId', 'host': 'ps-mpa-1', 'instanceIndex': 0,
+        'sequenceNumber': sequence_number, 'sequenceTimestamp': 1603124267178 + sequence_number * 10,
+        'equity': 1000 + sequence_number / 100,
+        'timestamps': {'eventGenerated': '2020-04-15T02:45:06.521Z'},
+        'prices': [{
+            'symbol': 'EURUSD', 'bid': bid, 'ask': ask, 'profitTickValue': 1, 'lossTickValue': 1,
+            'time': f'2020-04-15T02:45:{sequence_number % 60:02d}.521Z',
+            'brokerTime': f'2020-04-15 05:45:{sequence_number % 60:02d}.521'
+        }]
+    }
+
+
+class TestPriceRecordFormat:
+
+    def test_restore_recorded_packets(self):
+        """Should restore recorded price packets."""
+        encoder = PriceRecordEncoder()
+        packets = [create_packet(i, 1.18 + i / 100000, 1.19 + i / 100000) for i in range(100)]
+        packets[10]['prices'].append({'symbol': 'USDJPY', 'bid': 103, 'ask': float('nan'), 'time': 'invalid'})
+        packets[11]['prices'].append({'bid': 1.2})
+        del packets[12]['sequenceNumber']
+        packets[13]['prices'][0]['brokerTime'] = '2020-04-15 05:45:06'
+        del packets[14]['equity']
+        packets[15]['prices'][0]['time'] = '2020-04-15T02:45:15.5a1Z'
+        packets[16]['prices'][0]['time'] = '2020-02-30T02:45:16.521Z'
+        packets[17]['prices'][0]['time'] = '2020-04-15T02:45:17.5210Z'
+        packets[18]['prices'][0]['brokerTime'] = '2020-04-15T05:45:18.521'
+        chunks = b''
+        for i, packet in enumerate(packets):
+            encoder.add(packet, 1000 + i)
+            if i == 49:
+                chunks += encoder.flush()
+        chunks += encoder.flush()
+        assert encoder.flush() is None
+        records = list(read_chunks(io.BytesIO(chunks)))
+        assert list(map(lambda record: record[0], records)) == list(range(1000, 1100))
+        assert json.dumps(list(map(lambda record: record[1], records)), sort_keys=True) == \
+            json.dumps(packets, sort_keys=True)
+        assert len(chunks) * 10 < len(json.dumps(packets))
+
+    def test_encode_packets_immediately(self):
+        """Should record packets as they were at the time they were added."""
+        encoder = PriceRecordEncoder()
+        packet = create_packet(1, 1.18, 1.19)
+        expected = deepcopy(packet)
+        encoder.add(packet, 1000)
+        packet['timestamps']['eventGenerated'] = 'modified'
+        packet['prices'][0]['bid'] = 1.2
+        assert list(read_chunks(io.BytesIO(encoder.flush()))) == [(1000, expected)]
+
+    def test_skip_chunks_outside_of_time_range(self):
+        """Should read records within time range only."""
+        encoder = PriceRecordEncoder()
+        chunks = b''
+        for i in range(10):
+            encoder.add(create_packet(i, 1.18, 1.19), 1000 + i)
+            if i % 3 == 2:
+                chunks += encoder.flush()
+        chunks += encoder.flush()
+        records = list(read_chunks(io.BytesIO(chunks), 1004, 1007))
+        assert list(map(lambda record: record[1]['sequenceNumber'], records)) == [4, 5, 6, 7]
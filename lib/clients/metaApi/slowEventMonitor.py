@@ -0,0 +1,91 @@
+import asyncio
+import math
+from collections import deque
+from typing import Dict
+from ...logger import LoggerManager
+
+
+class SlowEventMonitor:
+    """Tracks event processing time and reports events which take too long to process. A single timer is used to
+    scan the events in the order they were started, so that no task is created per event."""
+
+    def __init__(self, threshold_in_seconds: float = 1):
+        """Inits the class.
+
+        Args:
+            threshold_in_seconds: Processing time after which an event is considered slow, default is 1 second.
+        """
+        self._thresholdInSeconds = threshold_in_seconds
+        self._events = deque()
+        self._slowEventCounts = {}
+        self._timer: asyncio.TimerHandle or None = None
+        self._loop: asyncio.AbstractEventLoop or None = None
+        self._logger = LoggerManager.get_logger('MetaApiWebsocketClient')
+
+    @property
+    def slow_event_counts(self) -> Dict[str, int]:
+        """Returns the number of slow events registered per event name. Event labels contain account id and
+        instance index, so the counts are aggregated by the event name which ends the label, e.g.
+        on_symbol_prices_updated, to keep the number of counters bounded.
+
+        Returns:
+            Dictionary of slow event counts by event name.
+        """
+        return dict(self._slowEventCounts)
+
+    def event_started(self, label: str) -> Dict:
+        """Registers an event which has started processing.
+
+        Args:
+            label: Event label.
+
+        Returns:
+            Event record which should be passed to event_finished once the event is processed.
+        """
+        loop = asyncio.get_event_loop()
+        if self._loop is not loop:
+            self.stop()
+            self._loop = loop
+        event = {'label': label, 'startTime': loop.time(), 'done': False, 'long': False}
+        self._events.append(event)
+        if self._timer is None:
+            self._schedule_check(event['startTime'] + self._thresholdInSeconds)
+        return event
+
+    def event_finished(self, event: Dict):
+        """Marks event as processed. Does not report the processing time if the monitor was stopped meanwhile.
+
+        Args:
+            event: Event record returned by event_started.
+        """
+        event['done'] = True
+        if event['long'] and self._loop is not None:
+            self._logger.warn(f'{event["label"]}: finished in '
+                              f'{math.floor(self._loop.time() - event["startTime"])} seconds')
+
+    def stop(self):
+        """Stops the monitor and forgets the events being tracked."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._events.clear()
+        self._loop = None
+
+    def _schedule_check(self, when: float):
+        self._timer = self._loop.call_at(when, self._check_events)
+
+    def _check_events(self):
+        self._timer = None
+        deadline = self._loop.time() - self._thresholdInSeconds
+        events = self._events
+        while len(events) and (events[0]['done'] or events[0]['startTime'] <= deadline):
+            event = events.popleft()
+            if not event['done']:
+                event['long'] = True
+                name = event['label'].rsplit(':', 1)[-1]
+                self._slowEventCounts[name] = self._slowEventCounts.get(name, 0) + 1
+                self._logger.warn(f'{event["label"]}: event is taking more than '
+                                  f'{self._thresholdInSeconds} second{"" if self._thresholdInSeconds == 1 else "s"} '
+                                  'to process')
+        if len(events):
+            self._schedule_check(events[0]['startTime'] + self._thresholdInSeconds)
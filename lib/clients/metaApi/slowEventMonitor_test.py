@@ -0,0 +1,82 @@
+from .slowEventMonitor import SlowEventMonitor
+import pytest
+import asyncio
+from mock import MagicMock
+
+monitor: SlowEventMonitor = None
+
+
+@pytest.fixture(autouse=True)
+async def run_around_tests():
+    global monitor
+    monitor = SlowEventMonitor(0.1)
+    monitor._logger = MagicMock()
+    yield
+    monitor.stop()
+
+
+class TestSlowEventMonitor:
+    @pytest.mark.asyncio
+    async def test_report_slow_event(self):
+        """Should report events which take longer than threshold to process."""
+        event = monitor.event_started('accountId:vint-hill:0:ps-mpa-1:on_symbol_prices_updated')
+        await asyncio.sleep(0.15)
+        monitor._logger.warn.assert_called_once_with(
+            'accountId:vint-hill:0:ps-mpa-1:on_symbol_prices_updated: event is taking more than 0.1 seconds to '
+            'process')
+        monitor.event_finished(event)
+        assert monitor._logger.warn.call_count == 2
+        assert monitor.slow_event_counts == {'on_symbol_prices_updated': 1}
+        monitor.slow_event_counts.clear()
+        assert monitor.slow_event_counts == {'on_symbol_prices_updated': 1}
+
+    @pytest.mark.asyncio
+    async def test_not_report_fast_events(self):
+        """Should not report events which finish within threshold."""
+        for i in range(100):
+            monitor.event_finished(monitor.event_started('accountId:on_symbol_price_updated'))
+        await asyncio.sleep(0.15)
+        monitor._logger.warn.assert_not_called()
+        assert monitor.slow_event_counts == {}
+        assert len(monitor._events) == 0
+
+    @pytest.mark.asyncio
+    async def test_count_slow_events_by_label(self):
+        """Should count slow events by label using a single timer."""
+        monitor.event_started('label1')
+        monitor.event_started('label1')
+        fast_event = monitor.event_started('label2')
+        await asyncio.sleep(0.05)
+        monitor.event_started('label2')
+        monitor.event_finished(fast_event)
+        await asyncio.sleep(0.08)
+        assert monitor.slow_event_counts == {'label1': 2}
+        assert monitor._timer is not None
+        await asyncio.sleep(0.05)
+        assert monitor.slow_event_counts == {'label1': 2, 'label2': 1}
+        assert monitor._timer is None
+
+    @pytest.mark.asyncio
+    async def test_not_create_tasks(self):
+        """Should not create a task per event."""
+        tasks_count = len(asyncio.all_tasks())
+        for i in range(10):
+            monitor.event_started('label')
+        assert len(asyncio.all_tasks()) == tasks_count
+
+    @pytest.mark.asyncio
+    async def test_aggregate_slow_event_counts_by_event_name(self):
+        """Should count slow events of different accounts by event name."""
+        monitor.event_started('accountId:vint-hill:0:ps-mpa-1:on_deal_added')
+        monitor.event_started('accountId2:vint-hill:0:ps-mpa-1:on_deal_added')
+        await asyncio.sleep(0.15)
+        assert monitor.slow_event_counts == {'on_deal_added': 2}
+
+    @pytest.mark.asyncio
+    async def test_finish_event_after_stop(self):
+        """Should not report processing time of a slow event which finished after monitor was stopped."""
+        event = monitor.event_started('label')
+        await asyncio.sleep(0.15)
+        monitor.stop()
+        monitor.event_finished(event)
+        assert monitor._logger.warn.call_count == 1
@@ -5,6 +5,7 @@ from ...metaApi.models import date, format_error, string_format_error
 from datetime import datetime
 from typing import List
 from ...logger import LoggerManager
+from .instanceKey import InstanceDict, InstanceKey
 
 
 class SubscriptionManager:
@@ -17,7 +18,7 @@ class SubscriptionManager:
             websocket_client: Websocket client to use for sending requests.
         """
         self._websocketClient = websocket_client
-        self._subscriptions = {}
+        self._subscriptions = InstanceDict()
         self._awaitingResubscribe = {}
         self._subscriptionState = {}
         self._logger = LoggerManager.get_logger('SubscriptionManager')
@@ -30,12 +31,9 @@ class SubscriptionManager:
             instance_number: Instance index number.
         """
         if instance_number is not None:
-            return account_id + ':' + str(instance_number) in self._subscriptions.keys()
+            return InstanceKey.of(account_id, instance_number) in self._subscriptions
         else:
-            for key in self._subscriptions.keys():
-                if key.startswith(account_id):
-                    return True
-            return False
+            return len(self._subscriptions.get_account_keys(account_id)) > 0
 
     def is_disconnected_retry_mode(self, account_id: str, instance_number: int):
         """Returns whether an instance is in disconnected retry mode.
@@ -44,7 +42,7 @@ class SubscriptionManager:
             account_id: Id of the MetaTrader account.
             instance_number: Instance index number.
         """
-        instance_id = account_id + ':' + str(instance_number or 0)
+        instance_id = InstanceKey.of(account_id, instance_number or 0)
         return self._subscriptions[instance_id]['isDisconnectedRetryMode'] if instance_id in \
             self._subscriptions else False
 
@@ -85,7 +83,7 @@ class SubscriptionManager:
             is_disconnected_retry_mode: Whether to start subscription in disconnected retry mode. Subscription
                 task in disconnected mode will be immediately replaced when the status packet is received.
         """
-        instance_id = account_id + ':' + str(instance_number or 0)
+        instance_id = InstanceKey.of(account_id, instance_number or 0)
         if instance_id not in self._subscriptions:
             self._subscriptions[instance_id] = {
                 'shouldRetry': True,
@@ -176,7 +174,7 @@ class SubscriptionManager:
         Args:
             account_id: Account id to cancel subscription tasks for.
         """
-        for instance_id in list(filter(lambda key: key.startswith(account_id), self._subscriptions.keys())):
+        for instance_id in self._subscriptions.get_account_keys(account_id):
             self.cancel_subscribe(instance_id)
         for instance_number in self._awaitingResubscribe.keys():
             if account_id in self._awaitingResubscribe[instance_number]:
@@ -239,11 +237,11 @@ class SubscriptionManager:
 
         try:
             socket_instances_by_accounts = self._websocketClient.socket_instances_by_accounts[instance_number]
-            for instance_id in self._subscriptions.keys():
-                account_id = instance_id.split(':')[0]
+            for account_id in list(self._subscriptions.account_ids()):
                 if account_id in socket_instances_by_accounts and \
                         socket_instances_by_accounts[account_id] == socket_instance_index:
-                    self.cancel_subscribe(instance_id)
+                    for instance_id in self._subscriptions.get_account_keys(account_id):
+                        self.cancel_subscribe(instance_id)
 
             for account_id in reconnect_account_ids:
                 asyncio.create_task(wait_resubscribe(account_id))
@@ -19,6 +19,10 @@ class HealthStatus(TypedDict, total=False):
 class SynchronizationListener(ABC):
     """Defines interface for a synchronization listener class."""
 
+    batched_prices_only: bool = False
+    """Whether the listener processes price packets via on_symbol_prices_updated only. If set, the listener will not
+    receive an on_symbol_price_updated event for each symbol price in a packet."""
+
     def get_region(self, instance_index: str = None) -> str:
         """Returns region of instance index.
 
@@ -2,6 +2,7 @@ from ..clients.metaApi.synchronizationListener import SynchronizationListener, H
 from .reservoir.reservoir import Reservoir
 from .models import MetatraderSymbolPrice, date, string_format_error
 from typing_extensions import TypedDict
+from typing import List
 import asyncio
 from datetime import datetime
 import functools
@@ -28,6 +29,8 @@ class ConnectionHealthStatus(TypedDict):
 class ConnectionHealthMonitor(SynchronizationListener):
     """Tracks connection health status."""
 
+    batched_prices_only = True
+
     def __init__(self, connection):
         """Inits the monitor.
 
@@ -84,6 +87,23 @@ class ConnectionHealthMonitor(SynchronizationListener):
             self._logger.error(f'{self._connection.account.id}: Failed to update quote streaming health '
                                f'status on price update ' + string_format_error(err))
 
+    async def on_symbol_prices_updated(self, instance_index: str, prices: List[MetatraderSymbolPrice],
+                                       equity: float = None, margin: float = None, free_margin: float = None,
+                                       margin_level: float = None, account_currency_exchange_rate: float = None):
+        """Invoked when prices for several symbols were updated.
+
+        Args:
+            instance_index: Index of an account instance connected.
+            prices: Updated MetaTrader symbol prices.
+            equity: Account liquidation value.
+            margin: Margin used.
+            free_margin: Free margin.
+            margin_level: Margin level calculated as % of equity/margin.
+            account_currency_exchange_rate: Current exchange rate of account currency into USD.
+        """
+        if len(prices):
+            await self.on_symbol_price_updated(instance_index, prices[-1])
+
     async def on_health_status(self, instance_index: str, status: HealthStatus):
         """Invoked when a server-side application health status is received from MetaApi.
 
@@ -179,6 +179,13 @@ class TestConnectionHealthMonitor:
         await sleep(0.2)
         assert health_monitor.health_status['quoteStreamingHealthy']
 
+    @pytest.mark.asyncio
+    async def test_show_as_healthy_on_batched_prices(self):
+        """Should show as healthy if recently updated via batched prices event."""
+        await health_monitor.on_symbol_prices_updated('vint-hill:1:ps-mpa-1', [prices[1], prices[0]])
+        await sleep(0.2)
+        assert health_monitor.health_status['quoteStreamingHealthy']
+
     @pytest.mark.asyncio
     async def test_show_as_not_healthy(self):
         """Should show as not healthy if old update and in session."""
@@ -0,0 +1,57 @@
+from array import array
+from bisect import bisect_left
+from typing import Hashable
+
+_hash_mask = 0xFFFFFFFFFFFFFFFF
+
+
+class DistinctCounter:
+    """Counts distinct values in bounded memory. Values are counted exactly until the number of distinct values
+    exceeds the capacity, after that the count is estimated from the smallest hashes of the values seen (k minimum
+    values sketch), with relative error of about 1 / sqrt(capacity). The counter takes 8 bytes per hash kept."""
+
+    def __init__(self, capacity: int = 1024):
+        """Inits the counter.
+
+        Args:
+            capacity: Number of value hashes to keep.
+        """
+        self._capacity = capacity
+        self._hashes = array('Q')
+        self._saturated = False
+
+    def add(self, value: Hashable):
+        """Adds a value.
+
+        Args:
+            value: Value to add.
+        """
+        value_hash = self._get_hash(value)
+        if self._saturated and value_hash >= self._hashes[-1]:
+            return
+        index = bisect_left(self._hashes, value_hash)
+        if index < len(self._hashes) and self._hashes[index] == value_hash:
+            return
+        self._hashes.insert(index, value_hash)
+        if len(self._hashes) > self._capacity:
+            self._hashes.pop()
+            self._saturated = True
+
+    @property
+    def count(self) -> int:
+        """Returns the number of distinct values added, estimated if the number exceeds the capacity.
+
+        Returns:
+            Number of distinct values.
+        """
+        if not self._saturated:
+            return len(self._hashes)
+        return round((self._capacity - 1) * (_hash_mask + 1) / (self._hashes[-1] + 1))
+
+    @staticmethod
+    def _get_hash(value: Hashable) -> int:
+        # hashes of similar values are close to each other, so they are mixed to be spread uniformly
+        value_hash = hash(value) & _hash_mask
+        value_hash = ((value_hash ^ (value_hash >> 30)) * 0xbf58476d1ce4e5b9) & _hash_mask
+        value_hash = ((value_hash ^ (value_hash >> 27)) * 0x94d049bb133111eb) & _hash_mask
+        return value_hash ^ (value_hash >> 31)
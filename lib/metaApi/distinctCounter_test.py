@@ -0,0 +1,19 @@
+from .distinctCounter import DistinctCounter
+
+
+class TestDistinctCounter:
+
+    def test_count_distinct_values_exactly(self):
+        """Should count distinct values exactly until capacity is exceeded."""
+        counter = DistinctCounter(100)
+        for i in range(300):
+            counter.add(('2020-04-15T02:45:06.521Z', str(i % 100), 'DEAL_ENTRY_IN'))
+        assert counter.count == 100
+
+    def test_estimate_distinct_values(self):
+        """Should estimate the number of distinct values in bounded memory when capacity is exceeded."""
+        counter = DistinctCounter(1024)
+        for i in range(150000):
+            counter.add(('2020-04-15T02:45:06.521Z', str(i % 100000), 'DEAL_ENTRY_IN'))
+        assert len(counter._hashes) == 1024
+        assert 90000 < counter.count < 110000
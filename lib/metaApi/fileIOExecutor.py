@@ -0,0 +1,136 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from typing import Callable, Dict
+
+
+class FileIOExecutor:
+    """Runs blocking file operations in a bounded thread pool, so that slow disks do not block the event loop. The
+    number of pending operations is limited, callers wait for a free slot when the limit is reached."""
+
+    def __init__(self, max_workers: int = 2, max_pending_operations: int = 1000):
+        """Inits the executor.
+
+        Args:
+            max_workers: Maximum number of threads running file operations.
+            max_pending_operations: Maximum number of submitted file operations which are not completed yet.
+        """
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='metaapi-file-io')
+        self._maxPendingOperations = max_pending_operations
+        self._semaphore = None
+        self._semaphoreLoop = None
+        self._statsLock = threading.Lock()
+        self._pendingOperations = 0
+        self._completedOperations = 0
+        self._ioTime = 0
+        self._maxIOTime = 0
+        self._stallTime = 0
+        self._loopBlockingOperations = 0
+        self._loopBlockTime = 0
+        self._maxLoopBlockTime = 0
+
+    @staticmethod
+    def get_instance():
+        """Returns file IO executor instance shared by the process.
+
+        Returns:
+            File IO executor instance.
+        """
+        global instance
+        if not instance:
+            instance = FileIOExecutor()
+        return instance
+
+    async def run(self, func: Callable, *args):
+        """Runs a blocking file operation in the thread pool.
+
+        Args:
+            func: Function performing the file operation.
+            args: Function arguments.
+
+        Returns:
+            A coroutine resolving with the function result.
+        """
+        semaphore = self._get_semaphore()
+        if semaphore.locked():
+            start_time = perf_counter()
+            await semaphore.acquire()
+            self._stallTime += perf_counter() - start_time
+        else:
+            await semaphore.acquire()
+        self._pendingOperations += 1
+        try:
+            return await asyncio.get_event_loop().run_in_executor(self._executor, self._measure, func, args)
+        finally:
+            self._pendingOperations -= 1
+            semaphore.release()
+
+    def run_blocking(self, func: Callable, *args):
+        """Runs a file operation on the calling thread, for synchronous callers which can not wait for the thread
+        pool. If called on the event loop thread, the time of the operation is counted as the time the event loop
+        was blocked by disk.
+
+        Args:
+            func: Function performing the file operation.
+            args: Function arguments.
+
+        Returns:
+            The function result.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return func(*args)
+        start_time = perf_counter()
+        try:
+            return func(*args)
+        finally:
+            duration = perf_counter() - start_time
+            with self._statsLock:
+                self._loopBlockingOperations += 1
+                self._loopBlockTime += duration
+                self._maxLoopBlockTime = max(self._maxLoopBlockTime, duration)
+
+    def get_stats(self) -> Dict:
+        """Returns file IO statistics. IO time is the time file operations took in the thread pool, i.e. the time
+        the event loop would have been blocked if the operations ran on it. Stall time is the time callers waited for
+        a free slot because too many operations were pending. Loop block time is the time the event loop was actually
+        blocked by file operations which ran on it.
+
+        Returns:
+            Dictionary with pendingOperations, completedOperations, ioTime, maxIOTime, stallTime,
+            loopBlockingOperations, loopBlockTime and maxLoopBlockTime fields, times are in seconds.
+        """
+        with self._statsLock:
+            return {
+                'pendingOperations': self._pendingOperations,
+                'completedOperations': self._completedOperations,
+                'ioTime': self._ioTime,
+                'maxIOTime': self._maxIOTime,
+                'stallTime': self._stallTime,
+                'loopBlockingOperations': self._loopBlockingOperations,
+                'loopBlockTime': self._loopBlockTime,
+                'maxLoopBlockTime': self._maxLoopBlockTime
+            }
+
+    def _measure(self, func: Callable, args: tuple):
+        start_time = perf_counter()
+        try:
+            return func(*args)
+        finally:
+            duration = perf_counter() - start_time
+            with self._statsLock:
+                self._completedOperations += 1
+                self._ioTime += duration
+                self._maxIOTime = max(self._maxIOTime, duration)
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_event_loop()
+        if self._semaphoreLoop is not loop:
+            self._semaphore = asyncio.Semaphore(self._maxPendingOperations)
+            self._semaphoreLoop = loop
+        return self._semaphore
+
+
+instance = None
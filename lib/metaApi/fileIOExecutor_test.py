@@ -0,0 +1,78 @@
+from .fileIOExecutor import FileIOExecutor
+import pytest
+import asyncio
+import threading
+import time
+
+
+class TestFileIOExecutor:
+
+    @pytest.mark.asyncio
+    async def test_run_operations_outside_of_event_loop(self):
+        """Should run file operations in thread pool and record IO time."""
+        executor = FileIOExecutor()
+        loop_thread = threading.current_thread()
+
+        def operation(value):
+            time.sleep(0.05)
+            return value, threading.current_thread()
+
+        ticks = 0
+
+        async def count_ticks():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        task = asyncio.create_task(count_ticks())
+        value, thread = await executor.run(operation, 'value')
+        task.cancel()
+        assert value == 'value'
+        assert thread != loop_thread
+        assert ticks >= 5
+        stats = executor.get_stats()
+        assert stats['completedOperations'] == 1
+        assert stats['pendingOperations'] == 0
+        assert stats['ioTime'] >= 0.05
+        assert stats['maxIOTime'] >= 0.05
+        assert stats['stallTime'] == 0
+
+    @pytest.mark.asyncio
+    async def test_limit_pending_operations(self):
+        """Should make callers wait when pending operations limit is reached."""
+        executor = FileIOExecutor(max_workers=1, max_pending_operations=1)
+        await asyncio.gather(*[executor.run(time.sleep, 0.02) for i in range(3)])
+        stats = executor.get_stats()
+        assert stats['completedOperations'] == 3
+        assert stats['stallTime'] >= 0.03
+
+    @pytest.mark.asyncio
+    async def test_raise_operation_errors(self):
+        """Should raise errors of file operations."""
+        executor = FileIOExecutor()
+
+        def operation():
+            raise FileNotFoundError('file not found')
+
+        with pytest.raises(FileNotFoundError):
+            await executor.run(operation)
+        assert executor.get_stats()['pendingOperations'] == 0
+
+    @pytest.mark.asyncio
+    async def test_measure_operations_blocking_event_loop(self):
+        """Should record the time event loop was blocked by file operations which ran on it."""
+        executor = FileIOExecutor()
+        assert executor.run_blocking(lambda value: time.sleep(0.02) or value, 'value') == 'value'
+        await executor.run(time.sleep, 0.02)
+        stats = executor.get_stats()
+        assert stats['loopBlockingOperations'] == 1
+        assert stats['loopBlockTime'] >= 0.02
+        assert stats['maxLoopBlockTime'] >= 0.02
+        assert stats['completedOperations'] == 1
+
+    def test_not_measure_operations_outside_of_event_loop(self):
+        """Should not record blocking operations which run outside of event loop."""
+        executor = FileIOExecutor()
+        assert executor.run_blocking(lambda: 'value') == 'value'
+        assert executor.get_stats()['loopBlockingOperations'] == 0
@@ -1,7 +1,15 @@
+import asyncio
+import io
 import json
 import os
+import sqlite3
+import threading
+from collections import OrderedDict
 from .models import format_date, convert_iso_time_to_date, string_format_error, MetatraderOrder, MetatraderDeal
-from typing import List
+from .fileIOExecutor import FileIOExecutor
+from .distinctCounter import DistinctCounter
+from .historyFileFormat import FILE_MAGIC, is_binary_history_file, get_record_time, encode_segment, read_segments
+from typing import AsyncIterator, BinaryIO, Dict, Iterator, List, Optional, Tuple
 from datetime import datetime
 from copy import deepcopy
 from ..logger import LoggerManager
@@ -16,12 +24,38 @@ def stringify(obj: dict or List) -> str:
     return json.dumps(obj).replace('": ', '":').replace('}, {', '},{').replace(', "', ',"')
 
 
+_record_key_fields = {
+    'time': ('time', 'id', 'entryType'),
+    'doneTime': ('doneTime', 'id', 'type', 'state')
+}
+_key_index_schema = [
+    'CREATE TABLE IF NOT EXISTS history_keys (account_id TEXT NOT NULL, application TEXT NOT NULL, '
+    'history_type TEXT NOT NULL, field TEXT NOT NULL, value TEXT NOT NULL, time REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS history_keys_value ON history_keys (account_id, application, history_type, field, '
+    'value)'
+]
+_key_index_fields = ['id', 'positionId']
+
+
 class FilesystemHistoryDatabase:
     """Provides access to history database stored on filesystem."""
 
     def __init__(self):
         """Inits the class instance."""
         self._logger = LoggerManager.get_logger('FilesystemHistoryDatabase')
+        self._segmentSize = 1000
+        self._fileIOExecutor = FileIOExecutor.get_instance()
+        self._fileHandles = OrderedDict()
+        self._fileHandlesLock = threading.Lock()
+        self._maxOpenFiles = 64
+        self._fileStats = {}
+        self._compactionLock = threading.Lock()
+        self._compactionTasks = {}
+        self._compactionGarbageRatio = 0.3
+        self._compactionMinRecords = 1000
+        self._keyIndexPath = '.metaapi/history-keys.sqlite3'
+        self._keyIndexConnection = None
+        self._keyIndexLock = threading.Lock()
 
     @staticmethod
     def get_instance():
@@ -35,36 +69,82 @@ class FilesystemHistoryDatabase:
             instance = FilesystemHistoryDatabase()
         return instance
 
-    async def load_history(self, account_id: str, application: str):
-        """Loads history from database.
+    async def load_history(self, account_id: str, application: str, start_time: datetime = None,
+                           end_time: datetime = None):
+        """Loads history from database. History files written in JSON lines format by previous versions are
+        converted to binary format on load.
 
         Args:
             account_id: Account id.
             application: Application name.
+            start_time: Time to load history from, inclusive, or None to load from the beginning. Deals are filtered
+            by time, history orders are filtered by done time.
+            end_time: Time to load history till, inclusive, or None to load till the end.
 
         Returns:
-            Full account history.
+            Account history within time range.
         """
         paths = await self._get_db_location(account_id, application)
-        deals = await self._read_db(account_id, paths['dealsFile'])
+        start_timestamp = start_time.timestamp() if start_time else None
+        end_timestamp = end_time.timestamp() if end_time else None
+        deals = await self._read_db(account_id, paths['dealsFile'], 'time', start_timestamp, end_timestamp)
         if len(deals) and isinstance(deals[0], list):
             await self.clear(account_id, application)
             deals = []
         for deal in deals:
             convert_iso_time_to_date(deal)
 
-        history_orders = await self._read_db(account_id, paths['historyOrdersFile'])
+        history_orders = await self._read_db(account_id, paths['historyOrdersFile'], 'doneTime', start_timestamp,
+                                             end_timestamp)
         if len(history_orders) and isinstance(history_orders[0], list):
             await self.clear(account_id, application)
             history_orders = []
         for history_order in history_orders:
             convert_iso_time_to_date(history_order)
 
+        self._schedule_compactions([(paths['dealsFile'], 'time'), (paths['historyOrdersFile'], 'doneTime')])
         return {
             'deals': deals,
             'historyOrders': history_orders
         }
 
+    async def load_history_in_batches(self, account_id: str, application: str,
+                                      batch_size: int = 1000) -> AsyncIterator[Dict[str, List[dict]]]:
+        """Loads history from database in batches, reading history files one segment at a time, so that the whole
+        history is not materialized at once. Deals are loaded first, then history orders.
+
+        Args:
+            account_id: Account id.
+            application: Application name.
+            batch_size: Maximum number of records in a batch.
+
+        Returns:
+            Async iterator over history batches, each containing deals and historyOrders lists.
+        """
+        paths = await self._get_db_location(account_id, application)
+        for file, time_field, history_type in [(paths['dealsFile'], 'time', 'deals'),
+                                               (paths['historyOrdersFile'], 'doneTime', 'historyOrders')]:
+            segments = self._iterate_db(account_id, file, time_field)
+            try:
+                while True:
+                    records = await self._fileIOExecutor.run(next, segments, None)
+                    if records is None:
+                        break
+                    if len(records) and isinstance(records[0], list):
+                        await self.clear(account_id, application)
+                        return
+                    for i in range(0, len(records), batch_size):
+                        batch = records[i:i + batch_size]
+                        for record in batch:
+                            convert_iso_time_to_date(record)
+                        yield {
+                            'deals': batch if history_type == 'deals' else [],
+                            'historyOrders': batch if history_type == 'historyOrders' else []
+                        }
+            finally:
+                segments.close()
+            self._schedule_compactions([(file, time_field)])
+
     async def clear(self, account_id, application):
         """Removes history from database.
 
@@ -76,10 +156,46 @@ class FilesystemHistoryDatabase:
             A coroutine resolving when the history is removed.
         """
         paths = await self._get_db_location(account_id, application)
-        if os.path.exists(paths['historyOrdersFile']):
-            os.remove(paths['historyOrdersFile'])
-        if os.path.exists(paths['dealsFile']):
-            os.remove(paths['dealsFile'])
+        await self._fileIOExecutor.run(self._remove_files, [paths['historyOrdersFile'], paths['dealsFile']])
+        await self._fileIOExecutor.run(self._clear_key_index, account_id, application)
+
+    async def index_history(self, account_id: str, application: str, deals: List[dict],
+                            history_orders: List[dict]):
+        """Adds tickets and position ids of history records to the key index on disk, so that history of a ticket or
+        a position is read without reading the whole history. The index is meant for history which is written to the
+        database and is not kept in memory.
+
+        Args:
+            account_id: Account id.
+            application: Application name.
+            deals: Deals to index.
+            history_orders: History orders to index.
+
+        Returns:
+            A coroutine resolving when the records are indexed.
+        """
+        rows = []
+        for history_type, records, time_field in [('deals', deals, 'time'),
+                                                  ('historyOrders', history_orders, 'doneTime')]:
+            for record in records:
+                time = get_record_time(record, time_field)
+                for field in _key_index_fields:
+                    if record.get(field) is not None:
+                        rows.append((account_id, application, history_type, field, str(record[field]), time))
+        if len(rows):
+            await self._fileIOExecutor.run(self._add_key_index_rows, rows)
+
+    async def clear_index(self, account_id: str, application: str):
+        """Removes tickets and position ids of account history from the key index.
+
+        Args:
+            account_id: Account id.
+            application: Application name.
+
+        Returns:
+            A coroutine resolving when the index is cleared.
+        """
+        await self._fileIOExecutor.run(self._clear_key_index, account_id, application)
 
     async def flush(self, account_id: str, application: str, new_history_orders: List[MetatraderOrder],
                     new_deals: List[MetatraderDeal]):
@@ -94,11 +210,144 @@ class FilesystemHistoryDatabase:
         Returns:
             A coroutine resolving when the history is flushed.
         """
+        await self.flush_many([{'accountId': account_id, 'application': application,
+                                'historyOrders': new_history_orders, 'deals': new_deals}])
+
+    async def flush_many(self, histories: List[Dict]):
+        """Flushes the new history of several accounts to db in a single file IO operation. History files are kept
+        open between flushes, the least recently used files are closed when the open file limit is reached.
+
+        Args:
+            histories: List of dictionaries with accountId, application, historyOrders and deals fields.
+
+        Returns:
+            A coroutine resolving when the history is flushed.
+        """
+        writes = []
+        for history in histories:
+            paths = await self._get_db_location(history['accountId'], history['application'])
+            writes.append((paths['historyOrdersFile'], history['historyOrders'], 'doneTime'))
+            writes.append((paths['dealsFile'], history['deals'], 'time'))
+        await self._fileIOExecutor.run(self._write_dbs, writes)
+        self._schedule_compactions(list(map(lambda write: (write[0], write[2]), writes)))
+
+    async def compact(self, account_id: str, application: str):
+        """Rewrites history files keeping only the latest version of each deal and history order. Compaction is
+        started automatically in background when garbage ratio of a file exceeds the threshold.
+
+        Args:
+            account_id: Account id.
+            application: Application name.
+
+        Returns:
+            A coroutine resolving when the history is compacted.
+        """
         paths = await self._get_db_location(account_id, application)
-        await self._append_db(paths['historyOrdersFile'], self._prepare_save_data(new_history_orders))
-        await self._append_db(paths['dealsFile'], self._prepare_save_data(new_deals))
+        await self._fileIOExecutor.run(self._compact_db, paths['dealsFile'], 'time')
+        await self._fileIOExecutor.run(self._compact_db, paths['historyOrdersFile'], 'doneTime')
+
+    async def get_garbage_ratio(self, account_id: str, application: str) -> Dict[str, Optional[float]]:
+        """Returns the share of obsolete record versions in history files. Garbage ratio is known after the history
+        was loaded or compacted.
+
+        Args:
+            account_id: Account id.
+            application: Application name.
+
+        Returns:
+            Dictionary with deals and historyOrders garbage ratios, or None values if garbage ratio is unknown.
+        """
+        paths = await self._get_db_location(account_id, application)
+        return {
+            'deals': self._get_file_garbage_ratio(paths['dealsFile']),
+            'historyOrders': self._get_file_garbage_ratio(paths['historyOrdersFile'])
+        }
+
+    def read_history(self, account_id: str, application: str, history_type: str, start_time: datetime = None,
+                     end_time: datetime = None, field: str = None, value: str = None) -> List[dict]:
+        """Reads history of one type from database synchronously. The call blocks the event loop until the file is
+        read, so it is meant only for synchronous queries of history which is not kept in memory, and the time range
+        should be as narrow as possible, since only segments within the time range are read. Records of a ticket or a
+        position are found by the key index and only segments within their time range are read. Segments being
+        appended concurrently are not read. The time the event loop is blocked by the call is counted in file IO
+        executor statistics, use query_history to read history without blocking the event loop.
+
+        Args:
+            account_id: Account id.
+            application: Application name.
+            history_type: History type, either deals or historyOrders.
+            start_time: Time to read history from, inclusive, or None to read from the beginning. Deals are filtered
+            by time, history orders are filtered by done time.
+            end_time: Time to read history till, inclusive, or None to read till the end.
+            field: Indexed field to filter records by, either id or positionId, or None to read all records within
+            time range. Only records added to the key index with index_history are found.
+            value: Field value to filter records by.
+
+        Returns:
+            Records in the order they were written, several versions of the same record may be returned.
+        """
+        return self._fileIOExecutor.run_blocking(self._query_history, account_id, application, history_type,
+                                                 start_time, end_time, field, value)
+
+    async def query_history(self, account_id: str, application: str, history_type: str, start_time: datetime = None,
+                            end_time: datetime = None, field: str = None, value: str = None) -> List[dict]:
+        """Reads history of one type from database in file IO thread. Only segments within the time range are read,
+        records of a ticket or a position are found by the key index.
+
+        Args:
+            account_id: Account id.
+            application: Application name.
+            history_type: History type, either deals or historyOrders.
+            start_time: Time to read history from, inclusive, or None to read from the beginning. Deals are filtered
+            by time, history orders are filtered by done time.
+            end_time: Time to read history till, inclusive, or None to read till the end.
+            field: Indexed field to filter records by, either id or positionId, or None to read all records within
+            time range. Only records added to the key index with index_history are found.
+            value: Field value to filter records by.
+
+        Returns:
+            A coroutine resolving with records in the order they were written, several versions of the same record
+            may be returned.
+        """
+        return await self._fileIOExecutor.run(self._query_history, account_id, application, history_type, start_time,
+                                              end_time, field, value)
+
+    def _query_history(self, account_id: str, application: str, history_type: str, start_time: Optional[datetime],
+                       end_time: Optional[datetime], field: Optional[str], value: Optional[str]) -> List[dict]:
+        paths = self._get_db_paths(account_id, application)
+        file, time_field = (paths['dealsFile'], 'time') if history_type == 'deals' else \
+            (paths['historyOrdersFile'], 'doneTime')
+        start_timestamp = start_time.timestamp() if start_time else None
+        end_timestamp = end_time.timestamp() if end_time else None
+        if field is not None:
+            time_range = self._get_key_time_range(account_id, application, history_type, field, value)
+            if time_range is None:
+                return []
+            start_timestamp = max(start_timestamp, time_range[0]) if start_timestamp is not None else time_range[0]
+            end_timestamp = min(end_timestamp, time_range[1]) if end_timestamp is not None else time_range[1]
+            if start_timestamp > end_timestamp:
+                return []
+        records = self._read_history_records(account_id, file, time_field, start_timestamp, end_timestamp)
+        if field is not None:
+            records = list(filter(lambda record: record.get(field) is not None and str(record[field]) == value,
+                                  records))
+        for record in records:
+            convert_iso_time_to_date(record)
+        return records
+
+    def _read_history_records(self, account_id: str, file: str, time_field: str, start_time: Optional[float],
+                              end_time: Optional[float]) -> List[dict]:
+        records = []
+        for segment in self._iterate_db(account_id, file, time_field, start_time, end_time):
+            if len(segment) and isinstance(segment[0], list):
+                return []
+            records.extend(segment)
+        return records
 
     async def _get_db_location(self, account_id: str, application: str):
+        return self._get_db_paths(account_id, application)
+
+    def _get_db_paths(self, account_id: str, application: str):
         path = '.metaapi'
         if not os.path.exists(path):
             os.mkdir(path)
@@ -107,30 +356,281 @@ class FilesystemHistoryDatabase:
             'historyOrdersFile': path + f'/{account_id}-{application}-historyOrders.bin'
         }
 
-    async def _read_db(self, account_id: str, file: str):
-        if not os.path.exists(file):
-            return []
-        try:
-            data = open(file).read()
-            lines = data.split('\n')
+    async def _read_db(self, account_id: str, file: str, time_field: str, start_time: float = None,
+                       end_time: float = None):
+        def read_db():
             result = []
-            for line in lines:
-                if len(line):
-                    result.append(json.loads(line))
+            for records in self._iterate_db(account_id, file, time_field, start_time, end_time):
+                result.extend(records)
             return result
+
+        return await self._fileIOExecutor.run(read_db)
+
+    def _iterate_db(self, account_id: str, file: str, time_field: str, start_time: float = None,
+                    end_time: float = None) -> Iterator[List[dict]]:
+        if not os.path.exists(file):
+            return
+        try:
+            full_read = start_time is None and end_time is None
+            f, committed_size = self._open_committed_file(file)
+            with f:
+                if is_binary_history_file(f):
+                    keys = DistinctCounter()
+                    record_count = 0
+                    for records in read_segments(f, start_time, end_time, committed_size):
+                        if full_read:
+                            record_count += len(records)
+                            for record in records:
+                                keys.add(self._get_record_key(record, time_field))
+                        yield records
+                    if full_read:
+                        with self._fileHandlesLock:
+                            self._set_file_stats(file, record_count, keys)
+                    return
+            records = self._convert_json_lines_db(file, time_field)
+            if records is None:
+                # the file was converted to binary format concurrently
+                yield from self._iterate_db(account_id, file, time_field, start_time, end_time)
+                return
+            if len(records) and isinstance(records[0], list):
+                yield records
+                return
+            if start_time is not None or end_time is not None:
+                records = list(filter(lambda record: self._is_within_time_range(
+                    get_record_time(record, time_field), start_time, end_time), records))
+            yield records
         except Exception as err:
-            self._logger.warn(f'{account_id}: failed to read history db, will remove {file} now',
-                              string_format_error(err))
-            if os.path.exists(file):
-                os.remove(file)
-            return []
-
-    async def _append_db(self, file, records):
-        if records is not None and len(records):
-            records = list(map(lambda record: stringify(record) + '\n', records))
-            f = open(file, "a+")
-            f.write(''.join(records))
-            f.close()
+            self._logger.warning(f'{account_id}: failed to read history db, will truncate {file} to the last '
+                                 'complete segment now ' + string_format_error(err))
+            self._truncate_db(file, time_field)
+
+    def _open_committed_file(self, file: str) -> Tuple[BinaryIO, int]:
+        with self._fileHandlesLock:
+            f = open(file, 'rb')
+            return f, os.fstat(f.fileno()).st_size
+
+    def _convert_json_lines_db(self, file: str, time_field: str) -> Optional[List[dict]]:
+        with self._fileHandlesLock:
+            with open(file, 'rb') as f:
+                if is_binary_history_file(f):
+                    return None
+            records = self._read_json_lines_db(file)
+            if len(records) and isinstance(records[0], list):
+                return records
+            self._rewrite_db(file, records, time_field)
+            keys = DistinctCounter()
+            for record in records:
+                keys.add(self._get_record_key(record, time_field))
+            self._set_file_stats(file, len(records), keys)
+            return records
+
+    def _set_file_stats(self, file: str, record_count: int, keys: DistinctCounter):
+        self._fileStats[file] = {'records': record_count, 'liveRecords': min(keys.count, record_count),
+                                 'keys': keys}
+
+    def _write_dbs(self, writes: List[tuple]):
+        for file, records, time_field in writes:
+            if records is not None and len(records):
+                self._write_db(file, self._prepare_save_data(records), time_field)
+
+    def _write_db(self, file: str, records: List[dict], time_field: str):
+        with self._fileHandlesLock:
+            f = self._get_file_handle(file, time_field)
+            f.write(encode_segment(records, time_field))
+            f.flush()
+            stats = self._fileStats.get(file)
+            if stats is not None:
+                for record in records:
+                    stats['keys'].add(self._get_record_key(record, time_field))
+                self._set_file_stats(file, stats['records'] + len(records), stats['keys'])
+
+    def _get_file_handle(self, file: str, time_field: str):
+        if file in self._fileHandles:
+            self._fileHandles.move_to_end(file)
+            return self._fileHandles[file]
+        if os.path.exists(file):
+            with open(file, 'rb') as f:
+                is_binary = is_binary_history_file(f)
+            if not is_binary:
+                self._rewrite_db(file, self._read_json_lines_db(file), time_field)
+        f = open(file, 'ab')
+        if f.tell() == 0:
+            f.write(FILE_MAGIC)
+        self._fileHandles[file] = f
+        if len(self._fileHandles) > self._maxOpenFiles:
+            self._fileHandles.popitem(last=False)[1].close()
+        return f
+
+    def _get_key_index_connection(self) -> sqlite3.Connection:
+        if self._keyIndexConnection is not None and not os.path.exists(self._keyIndexPath):
+            # index file was removed together with history files
+            self._keyIndexConnection.close()
+            self._keyIndexConnection = None
+        if self._keyIndexConnection is None:
+            directory = os.path.dirname(self._keyIndexPath)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            connection = sqlite3.connect(self._keyIndexPath, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in _key_index_schema:
+                connection.execute(statement)
+            connection.commit()
+            self._keyIndexConnection = connection
+        return self._keyIndexConnection
+
+    def _add_key_index_rows(self, rows: List[tuple]):
+        with self._keyIndexLock:
+            connection = self._get_key_index_connection()
+            connection.executemany('INSERT INTO history_keys VALUES (?, ?, ?, ?, ?, ?)', rows)
+            connection.commit()
+
+    def _get_key_time_range(self, account_id: str, application: str, history_type: str, field: str,
+                            value: str) -> Optional[Tuple[float, float]]:
+        with self._keyIndexLock:
+            row = self._get_key_index_connection().execute(
+                'SELECT MIN(time), MAX(time) FROM history_keys WHERE account_id = ? AND application = ? AND '
+                'history_type = ? AND field = ? AND value = ?',
+                (account_id, application, history_type, field, value)).fetchone()
+        return row if row[0] is not None else None
+
+    def _clear_key_index(self, account_id: str, application: str):
+        with self._keyIndexLock:
+            connection = self._get_key_index_connection()
+            connection.execute('DELETE FROM history_keys WHERE account_id = ? AND application = ?',
+                               (account_id, application))
+            connection.commit()
+
+    def _remove_files(self, files: List[str]):
+        with self._fileHandlesLock:
+            for file in files:
+                if file in self._fileHandles:
+                    self._fileHandles.pop(file).close()
+                if os.path.exists(file):
+                    os.remove(file)
+                self._fileStats.pop(file, None)
+
+    def _truncate_db(self, file: str, time_field: str):
+        with self._fileHandlesLock:
+            if file in self._fileHandles:
+                self._fileHandles.pop(file).close()
+            if not os.path.exists(file):
+                return
+            with open(file, 'r+b') as f:
+                if is_binary_history_file(f):
+                    valid_size = f.tell()
+                    try:
+                        for _ in read_segments(f):
+                            valid_size = f.tell()
+                    except Exception:
+                        pass
+                    f.truncate(valid_size)
+                    self._fileStats.pop(file, None)
+                    return
+            records = []
+            with open(file, 'rb') as f:
+                for line in f:
+                    try:
+                        if len(line.strip()):
+                            records.append(json.loads(line))
+                    except ValueError:
+                        break
+            self._rewrite_db(file, records, time_field)
+            self._fileStats.pop(file, None)
+
+    def _read_json_lines_db(self, file: str) -> List[dict]:
+        with open(file) as f:
+            lines = f.read().split('\n')
+        return list(map(lambda line: json.loads(line), filter(lambda line: len(line), lines)))
+
+    def _compact_db(self, file: str, time_field: str):
+        # the file is rewritten without holding the file handles lock, so that history of other accounts can be
+        # written meanwhile, segments appended to the file during compaction are moved to the compacted file
+        with self._compactionLock:
+            if not os.path.exists(file):
+                return
+            legacy_records = self._convert_json_lines_db(file, time_field)
+            if legacy_records is not None and len(legacy_records) and isinstance(legacy_records[0], list):
+                return
+            f, committed_size = self._open_committed_file(file)
+            with f:
+                file_id = os.fstat(f.fileno()).st_ino
+                is_binary_history_file(f)
+                records = []
+                for segment in read_segments(f, end_offset=committed_size):
+                    records.extend(segment)
+            latest_records = {}
+            for record in records:
+                key = self._get_record_key(record, time_field)
+                latest_records.pop(key, None)
+                latest_records[key] = record
+            temp_file = file + '.compact.tmp'
+            try:
+                self._write_db_file(temp_file, list(latest_records.values()), time_field)
+                with self._fileHandlesLock:
+                    if not os.path.exists(file) or os.stat(file).st_ino != file_id:
+                        return
+                    if file in self._fileHandles:
+                        self._fileHandles.pop(file).close()
+                    keys = DistinctCounter()
+                    for key in latest_records.keys():
+                        keys.add(key)
+                    record_count = len(latest_records)
+                    with open(file, 'rb') as f, open(temp_file, 'ab') as compacted_file:
+                        f.seek(committed_size)
+                        appended_data = f.read()
+                        compacted_file.write(appended_data)
+                    for segment in read_segments(io.BytesIO(appended_data)):
+                        record_count += len(segment)
+                        for record in segment:
+                            keys.add(self._get_record_key(record, time_field))
+                    os.replace(temp_file, file)
+                    self._set_file_stats(file, record_count, keys)
+            finally:
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
+            self._logger.debug(f'Compacted {file}, removed {len(records) - len(latest_records)} obsolete records')
+
+    def _schedule_compactions(self, files: List[Tuple[str, str]]):
+        for file, time_field in files:
+            stats = self._fileStats.get(file)
+            if file not in self._compactionTasks and stats is not None and \
+                    stats['records'] >= self._compactionMinRecords and \
+                    self._get_file_garbage_ratio(file) >= self._compactionGarbageRatio:
+                self._compactionTasks[file] = asyncio.create_task(self._compact_file(file, time_field))
+
+    async def _compact_file(self, file: str, time_field: str):
+        try:
+            await self._fileIOExecutor.run(self._compact_db, file, time_field)
+        except Exception as err:
+            self._logger.warning(f'Failed to compact history db {file} ' + string_format_error(err))
+        finally:
+            del self._compactionTasks[file]
+
+    def _get_file_garbage_ratio(self, file: str) -> Optional[float]:
+        stats = self._fileStats.get(file)
+        if stats is None:
+            return None
+        return (stats['records'] - stats['liveRecords']) / stats['records'] if stats['records'] else 0
+
+    @staticmethod
+    def _get_record_key(record: dict, time_field: str) -> tuple:
+        return tuple(map(lambda field: record.get(field), _record_key_fields[time_field]))
+
+    def _rewrite_db(self, file: str, records: List[dict], time_field: str):
+        temp_file = file + '.tmp'
+        self._write_db_file(temp_file, records, time_field)
+        os.replace(temp_file, file)
+
+    def _write_db_file(self, file: str, records: List[dict], time_field: str):
+        with open(file, 'wb') as f:
+            f.write(FILE_MAGIC)
+            for i in range(0, len(records), self._segmentSize):
+                f.write(encode_segment(records[i:i + self._segmentSize], time_field))
+
+    @staticmethod
+    def _is_within_time_range(time: float, start_time: float = None, end_time: float = None) -> bool:
+        return (start_time is None or time >= start_time) and (end_time is None or time <= end_time)
 
     def _prepare_save_data(self, arr: List[dict]):
         arr = deepcopy(arr)
@@ -4,9 +4,12 @@ import pytest
 import json
 import os
 from datetime import datetime
-from .models import MetatraderDeal, MetatraderOrder
+from .models import MetatraderDeal, MetatraderOrder, date, format_date
+from .historyFileFormat import FILE_MAGIC, encode_segment
 from typing import List
 import shutil
+import threading
+from asyncio import sleep
 db: FilesystemHistoryDatabase or None = FilesystemHistoryDatabase()
 storage = None
 test_deal = None
@@ -198,3 +201,238 @@ class TestHistoryFileManager:
         data = await db.load_history('accountId', 'MetaApi')
         assert data['deals'] == [{'id': '1'}, {'id': '2'}]
         assert data['historyOrders'] == [{'id': '2'}, {'id': '3'}]
+
+    @pytest.mark.asyncio
+    async def test_migrate_json_lines_db(self):
+        """Should convert db in JSON lines format to binary format on load."""
+        f = open('.metaapi/accountId-MetaApi-deals.bin', "w+")
+        f.write('{"id":"1","time":"2020-04-15T02:45:06.521Z"}\n{"id":"2"}\n')
+        f.close()
+        f = open('.metaapi/accountId-MetaApi-historyOrders.bin', "w+")
+        f.write('{"id":"2"}\n{"id":"3"}\n')
+        f.close()
+
+        data = await db.load_history('accountId', 'MetaApi')
+        assert data['deals'] == [{'id': '1', 'time': date('2020-04-15T02:45:06.521Z')}, {'id': '2'}]
+        assert data['historyOrders'] == [{'id': '2'}, {'id': '3'}]
+        assert open('.metaapi/accountId-MetaApi-deals.bin', 'rb').read().startswith(FILE_MAGIC)
+        assert open('.metaapi/accountId-MetaApi-historyOrders.bin', 'rb').read().startswith(FILE_MAGIC)
+        assert await db.load_history('accountId', 'MetaApi') == data
+        await db.clear('accountId', 'MetaApi')
+
+    @pytest.mark.asyncio
+    async def test_append_to_json_lines_db(self):
+        """Should convert db in JSON lines format to binary format on flush."""
+        f = open('.metaapi/accountId-MetaApi-deals.bin', "w+")
+        f.write('{"id":"1"}\n')
+        f.close()
+
+        await db.flush('accountId', 'MetaApi', [], [{'id': '2'}])
+        data = await db.load_history('accountId', 'MetaApi')
+        assert data['deals'] == [{'id': '1'}, {'id': '2'}]
+        await db.clear('accountId', 'MetaApi')
+
+    @pytest.mark.asyncio
+    async def test_load_history_by_time_range(self):
+        """Should load history within time range."""
+        for i in range(10):
+            await db.flush('accountId', 'MetaApi', [{'id': str(i), 'doneTime': format_date(date(1600000000 + i))}],
+                           [{'id': str(i), 'time': format_date(date(1600000000 + i * 10))}])
+
+        data = await db.load_history('accountId', 'MetaApi', date(1600000015), date(1600000050))
+        assert list(map(lambda deal: deal['id'], data['deals'])) == ['2', '3', '4', '5']
+        assert data['historyOrders'] == []
+        data = await db.load_history('accountId', 'MetaApi', date(1600000005))
+        assert list(map(lambda deal: deal['id'], data['deals'])) == ['1', '2', '3', '4', '5', '6', '7', '8', '9']
+        assert list(map(lambda order: order['id'], data['historyOrders'])) == ['5', '6', '7', '8', '9']
+        await db.clear('accountId', 'MetaApi')
+
+    @pytest.mark.asyncio
+    async def test_truncate_corrupted_db(self):
+        """Should truncate db with truncated segment to the last complete segment."""
+        await db.flush('accountId', 'MetaApi', [], [{'id': '1'}])
+        await db.flush('accountId', 'MetaApi', [], [{'id': '2'}])
+        data = open('.metaapi/accountId-MetaApi-deals.bin', 'rb').read()
+        db._fileHandles.pop('.metaapi/accountId-MetaApi-deals.bin').close()
+        open('.metaapi/accountId-MetaApi-deals.bin', 'wb').write(data[:-2])
+
+        data = await db.load_history('accountId', 'MetaApi')
+        assert data['deals'] == [{'id': '1'}]
+        await db.flush('accountId', 'MetaApi', [], [{'id': '3'}])
+        data = await db.load_history('accountId', 'MetaApi')
+        assert data['deals'] == [{'id': '1'}, {'id': '3'}]
+        await db.clear('accountId', 'MetaApi')
+
+    @pytest.mark.asyncio
+    async def test_truncate_corrupted_json_lines_db(self):
+        """Should keep records before corrupted line of db in JSON lines format."""
+        open('.metaapi/accountId-MetaApi-deals.bin', 'w').write('{"id":"1"}\n{"id":"2"}\n{"id":')
+
+        data = await db.load_history('accountId', 'MetaApi')
+        assert data['deals'] == []
+        data = await db.load_history('accountId', 'MetaApi')
+        assert data['deals'] == [{'id': '1'}, {'id': '2'}]
+        await db.clear('accountId', 'MetaApi')
+
+    @pytest.mark.asyncio
+    async def test_load_history_in_batches(self):
+        """Should load history in batches."""
+        await db.flush('accountId', 'MetaApi', [{'id': str(i), 'doneTime': '2020-04-15T02:45:06.521Z'}
+                                                for i in range(3)],
+                       [{'id': str(i), 'time': '2020-04-15T02:45:06.521Z'} for i in range(5)])
+        await db.flush('accountId', 'MetaApi', [], [{'id': '5'}])
+
+        batches = []
+        async for batch in db.load_history_in_batches('accountId', 'MetaApi', 2):
+            batches.append(batch)
+        assert list(map(lambda batch: (list(map(lambda deal: deal['id'], batch['deals'])),
+                                       list(map(lambda order: order['id'], batch['historyOrders']))), batches)) == [
+            (['0', '1'], []), (['2', '3'], []), (['4'], []), (['5'], []), ([], ['0', '1']), ([], ['2'])]
+        assert batches[0]['deals'][0]['time'] == date('2020-04-15T02:45:06.521Z')
+        await db.clear('accountId', 'MetaApi')
+
+    @pytest.mark.asyncio
+    async def test_read_history_synchronously(self):
+        """Should read history of one type within time range synchronously."""
+        await db.flush('accountId', 'MetaApi', [{'id': '1', 'doneTime': '2020-04-15T02:45:06.521Z'}],
+                       [{'id': '1', 'time': '2020-04-15T02:45:06.521Z'},
+                        {'id': '2', 'time': '2020-04-16T02:45:06.521Z'}])
+        loop_blocking_operations = db._fileIOExecutor.get_stats()['loopBlockingOperations']
+        assert db.read_history('accountId', 'MetaApi', 'deals', date('2020-04-16T00:00:00.000Z')) == \
+            [{'id': '2', 'time': date('2020-04-16T02:45:06.521Z')}]
+        assert db.read_history('accountId', 'MetaApi', 'historyOrders', None, date('2020-04-16T00:00:00.000Z')) == \
+            [{'id': '1', 'doneTime': date('2020-04-15T02:45:06.521Z')}]
+        assert db.read_history('accountId2', 'MetaApi', 'deals') == []
+        assert db._fileIOExecutor.get_stats()['loopBlockingOperations'] - loop_blocking_operations == 3
+        await db.clear('accountId', 'MetaApi')
+
+    @pytest.mark.asyncio
+    async def test_read_history_by_key(self):
+        """Should read history of a ticket or a position using key index."""
+        deals = [{'id': '1', 'positionId': '1', 'time': '2020-04-15T02:45:06.521Z'},
+                 {'id': '2', 'positionId': '1', 'time': '2020-04-16T02:45:06.521Z'},
+                 {'id': '3', 'positionId': '3', 'time': '2020-04-17T02:45:06.521Z'}]
+        await db.flush('accountId', 'MetaApi', [], deals)
+        indexed_deals = list(map(lambda deal: {**deal, 'time': date(deal['time'])}, deals[:2]))
+        await db.index_history('accountId', 'MetaApi', indexed_deals, [])
+        assert db.read_history('accountId', 'MetaApi', 'deals', field='id', value='2') == \
+            [{'id': '2', 'positionId': '1', 'time': date('2020-04-16T02:45:06.521Z')}]
+        assert list(map(lambda deal: deal['id'], await db.query_history(
+            'accountId', 'MetaApi', 'deals', None, None, 'positionId', '1'))) == ['1', '2']
+        assert await db.query_history('accountId', 'MetaApi', 'deals', date('2020-04-16T00:00:00.000Z'), None,
+                                      'id', '1') == []
+        assert db.read_history('accountId', 'MetaApi', 'deals', field='id', value='3') == []
+        assert await db.query_history('accountId', 'MetaApi', 'historyOrders', field='id', value='1') == []
+        await db.clear_index('accountId', 'MetaApi')
+        assert await db.query_history('accountId', 'MetaApi', 'deals', field='id', value='1') == []
+        await db.index_history('accountId', 'MetaApi', [{'id': '1', 'time': date('2020-04-15T02:45:06.521Z')}], [])
+        await db.clear('accountId', 'MetaApi')
+        assert await db.query_history('accountId', 'MetaApi', 'deals', field='id', value='1') == []
+
+    @pytest.mark.asyncio
+    async def test_read_history_while_segment_is_written(self):
+        """Should read history synchronously only after a segment being written is complete."""
+        await db.flush('accountId', 'MetaApi', [], [{'id': '1', 'time': '2020-04-15T02:45:06.521Z'}])
+        segment = encode_segment([{'id': '2', 'time': '2020-04-16T02:45:06.521Z'}], 'time')
+        result = []
+        reader = threading.Thread(target=lambda: result.extend(db.read_history('accountId', 'MetaApi', 'deals')))
+        with db._fileHandlesLock:
+            f = db._fileHandles['.metaapi/accountId-MetaApi-deals.bin']
+            f.write(segment[:10])
+            f.flush()
+            reader.start()
+            await sleep(0.05)
+            f.write(segment[10:])
+            f.flush()
+        reader.join()
+        assert list(map(lambda deal: deal['id'], result)) == ['1', '2']
+        data = await db.load_history('accountId', 'MetaApi')
+        assert len(data['deals']) == 2
+        await db.clear('accountId', 'MetaApi')
+
+    @pytest.mark.asyncio
+    async def test_flush_history_of_several_accounts(self):
+        """Should flush history of several accounts keeping limited number of files open."""
+        db._maxOpenFiles = 3
+        for i in range(2):
+            await db.flush_many([{'accountId': f'accountId{j}', 'application': 'MetaApi',
+                                  'historyOrders': [{'id': str(i)}], 'deals': [{'id': str(i)}]} for j in range(3)])
+            assert len(db._fileHandles) == 3
+        for j in range(3):
+            data = await db.load_history(f'accountId{j}', 'MetaApi')
+            assert data['deals'] == [{'id': '0'}, {'id': '1'}]
+            assert data['historyOrders'] == [{'id': '0'}, {'id': '1'}]
+            await db.clear(f'accountId{j}', 'MetaApi')
+        assert len(db._fileHandles) == 0
+
+    @pytest.mark.asyncio
+    async def test_compact_db(self):
+        """Should keep only the latest version of each record when db is compacted."""
+        await db.flush('accountId', 'MetaApi', [{'id': '1', 'type': 'ORDER_TYPE_BUY', 'state': 'ORDER_STATE_FILLED',
+                                                 'doneTime': '2020-04-15T02:45:06.521Z', 'volume': 1}],
+                       [{'id': '1', 'time': '2020-04-15T02:45:06.521Z', 'entryType': 'DEAL_ENTRY_IN', 'profit': 1},
+                        {'id': '2', 'time': '2020-04-15T02:45:06.521Z', 'entryType': 'DEAL_ENTRY_IN', 'profit': 1}])
+        await db.flush('accountId', 'MetaApi', [{'id': '1', 'type': 'ORDER_TYPE_BUY', 'state': 'ORDER_STATE_FILLED',
+                                                 'doneTime': '2020-04-15T02:45:06.521Z', 'volume': 2}],
+                       [{'id': '1', 'time': '2020-04-15T02:45:06.521Z', 'entryType': 'DEAL_ENTRY_IN', 'profit': 2}])
+        await db.load_history('accountId', 'MetaApi')
+        assert await db.get_garbage_ratio('accountId', 'MetaApi') == {'deals': 1 / 3, 'historyOrders': 0.5}
+        size = os.path.getsize('.metaapi/accountId-MetaApi-deals.bin')
+
+        await db.compact('accountId', 'MetaApi')
+        assert await db.get_garbage_ratio('accountId', 'MetaApi') == {'deals': 0, 'historyOrders': 0}
+        assert os.path.getsize('.metaapi/accountId-MetaApi-deals.bin') < size
+        data = await db.load_history('accountId', 'MetaApi')
+        assert list(map(lambda deal: (deal['id'], deal['profit']), data['deals'])) == [('2', 1), ('1', 2)]
+        assert list(map(lambda order: order['volume'], data['historyOrders'])) == [2]
+        await db.clear('accountId', 'MetaApi')
+
+    @pytest.mark.asyncio
+    async def test_count_updated_records_as_garbage(self):
+        """Should count written versions of records already stored in db as garbage."""
+        deals = [{'id': str(i), 'time': '2020-04-15T02:45:06.521Z'} for i in range(2)]
+        await db.flush('accountId', 'MetaApi', [], deals)
+        await db.load_history('accountId', 'MetaApi')
+        await db.flush('accountId', 'MetaApi', [], deals[:1] + [{'id': '2', 'time': '2020-04-15T02:45:06.521Z'}])
+        assert (await db.get_garbage_ratio('accountId', 'MetaApi'))['deals'] == 0.25
+        await db.clear('accountId', 'MetaApi')
+
+    @pytest.mark.asyncio
+    async def test_write_history_during_compaction(self):
+        """Should write history while db is compacted and keep history written during compaction."""
+        await db.flush('accountId', 'MetaApi', [], [{'id': '1', 'time': '2020-04-15T02:45:06.521Z', 'profit': 1}])
+        await db.flush('accountId', 'MetaApi', [], [{'id': '1', 'time': '2020-04-15T02:45:06.521Z', 'profit': 2}])
+        write_db_file = db._write_db_file
+
+        def write_compacted_db_file(*args):
+            write_db_file(*args)
+            db._write_dbs([('.metaapi/accountId-MetaApi-deals.bin', [{'id': '2'}], 'time'),
+                           ('.metaapi/accountId2-MetaApi-deals.bin', [{'id': '3'}], 'time')])
+
+        db._write_db_file = write_compacted_db_file
+        await db.compact('accountId', 'MetaApi')
+        del db._write_db_file
+        assert await db.get_garbage_ratio('accountId', 'MetaApi') == {'deals': 0, 'historyOrders': None}
+        data = await db.load_history('accountId', 'MetaApi')
+        assert list(map(lambda deal: (deal['id'], deal.get('profit')), data['deals'])) == [('1', 2), ('2', None)]
+        assert (await db.load_history('accountId2', 'MetaApi'))['deals'] == [{'id': '3'}]
+        assert not os.path.exists('.metaapi/accountId-MetaApi-deals.bin.compact.tmp')
+        await db.clear('accountId', 'MetaApi')
+        await db.clear('accountId2', 'MetaApi')
+
+    @pytest.mark.asyncio
+    async def test_compact_db_automatically(self):
+        """Should compact db in background when garbage ratio exceeds threshold."""
+        db._compactionMinRecords = 10
+        deals = [{'id': str(i), 'time': '2020-04-15T02:45:06.521Z'} for i in range(10)]
+        await db.flush('accountId', 'MetaApi', [], deals)
+        await db.load_history('accountId', 'MetaApi')
+        assert not len(db._compactionTasks)
+        await db.flush('accountId', 'MetaApi', [], deals[:5])
+        assert len(db._compactionTasks) == 1
+        await sleep(0.1)
+        assert not len(db._compactionTasks)
+        assert await db.get_garbage_ratio('accountId', 'MetaApi') == {'deals': 0, 'historyOrders': None}
+        data = await db.load_history('accountId', 'MetaApi')
+        assert len(data['deals']) == 10
+        await db.clear('accountId', 'MetaApi')
@@ -0,0 +1,110 @@
+import json
+import struct
+import zlib
+from typing import BinaryIO, Iterator, List, Optional
+from .models import date
+
+FILE_MAGIC = b'MAHDB\x00\x00\x01'
+"""Bytes a binary history file starts with."""
+
+_segment_header = struct.Struct('<4sIIdd')
+_segment_magic = b'SEGM'
+_record_length = struct.Struct('<I')
+
+
+def is_binary_history_file(file: BinaryIO) -> bool:
+    """Checks whether a history file has binary format. Reads the file magic bytes, so the file position is moved
+    past the file header if the file is binary.
+
+    Args:
+        file: History file opened in binary mode and positioned at the start.
+
+    Returns:
+        Whether the file has binary format. Empty files are considered binary.
+    """
+    magic = file.read(len(FILE_MAGIC))
+    return magic == FILE_MAGIC or not len(magic)
+
+
+def get_record_time(record: dict, time_field: str) -> float:
+    """Returns record time used in the time index.
+
+    Args:
+        record: Deal or history order, with either datetime or ISO string dates.
+        time_field: Name of the record time field.
+
+    Returns:
+        Record time as a timestamp, or 0 if the record has no time.
+    """
+    value = record.get(time_field)
+    if value is None:
+        return 0
+    return (date(value) if isinstance(value, str) else value).timestamp()
+
+
+def encode_segment(records: List[dict], time_field: str) -> bytes:
+    """Encodes records into a segment. A segment consists of a header with the number of records, payload size and
+    time range, followed by the record times and zlib-compressed length-prefixed JSON records.
+
+    Args:
+        records: Records with ISO string dates.
+        time_field: Name of the record time field.
+
+    Returns:
+        Encoded segment.
+    """
+    times = list(map(lambda record: get_record_time(record, time_field), records))
+    payload = bytearray()
+    for record in records:
+        encoded_record = json.dumps(record, separators=(',', ':')).encode('utf-8')
+        payload += _record_length.pack(len(encoded_record))
+        payload += encoded_record
+    payload = zlib.compress(bytes(payload))
+    return _segment_header.pack(_segment_magic, len(records), len(payload), min(times, default=0),
+                                max(times, default=0)) + struct.pack(f'<{len(times)}d', *times) + payload
+
+
+def read_segments(file: BinaryIO, start_time: Optional[float] = None, end_time: Optional[float] = None,
+                  end_offset: Optional[int] = None) -> Iterator[List[dict]]:
+    """Reads records of binary history file segments. Segments outside of time range are skipped without reading
+    their payload.
+
+    Args:
+        file: History file opened in binary mode and positioned after the file header.
+        start_time: Start of time range as a timestamp, inclusive, or None to read from the beginning.
+        end_time: End of time range as a timestamp, inclusive, or None to read until the end.
+        end_offset: File offset to stop reading at, or None to read until the end of file. Used to ignore segments
+        which are being appended while the file is read.
+
+    Returns:
+        Iterator over lists of records with ISO string dates, one list per segment.
+    """
+    while True:
+        if end_offset is not None and file.tell() >= end_offset:
+            return
+        header = file.read(_segment_header.size)
+        if not len(header):
+            return
+        if len(header) != _segment_header.size:
+            raise ValueError('History file segment header is truncated')
+        magic, count, payload_size, min_time, max_time = _segment_header.unpack(header)
+        if magic != _segment_magic:
+            raise ValueError('History file segment header is corrupted')
+        if (start_time is not None and max_time < start_time) or (end_time is not None and min_time > end_time):
+            file.seek(count * 8 + payload_size, 1)
+            continue
+        times_data = file.read(count * 8)
+        payload = file.read(payload_size)
+        if len(times_data) != count * 8 or len(payload) != payload_size:
+            raise ValueError('History file segment is truncated')
+        times = struct.unpack(f'<{count}d', times_data)
+        payload = zlib.decompress(payload)
+        records = []
+        offset = 0
+        for time in times:
+            length = _record_length.unpack_from(payload, offset)[0]
+            offset += _record_length.size
+            if (start_time is None or time >= start_time) and (end_time is None or time <= end_time):
+                records.append(json.loads(payload[offset:offset + length]))
+            offset += length
+        yield records
@@ -0,0 +1,186 @@
+import asyncio
+from typing import Dict, List
+from .models import MetatraderDeal, MetatraderOrder, string_format_error
+from ..logger import LoggerManager
+
+
+class HistoryFlushScheduler:
+    """Process-wide scheduler which collects new history of memory history storages and writes history of all
+    accounts to the database in grouped writes."""
+
+    def __init__(self, max_latency: float = 5, max_batch_size: int = 10000):
+        """Inits the scheduler.
+
+        Args:
+            max_latency: Maximum time in seconds new history stays in memory before it is written to database.
+            max_batch_size: Number of pending records which triggers a write before max latency is reached.
+        """
+        self._maxLatency = max_latency
+        self._maxBatchSize = max_batch_size
+        self._pendingHistory = {}
+        self._pendingRecordCount = 0
+        self._flushTask = None
+        self._flushTaskLoop = None
+        self._flushPromise = None
+        self._logger = LoggerManager.get_logger('HistoryFlushScheduler')
+
+    @staticmethod
+    def get_instance():
+        """Returns history flush scheduler instance shared by the process.
+
+        Returns:
+            History flush scheduler instance.
+        """
+        global instance
+        if not instance:
+            instance = HistoryFlushScheduler()
+        return instance
+
+    def add_history_order(self, database, account_id: str, application: str, history_order: MetatraderOrder):
+        """Adds a history order to write to database.
+
+        Args:
+            database: History database to write history order to.
+            account_id: Account id.
+            application: Application name.
+            history_order: History order to write.
+        """
+        self._get_pending_history(database, account_id, application)['historyOrders'].append(history_order)
+        self._schedule_flush()
+
+    def add_deal(self, database, account_id: str, application: str, deal: MetatraderDeal):
+        """Adds a deal to write to database.
+
+        Args:
+            database: History database to write deal to.
+            account_id: Account id.
+            application: Application name.
+            deal: Deal to write.
+        """
+        self._get_pending_history(database, account_id, application)['deals'].append(deal)
+        self._schedule_flush()
+
+    def discard(self, database, account_id: str, application: str):
+        """Discards pending history of an account, e.g. when account history is cleared.
+
+        Args:
+            database: History database.
+            account_id: Account id.
+            application: Application name.
+        """
+        history = self._pendingHistory.pop((database, account_id, application), None)
+        if history is not None:
+            self._pendingRecordCount -= len(history['historyOrders']) + len(history['deals'])
+
+    def has_pending_history(self, database, account_id: str, application: str) -> bool:
+        """Checks whether an account has history which is not written to database yet.
+
+        Args:
+            database: History database.
+            account_id: Account id.
+            application: Application name.
+
+        Returns:
+            Whether account has pending history.
+        """
+        return (database, account_id, application) in self._pendingHistory
+
+    async def flush(self):
+        """Writes all pending history to database.
+
+        Returns:
+            A coroutine resolving when pending history is written.
+        """
+        if self._flushTask is not asyncio.current_task():
+            self._cancel_flush_task()
+        self._flushTask = None
+        await self._write_pending_history()
+        if len(self._pendingHistory):
+            self._start_flush_task(self._maxLatency)
+
+    async def flush_account(self, database, account_id: str, application: str):
+        """Writes pending history of an account to database. Pending history of other accounts is written when
+        scheduled.
+
+        Args:
+            database: History database.
+            account_id: Account id.
+            application: Application name.
+
+        Returns:
+            A coroutine resolving when pending history of the account is written.
+        """
+        await self._write_pending_history([(database, account_id, application)])
+        if len(self._pendingHistory) and (self._flushTask is None or self._flushTask.done() or
+                                          self._flushTaskLoop is not asyncio.get_event_loop()):
+            self._start_flush_task(self._maxLatency)
+
+    async def _write_pending_history(self, keys: List[tuple] = None):
+        while self._flushPromise is not None:
+            await self._flushPromise
+        if keys is None:
+            pending_history = self._pendingHistory
+            self._pendingHistory = {}
+        else:
+            pending_history = {key: self._pendingHistory.pop(key) for key in keys if key in self._pendingHistory}
+        if not len(pending_history):
+            return
+        self._pendingRecordCount -= sum(map(lambda history: len(history['historyOrders']) + len(history['deals']),
+                                            pending_history.values()))
+        self._flushPromise = asyncio.Future()
+        try:
+            histories_by_database = {}
+            for (database, account_id, application), history in pending_history.items():
+                histories_by_database.setdefault(database, []).append({
+                    'accountId': account_id, 'application': application,
+                    'historyOrders': history['historyOrders'], 'deals': history['deals']})
+            for database, histories in histories_by_database.items():
+                try:
+                    await database.flush_many(histories)
+                    self._logger.debug(f'Flushed history db of {len(histories)} accounts')
+                except Exception as err:
+                    self._logger.warn(f'Error flushing history db of {len(histories)} accounts ' +
+                                      string_format_error(err))
+                    self._restore_pending_history(database, histories)
+        finally:
+            self._flushPromise.set_result(True)
+            self._flushPromise = None
+
+    def _get_pending_history(self, database, account_id: str, application: str) -> Dict:
+        key = (database, account_id, application)
+        if key not in self._pendingHistory:
+            self._pendingHistory[key] = {'historyOrders': [], 'deals': []}
+        return self._pendingHistory[key]
+
+    def _restore_pending_history(self, database, histories):
+        for history in histories:
+            pending_history = self._get_pending_history(database, history['accountId'], history['application'])
+            pending_history['historyOrders'] = history['historyOrders'] + pending_history['historyOrders']
+            pending_history['deals'] = history['deals'] + pending_history['deals']
+            self._pendingRecordCount += len(history['historyOrders']) + len(history['deals'])
+
+    def _schedule_flush(self):
+        self._pendingRecordCount += 1
+        if self._pendingRecordCount >= self._maxBatchSize:
+            self._start_flush_task(0)
+        elif self._flushTask is None or self._flushTask.done() or \
+                self._flushTaskLoop is not asyncio.get_event_loop():
+            self._start_flush_task(self._maxLatency)
+
+    def _start_flush_task(self, delay: float):
+        self._cancel_flush_task()
+        self._flushTask = asyncio.create_task(self._flush_job(delay))
+        self._flushTaskLoop = asyncio.get_event_loop()
+
+    def _cancel_flush_task(self):
+        if self._flushTask is not None and self._flushTaskLoop is asyncio.get_event_loop():
+            self._flushTask.cancel()
+        self._flushTask = None
+
+    async def _flush_job(self, delay: float):
+        await asyncio.sleep(delay)
+        self._flushTask = None
+        await self.flush()
+
+
+instance = None
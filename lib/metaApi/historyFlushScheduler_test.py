@@ -0,0 +1,94 @@
+from .historyFlushScheduler import HistoryFlushScheduler
+from mock import AsyncMock, patch
+from asyncio import sleep
+import pytest
+
+scheduler: HistoryFlushScheduler = None
+db = AsyncMock()
+deal = {'id': '1', 'type': 'DEAL_TYPE_BUY', 'entryType': 'DEAL_ENTRY_IN'}
+history_order = {'id': '2', 'type': 'ORDER_TYPE_BUY', 'state': 'ORDER_STATE_FILLED'}
+
+
+@pytest.fixture(autouse=True)
+async def run_around_tests():
+    with patch('lib.metaApi.historyFlushScheduler.asyncio.sleep', new=lambda x: sleep(x / 50)):
+        global scheduler
+        scheduler = HistoryFlushScheduler(max_batch_size=3)
+        db.flush_many = AsyncMock()
+        yield
+
+
+class TestHistoryFlushScheduler:
+
+    @pytest.mark.asyncio
+    async def test_group_history_of_accounts(self):
+        """Should write history of several accounts in a single flush after max latency."""
+        scheduler.add_deal(db, 'accountId', 'MetaApi', deal)
+        scheduler.add_history_order(db, 'accountId2', 'MetaApi', history_order)
+        await sleep(0.05)
+        db.flush_many.assert_not_called()
+        await sleep(0.1)
+        db.flush_many.assert_called_once_with([
+            {'accountId': 'accountId', 'application': 'MetaApi', 'historyOrders': [], 'deals': [deal]},
+            {'accountId': 'accountId2', 'application': 'MetaApi', 'historyOrders': [history_order], 'deals': []}])
+
+    @pytest.mark.asyncio
+    async def test_flush_when_batch_size_reached(self):
+        """Should write history without waiting for max latency when batch size is reached."""
+        for i in range(3):
+            scheduler.add_deal(db, 'accountId', 'MetaApi', deal)
+        await sleep(0.01)
+        db.flush_many.assert_called_once_with([
+            {'accountId': 'accountId', 'application': 'MetaApi', 'historyOrders': [], 'deals': [deal, deal, deal]}])
+
+    @pytest.mark.asyncio
+    async def test_flush_on_demand(self):
+        """Should write pending history when flush is requested."""
+        scheduler.add_deal(db, 'accountId', 'MetaApi', deal)
+        await scheduler.flush()
+        db.flush_many.assert_called_once()
+        await sleep(0.15)
+        db.flush_many.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_retry_failed_flush(self):
+        """Should keep history pending and retry if flush fails."""
+        db.flush_many = AsyncMock(side_effect=[Exception('test'), None])
+        scheduler.add_deal(db, 'accountId', 'MetaApi', deal)
+        await scheduler.flush()
+        scheduler.add_history_order(db, 'accountId', 'MetaApi', history_order)
+        await sleep(0.15)
+        db.flush_many.assert_called_with([
+            {'accountId': 'accountId', 'application': 'MetaApi', 'historyOrders': [history_order], 'deals': [deal]}])
+        assert db.flush_many.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_discard_pending_history(self):
+        """Should not write discarded history."""
+        scheduler.add_deal(db, 'accountId', 'MetaApi', deal)
+        scheduler.discard(db, 'accountId', 'MetaApi')
+        await scheduler.flush()
+        db.flush_many.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_report_pending_history(self):
+        """Should report whether account has history which is not written yet."""
+        scheduler.add_deal(db, 'accountId', 'MetaApi', deal)
+        assert scheduler.has_pending_history(db, 'accountId', 'MetaApi')
+        assert not scheduler.has_pending_history(db, 'accountId2', 'MetaApi')
+        await scheduler.flush()
+        assert not scheduler.has_pending_history(db, 'accountId', 'MetaApi')
+
+    @pytest.mark.asyncio
+    async def test_flush_account_on_demand(self):
+        """Should write pending history of an account on demand and history of other accounts when scheduled."""
+        scheduler.add_deal(db, 'accountId', 'MetaApi', deal)
+        scheduler.add_history_order(db, 'accountId2', 'MetaApi', history_order)
+        await scheduler.flush_account(db, 'accountId', 'MetaApi')
+        db.flush_many.assert_called_once_with([
+            {'accountId': 'accountId', 'application': 'MetaApi', 'historyOrders': [], 'deals': [deal]}])
+        assert scheduler.has_pending_history(db, 'accountId2', 'MetaApi')
+        await sleep(0.15)
+        db.flush_many.assert_called_with([
+            {'accountId': 'accountId2', 'application': 'MetaApi', 'historyOrders': [history_order], 'deals': []}])
+        assert db.flush_many.call_count == 2
@@ -1,63 +1,169 @@
-import json
-from copy import copy
-from .models import format_date, date
-from datetime import datetime
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+from .models import date
+from typing import Callable, List, Hashable, Iterable, Tuple
 
 
 class HistoryItemsMemoryStorage:
-    """Class to handle deals and history orders storage"""
+    """Class to handle deals and history orders storage. Items are kept sorted by comparator, so that range
+    queries do not need to scan and sort all items."""
 
-    def __init__(self, comparator):
+    def __init__(self, comparator: Callable, time_field: str = None):
+        """Inits the storage.
+
+        Args:
+            comparator: Function returning a sort key of an item.
+            time_field: Name of the item time field which is used to find items by time range using binary search.
+        """
         self._items = {}
         self._comparator = comparator
+        self._timeField = time_field
+        self._hasItemsWithoutTime = False
+        self._sortedTimes = []
+        self._sortedKeys = []
+        self._sortedItemKeys = []
+        self._pendingSortKeys = {}
+
+    def insert(self, key: Hashable, value: dict):
+        """Inserts an item, replacing the item stored with the same key.
 
-    def insert(self, key: dict, value: dict):
-        key = self._convert_key(key)
+        Args:
+            key: Item key.
+            value: Item to insert.
+        """
+        self._apply_pending_items()
+        if key in self._items:
+            self._remove_sorted_entry(key)
         self._items[key] = value
+        sort_key = self._get_sort_key(value)
+        index = bisect_right(self._sortedKeys, sort_key)
+        self._sortedKeys.insert(index, sort_key)
+        self._sortedTimes.insert(index, sort_key[0])
+        self._sortedItemKeys.insert(index, key)
+
+    def insert_many(self, items: Iterable[Tuple[Hashable, dict]]):
+        """Inserts several items at once, replacing the items stored with the same keys. The new items are added to
+        the sorted index on the next query or single item change, so that consecutive batches are sorted and merged
+        into the index once instead of on every batch.
+
+        Args:
+            items: Iterable of item key and item pairs.
+        """
+        for key, value in items:
+            if key in self._items and key not in self._pendingSortKeys:
+                self._remove_sorted_entry(key)
+            self._items[key] = value
+            self._pendingSortKeys[key] = self._get_sort_key(value)
 
-    def delete(self, key: dict):
-        key = self._convert_key(key)
+    def delete(self, key: Hashable):
+        """Deletes an item.
+
+        Args:
+            key: Item key.
+        """
+        self._apply_pending_items()
         if key in self._items:
+            self._remove_sorted_entry(key)
             del self._items[key]
 
-    def between_bounds(self, gte, lte):
-        found_items = []
-        for key in self._items.keys():
-            valid = True
+    def delete_many(self, items: Iterable[Tuple[Hashable, dict]]):
+        """Deletes several items at once. An item is deleted only if it was not replaced since it was returned,
+        and the sorted index is rebuilt once instead of on every item.
+
+        Args:
+            items: Iterable of item key and item pairs.
+        """
+        self._apply_pending_items()
+        deleted_keys = set()
+        for key, value in items:
+            if self._items.get(key) is value:
+                del self._items[key]
+                deleted_keys.add(key)
+        if not len(deleted_keys):
+            return
+        entries = [entry for entry in zip(self._sortedKeys, self._sortedTimes, self._sortedItemKeys)
+                   if entry[2] not in deleted_keys]
+        self._sortedKeys = list(map(itemgetter(0), entries))
+        self._sortedTimes = list(map(itemgetter(1), entries))
+        self._sortedItemKeys = list(map(itemgetter(2), entries))
+
+    def get_oldest(self, count: int) -> List[Tuple[Hashable, dict]]:
+        """Returns the items which are first in the sort order, i.e. the oldest items if the storage has a time
+        field.
 
-            item = self._items[key]
+        Args:
+            count: Maximum number of items to return.
 
-            if lte:
-                for lte_key in lte.keys():
-                    lte_item = lte[lte_key]
-                    check_value = item[lte_key] if lte_key in item else date(0)
+        Returns:
+            List of item key and item pairs.
+        """
+        self._apply_pending_items()
+        return [(key, self._items[key]) for key in self._sortedItemKeys[:max(count, 0)]]
 
-                    if check_value.timestamp() > lte_item.timestamp():
-                        valid = False
-                        break
+    def __len__(self) -> int:
+        return len(self._items)
 
-            if not valid:
-                continue
+    def between_bounds(self, gte, lte) -> List[dict]:
+        self._apply_pending_items()
+        if self._timeField is not None and all(map(lambda bounds: not bounds or list(bounds.keys()) ==
+                                                   [self._timeField], [gte, lte])):
+            start_index = bisect_left(self._sortedTimes, gte[self._timeField].timestamp()) if gte else 0
+            end_index = bisect_right(self._sortedTimes, lte[self._timeField].timestamp()) if lte else \
+                len(self._sortedTimes)
+            found_items = [self._items[key] for key in self._sortedItemKeys[start_index:end_index]]
+        else:
+            found_items = list(filter(lambda item: self._is_between_bounds(item, gte, lte),
+                                      map(lambda key: self._items[key], self._sortedItemKeys)))
 
-            if gte:
-                for gte_key in gte.keys():
-                    gte_item = gte[gte_key]
-                    check_value = item[gte_key] if gte_key in item else date(0)
+        # items without time are placed at the time used to compare them with bounds, so their order may differ
+        # from comparator order
+        if self._hasItemsWithoutTime:
+            found_items = sorted(found_items, key=self._comparator)
+        return found_items
 
-                    if check_value.timestamp() < gte_item.timestamp():
-                        valid = False
-                        break
+    def _get_sort_key(self, item: dict) -> tuple:
+        if self._timeField is None:
+            return (0, self._comparator(item))
+        if self._timeField not in item:
+            self._hasItemsWithoutTime = True
+        return (item[self._timeField] if self._timeField in item else date(0)).timestamp(), self._comparator(item)
 
-            if valid:
-                found_items.append(item)
+    def _apply_pending_items(self):
+        if not len(self._pendingSortKeys):
+            return
+        entries = sorted(map(lambda entry: (entry[1], entry[0]), self._pendingSortKeys.items()), key=itemgetter(0))
+        self._pendingSortKeys = {}
+        if len(self._sortedKeys) and self._sortedKeys[-1] > entries[0][0]:
+            # both lists are sorted, so sorting their concatenation merges them in linear time
+            entries = list(zip(self._sortedKeys, self._sortedItemKeys)) + entries
+            entries.sort(key=itemgetter(0))
+            self._sortedKeys = []
+            self._sortedTimes = []
+            self._sortedItemKeys = []
+        self._sortedKeys.extend(map(itemgetter(0), entries))
+        self._sortedTimes.extend(map(lambda entry: entry[0][0], entries))
+        self._sortedItemKeys.extend(map(itemgetter(1), entries))
 
-        sorted_items = sorted(found_items, key=self._comparator)
-        return sorted_items
+    def _remove_sorted_entry(self, key: Hashable):
+        index = bisect_left(self._sortedKeys, self._get_sort_key(self._items[key]))
+        while self._sortedItemKeys[index] != key:
+            index += 1
+        del self._sortedKeys[index]
+        del self._sortedTimes[index]
+        del self._sortedItemKeys[index]
 
     @staticmethod
-    def _convert_key(key: dict) -> str:
-        key = copy(key)
-        for prop in key.keys():
-            if isinstance(key[prop], datetime):
-                key[prop] = format_date(key[prop])
-        return json.dumps(key)
+    def _is_between_bounds(item: dict, gte, lte) -> bool:
+        if lte:
+            for lte_key in lte.keys():
+                check_value = item[lte_key] if lte_key in item else date(0)
+                if check_value.timestamp() > lte[lte_key].timestamp():
+                    return False
+
+        if gte:
+            for gte_key in gte.keys():
+                check_value = item[gte_key] if gte_key in item else date(0)
+                if check_value.timestamp() < gte[gte_key].timestamp():
+                    return False
+
+        return True
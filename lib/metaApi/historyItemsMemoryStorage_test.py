@@ -0,0 +1,103 @@
+from .historyItemsMemoryStorage import HistoryItemsMemoryStorage
+from .models import date
+import random
+
+
+def deals_comparator(d):
+    return d['time'].timestamp() if 'time' in d else 0, int(d['id']), d['entryType'] if 'entryType' in d else ''
+
+
+class TestHistoryItemsMemoryStorage:
+
+    def test_return_items_by_time_range(self):
+        """Should return items within time range sorted by comparator."""
+        storage = HistoryItemsMemoryStorage(deals_comparator, 'time')
+        deals = [{'id': str(i), 'time': date(1600000000 + (i * 7919) % 1000), 'entryType': 'DEAL_ENTRY_IN'}
+                 for i in range(1000)]
+        for deal in deals:
+            storage.insert(deal['id'], deal)
+        assert storage.between_bounds({'time': date(1600000000)}, {'time': date(1600001000)}) == \
+            sorted(deals, key=deals_comparator)
+        assert storage.between_bounds({'time': date(1600000100)}, {'time': date(1600000200)}) == sorted(
+            filter(lambda d: 1600000100 <= d['time'].timestamp() <= 1600000200, deals), key=deals_comparator)
+        assert storage.between_bounds({'time': date(1600002000)}, {'time': date(1600003000)}) == []
+
+    def test_replace_and_delete_items(self):
+        """Should keep index up to date when items are replaced and deleted."""
+        storage = HistoryItemsMemoryStorage(deals_comparator, 'time')
+        rng = random.Random(1)
+        expected = {}
+        for i in range(2000):
+            deal = {'id': str(rng.randint(0, 100)), 'time': date(1600000000 + rng.randint(0, 100)),
+                    'entryType': rng.choice(['DEAL_ENTRY_IN', 'DEAL_ENTRY_OUT'])}
+            key = (deal['time'], deal['id'], deal['entryType'])
+            if rng.random() < 0.3:
+                storage.delete(key)
+                expected.pop(key, None)
+            else:
+                storage.insert(key, deal)
+                expected[key] = deal
+        assert storage.between_bounds({'time': date(1600000020)}, {'time': date(1600000080)}) == sorted(
+            filter(lambda d: 1600000020 <= d['time'].timestamp() <= 1600000080, expected.values()),
+            key=deals_comparator)
+
+    def test_return_items_without_time(self):
+        """Should compare items without time as if their time was date(0)."""
+        storage = HistoryItemsMemoryStorage(deals_comparator, 'time')
+        deals = [{'id': '1', 'time': date(1600000000)}, {'id': '2'}, {'id': '3', 'time': date(100000)}]
+        for deal in deals:
+            storage.insert(deal['id'], deal)
+        assert storage.between_bounds({'time': date(0)}, {'time': date(8640000000)}) == \
+            [deals[1], deals[2], deals[0]]
+        assert storage.between_bounds({'time': date(1000000)}, {'time': date(8640000000)}) == [deals[0]]
+
+    def test_filter_by_other_fields(self):
+        """Should filter items by fields other than time field."""
+        storage = HistoryItemsMemoryStorage(deals_comparator)
+        deals = [{'id': '1', 'time': date(1600000000), 'doneTime': date(1600000010)},
+                 {'id': '2', 'time': date(1600000005), 'doneTime': date(1600000020)}]
+        for deal in deals:
+            storage.insert(deal['id'], deal)
+        assert storage.between_bounds({'doneTime': date(1600000015)}, None) == [deals[1]]
+
+    def test_insert_many_items(self):
+        """Should insert several items at once."""
+        storage = HistoryItemsMemoryStorage(deals_comparator, 'time')
+        deals = [{'id': str(i), 'time': date(1600000000 + (i * 7919) % 1000)} for i in range(1000)]
+        storage.insert(deals[0]['id'], {'id': '0', 'time': date(1700000000)})
+        storage.insert_many(map(lambda deal: (deal['id'], deal), deals))
+        storage.insert('1000', {'id': '1000', 'time': date(1600000500)})
+        storage.delete('1')
+        expected = sorted(deals[:1] + deals[2:] + [{'id': '1000', 'time': date(1600000500)}], key=deals_comparator)
+        assert storage.between_bounds({'time': date(0)}, {'time': date(8640000000)}) == expected
+
+    def test_insert_batches_of_items(self):
+        """Should merge batches of items into sorted index when items are queried."""
+        storage = HistoryItemsMemoryStorage(deals_comparator, 'time')
+        rng = random.Random(1)
+        deals = [{'id': str(i), 'time': date(1600000000 + rng.randint(0, 1000))} for i in range(1000)]
+        storage.insert_many(map(lambda deal: (deal['id'], deal), deals[:500]))
+        assert storage.between_bounds({'time': date(0)}, {'time': date(8640000000)}) == \
+            sorted(deals[:500], key=deals_comparator)
+        replaced_deal = {'id': '0', 'time': date(1600002000)}
+        for i in range(500, 1000, 100):
+            storage.insert_many(map(lambda deal: (deal['id'], deal), deals[i:i + 100]))
+        storage.insert_many([('0', replaced_deal), ('600', deals[600])])
+        assert len(storage._sortedKeys) == 499
+        expected = sorted(deals[1:] + [replaced_deal], key=deals_comparator)
+        assert storage.between_bounds({'time': date(0)}, {'time': date(8640000000)}) == expected
+        assert len(storage._sortedKeys) == 1000
+
+    def test_delete_oldest_items(self):
+        """Should return oldest items and delete them unless they were replaced."""
+        storage = HistoryItemsMemoryStorage(deals_comparator, 'time')
+        deals = [{'id': str(i), 'time': date(1600000000 + (i * 7919) % 100)} for i in range(100)]
+        storage.insert_many(map(lambda deal: (deal['id'], deal), deals))
+        oldest = storage.get_oldest(10)
+        assert list(map(lambda item: item[1], oldest)) == sorted(deals, key=deals_comparator)[:10]
+        replaced_deal = {**oldest[0][1]}
+        storage.insert(oldest[0][0], replaced_deal)
+        storage.delete_many(oldest)
+        assert len(storage) == 91
+        assert storage.get_oldest(1) == [(replaced_deal['id'], replaced_deal)]
+        assert storage.between_bounds(None, None) == [replaced_deal] + sorted(deals, key=deals_comparator)[10:]
@@ -0,0 +1,60 @@
+import sys
+from typing import Dict, Tuple
+
+_interned_fields = frozenset(['symbol', 'type', 'state', 'entryType', 'platform', 'reason', 'fillingMode',
+                              'expirationType'])
+_field_indexes: Dict[Tuple[str, ...], Dict[str, int]] = {}
+
+
+class HistoryRecord:
+    """Compact read-only representation of a deal or history order kept by memory history storage. Values are stored
+    in a tuple, field names are shared by all records with the same set of fields, and values of enumeration fields
+    such as symbol, type and state are interned, so that a record takes several times less memory than a dict. The
+    record supports read access of a dict, use to_dict to get a dict."""
+
+    __slots__ = ('_fieldIndexes', '_values')
+
+    def __init__(self, item: Dict):
+        """Inits the record.
+
+        Args:
+            item: Deal or history order.
+        """
+        fields = tuple(item.keys())
+        field_indexes = _field_indexes.get(fields)
+        if field_indexes is None:
+            field_indexes = dict(map(lambda entry: (sys.intern(entry[1]), entry[0]), enumerate(fields)))
+            _field_indexes[fields] = field_indexes
+        self._fieldIndexes = field_indexes
+        self._values = tuple(map(lambda entry: sys.intern(entry[1]) if entry[0] in _interned_fields and
+                                 isinstance(entry[1], str) else entry[1], item.items()))
+
+    def __getitem__(self, field: str):
+        return self._values[self._fieldIndexes[field]]
+
+    def __contains__(self, field: str) -> bool:
+        return field in self._fieldIndexes
+
+    def __repr__(self) -> str:
+        return f'HistoryRecord({self.to_dict()!r})'
+
+    def get(self, field: str, default=None):
+        """Returns a field value.
+
+        Args:
+            field: Field name.
+            default: Value to return if record does not have the field.
+
+        Returns:
+            Field value.
+        """
+        index = self._fieldIndexes.get(field)
+        return default if index is None else self._values[index]
+
+    def to_dict(self) -> Dict:
+        """Converts the record to a new dict.
+
+        Returns:
+            Deal or history order dict.
+        """
+        return dict(zip(self._fieldIndexes, self._values))
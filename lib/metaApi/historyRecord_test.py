@@ -0,0 +1,30 @@
+from .historyRecord import HistoryRecord
+from .models import date
+
+
+class TestHistoryRecord:
+
+    def test_provide_read_access_to_fields(self):
+        """Should provide read access to fields of a record."""
+        record = HistoryRecord({'id': '1', 'type': 'DEAL_TYPE_BUY', 'time': date('2020-04-15T02:45:06.521Z')})
+        assert record['type'] == 'DEAL_TYPE_BUY'
+        assert record['time'] == date('2020-04-15T02:45:06.521Z')
+        assert 'id' in record
+        assert 'positionId' not in record
+        assert record.get('positionId') is None
+        assert record.get('positionId', '') == ''
+
+    def test_convert_to_dict(self):
+        """Should convert record to a new dict with original field order."""
+        deal = {'id': '1', 'type': 'DEAL_TYPE_BUY', 'entryType': 'DEAL_ENTRY_IN', 'profit': 10}
+        record = HistoryRecord(deal)
+        assert record.to_dict() == deal
+        assert list(record.to_dict().keys()) == list(deal.keys())
+        assert record.to_dict() is not record.to_dict()
+
+    def test_share_field_names_and_intern_values(self):
+        """Should share field names of records with the same fields and intern enumeration values."""
+        records = [HistoryRecord({'id': str(i), 'symbol': ''.join(['EUR', 'USD']), 'type': 'DEAL_TYPE_BUY'})
+                   for i in range(2)]
+        assert records[0]._fieldIndexes is records[1]._fieldIndexes
+        assert records[0]['symbol'] is records[1]['symbol']
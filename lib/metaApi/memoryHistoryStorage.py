@@ -1,44 +1,65 @@
 from .models import MetatraderDeal, MetatraderOrder
-from typing import List
+from typing import Dict, List, Optional, Tuple
 from .memoryHistoryStorageModel import MemoryHistoryStorageModel
 from .filesystemHistoryDatabase import FilesystemHistoryDatabase
 from datetime import datetime
-from .models import date, format_date, string_format_error
+from .models import date
 from ..logger import LoggerManager
 from .historyItemsMemoryStorage import HistoryItemsMemoryStorage
-from copy import copy
+from .historyRecord import HistoryRecord
+from .historyFlushScheduler import HistoryFlushScheduler
 import asyncio
 
 
 class MemoryHistoryStorage(MemoryHistoryStorageModel):
-    """History storage which stores MetaTrader history in RAM."""
+    """History storage which stores MetaTrader history in RAM as compact records which are converted to dicts when
+    returned. Optionally only a limited number of recent records is kept in RAM, older history is served from the
+    history database on disk."""
 
-    def __init__(self):
-        """Inits the in-memory history store instance"""
+    batched_prices_only = True
+
+    def __init__(self, max_records_in_memory: int = None):
+        """Inits the in-memory history store instance
+
+        Args:
+            max_records_in_memory: Maximum number of deals and maximum number of history orders to keep in memory,
+            or None to keep all history in memory. Oldest records are removed from memory once they are written to
+            the history database, so the limit may be exceeded only by records which are not written yet. Tickets and
+            position ids of removed records are kept in the key index of the history database on disk.
+        """
         super().__init__()
         self._historyDatabase = FilesystemHistoryDatabase.get_instance()
+        self._flushScheduler = HistoryFlushScheduler.get_instance()
+        self._maxRecordsInMemory = max_records_in_memory
+        self._evictionTask = None
         self._maxHistoryOrderTime = None
         self._maxDealTime = None
-        self._flushPromise = None
-        self._flushRunning = None
-        self._flushTimeout = None
         self._reset()
         self._logger = LoggerManager.get_logger('MemoryHistoryStorage')
 
     async def initialize(self, account_id: str, application: str = 'MetaApi'):
-        """Initializes the storage and loads required data from a persistent storage."""
+        """Initializes the storage and loads required data from a persistent storage. History is loaded in batches,
+        yielding to the event loop between batches so that loading large histories does not block other tasks."""
         await super(MemoryHistoryStorage, self).initialize(account_id, application)
-        history = await self._historyDatabase.load_history(account_id, application)
-
-        for deal in history['deals']:
-            await self._add_deal(deal, True)
-
-        for history_order in history['historyOrders']:
-            await self._add_history_order(history_order, True)
+        if self._maxRecordsInMemory is not None:
+            await self._historyDatabase.clear_index(account_id, application)
+        async for history in self._historyDatabase.load_history_in_batches(account_id, application):
+            deals = history['deals']
+            history_orders = history['historyOrders']
+            if self._maxRecordsInMemory is not None:
+                # records older than evicted history are written to the key index right away
+                deals, cold_deals = self._split_cold_deals(deals)
+                history_orders, cold_history_orders = self._split_cold_history_orders(history_orders)
+                await self._historyDatabase.index_history(account_id, application, cold_deals, cold_history_orders)
+            self._add_existing_deals(deals)
+            self._add_existing_history_orders(history_orders)
+            await self._evict_history()
+            await asyncio.sleep(0)
 
     async def clear(self):
         """Clears the storage and deletes persistent data."""
         self._reset()
+        self._flushScheduler.discard(self._historyDatabase, self._accountId, self._application)
         await self._historyDatabase.clear(self._accountId, self._application)
 
     async def last_history_order_time(self, instance_number: int = None) -> datetime:
@@ -89,15 +110,17 @@ class MemoryHistoryStorage(MemoryHistoryStorageModel):
 
     @property
     def deals(self) -> List[MetatraderDeal]:
-        """Returns all deals stored in history storage.
+        """Returns all deals kept in memory. If the number of records in memory is limited, deals removed from memory
+        are not returned, use load_deals to get them.
 
         Returns:
-            All deals stored in history storage.
+            Deals kept in memory.
         """
-        return self.get_deals_by_time_range(date(0), date(8640000000))
+        return self._to_dicts(self._dealsByTime.between_bounds(None, None))
 
     def get_deals_by_ticket(self, id: str) -> List[MetatraderDeal]:
-        """Returns deals by ticket id.
+        """Returns deals by ticket id. If deals of the ticket were removed from memory, they are read from disk while
+        the event loop is blocked, use load_deals_by_ticket to read them in file IO thread.
 
         Args:
             id: Ticket id.
@@ -105,11 +128,12 @@ class MemoryHistoryStorage(MemoryHistoryStorageModel):
         Returns:
             Deals found.
         """
-        deals = self._dealsByTicket[id].values() if id in self._dealsByTicket else []
-        return sorted(deals, key=self._dealsComparator)
+        deals = list(self._dealsByTicket[id].values()) if id in self._dealsByTicket else []
+        return self._merge_deals(deals, self._read_cold_history('deals', field='id', value=id), True)
 
     def get_deals_by_position(self, position_id: str) -> List[MetatraderDeal]:
-        """Returns deals by position id.
+        """Returns deals by position id. If deals of the position were removed from memory, they are read from disk
+        while the event loop is blocked, use load_deals_by_position to read them in file IO thread.
 
         Args:
             position_id: Position id.
@@ -117,11 +141,14 @@ class MemoryHistoryStorage(MemoryHistoryStorageModel):
         Returns:
             Deals found.
         """
-        deals = self._dealsByPosition[position_id].values() if position_id in self._dealsByPosition else []
-        return sorted(deals, key=self._dealsComparator)
+        deals = list(self._dealsByPosition[position_id].values()) if position_id in self._dealsByPosition else []
+        return self._merge_deals(deals, self._read_cold_history('deals', field='positionId', value=position_id),
+                                 True)
 
     def get_deals_by_time_range(self, start_time: datetime, end_time: datetime) -> List[MetatraderDeal]:
-        """Returns deals by time range.
+        """Returns deals by time range. If the time range includes deals removed from memory, only the part of the
+        history file within the time range is read from disk while the event loop is blocked, use
+        load_deals_by_time_range to read it in file IO thread.
 
         Args:
             start_time: Start time, inclusive.
@@ -130,19 +157,70 @@ class MemoryHistoryStorage(MemoryHistoryStorageModel):
         Returns:
             Deals found.
         """
-        return self._dealsByTime.between_bounds({'time': start_time}, {'time': end_time})
+        deals = self._dealsByTime.between_bounds({'time': start_time}, {'time': end_time})
+        return self._merge_deals(deals, self._read_cold_history('deals', start_time, end_time))
+
+    async def load_deals(self) -> List[MetatraderDeal]:
+        """Returns all deals, including deals removed from memory, which are read in file IO thread.
+
+        Returns:
+            A coroutine resolving with all deals stored in history storage.
+        """
+        deals = self._dealsByTime.between_bounds(None, None)
+        return self._merge_deals(deals, await self._load_cold_history('deals'))
+
+    async def load_deals_by_ticket(self, id: str) -> List[MetatraderDeal]:
+        """Returns deals by ticket id, reading deals removed from memory in file IO thread.
+
+        Args:
+            id: Ticket id.
+
+        Returns:
+            A coroutine resolving with deals found.
+        """
+        deals = list(self._dealsByTicket[id].values()) if id in self._dealsByTicket else []
+        return self._merge_deals(deals, await self._load_cold_history('deals', field='id', value=id), True)
+
+    async def load_deals_by_position(self, position_id: str) -> List[MetatraderDeal]:
+        """Returns deals by position id, reading deals removed from memory in file IO thread.
+
+        Args:
+            position_id: Position id.
+
+        Returns:
+            A coroutine resolving with deals found.
+        """
+        deals = list(self._dealsByPosition[position_id].values()) if position_id in self._dealsByPosition else []
+        return self._merge_deals(deals, await self._load_cold_history('deals', field='positionId', value=position_id),
+                                 True)
+
+    async def load_deals_by_time_range(self, start_time: datetime, end_time: datetime) -> List[MetatraderDeal]:
+        """Returns deals by time range, reading deals removed from memory in file IO thread.
+
+        Args:
+            start_time: Start time, inclusive.
+            end_time: End time, inclusive.
+
+        Returns:
+            A coroutine resolving with deals found.
+        """
+        deals = self._dealsByTime.between_bounds({'time': start_time}, {'time': end_time})
+        return self._merge_deals(deals, await self._load_cold_history('deals', start_time, end_time))
 
     @property
     def history_orders(self) -> List[MetatraderOrder]:
-        """Returns all history orders stored in history storage.
+        """Returns all history orders kept in memory. If the number of records in memory is limited, history orders
+        removed from memory are not returned, use load_history_orders to get them.
 
         Returns:
-            All history orders stored in history storage.
+            History orders kept in memory.
         """
-        return self.get_history_orders_by_time_range(date(0), date(8640000000))
+        return self._to_dicts(self._historyOrdersByTime.between_bounds(None, None))
 
     def get_history_orders_by_ticket(self, id: str) -> List[MetatraderOrder]:
-        """Returns history orders by ticket id.
+        """Returns history orders by ticket id. If history orders of the ticket were removed from memory, they are
+        read from disk while the event loop is blocked, use load_history_orders_by_ticket to read them in file IO
+        thread.
 
         Args:
             id: Ticket id.
@@ -150,11 +228,14 @@ class MemoryHistoryStorage(MemoryHistoryStorageModel):
         Returns:
             History orders found.
         """
-        history_orders = self._historyOrdersByTicket[id].values() if id in self._historyOrdersByTicket else []
-        return sorted(history_orders, key=self._historyOrdersComparator)
+        history_orders = list(self._historyOrdersByTicket[id].values()) if id in self._historyOrdersByTicket else []
+        return self._merge_history_orders(history_orders, self._read_cold_history('historyOrders', field='id',
+                                                                                  value=id), True)
 
     def get_history_orders_by_position(self, position_id: str) -> List[MetatraderOrder]:
-        """Returns history orders by position id.
+        """Returns history orders by position id. If history orders of the position were removed from memory, they
+        are read from disk while the event loop is blocked, use load_history_orders_by_position to read them in file
+        IO thread.
 
         Args:
             position_id: Position id.
@@ -162,12 +243,15 @@ class MemoryHistoryStorage(MemoryHistoryStorageModel):
         Returns:
             History orders found.
         """
-        history_orders = self._historyOrdersByPosition[position_id].values() if position_id in \
+        history_orders = list(self._historyOrdersByPosition[position_id].values()) if position_id in \
             self._historyOrdersByPosition else []
-        return sorted(history_orders, key=self._historyOrdersComparator)
+        return self._merge_history_orders(history_orders, self._read_cold_history(
+            'historyOrders', field='positionId', value=position_id), True)
 
     def get_history_orders_by_time_range(self, start_time: datetime, end_time: datetime) -> List[MetatraderOrder]:
-        """Returns history orders by time range.
+        """Returns history orders by time range. If the time range includes history orders removed from memory, only
+        the part of the history file within the time range is read from disk while the event loop is blocked, use
+        load_history_orders_by_time_range to read it in file IO thread.
 
         Args:
             start_time: Start time, inclusive.
@@ -176,7 +260,61 @@ class MemoryHistoryStorage(MemoryHistoryStorageModel):
         Returns:
             History orders found.
         """
-        return self._historyOrdersByTime.between_bounds({'doneTime': start_time}, {'doneTime': end_time})
+        history_orders = self._historyOrdersByTime.between_bounds({'doneTime': start_time}, {'doneTime': end_time})
+        return self._merge_history_orders(history_orders, self._read_cold_history('historyOrders', start_time,
+                                                                                  end_time))
+
+    async def load_history_orders(self) -> List[MetatraderOrder]:
+        """Returns all history orders, including history orders removed from memory, which are read in file IO
+        thread.
+
+        Returns:
+            A coroutine resolving with all history orders stored in history storage.
+        """
+        history_orders = self._historyOrdersByTime.between_bounds(None, None)
+        return self._merge_history_orders(history_orders, await self._load_cold_history('historyOrders'))
+
+    async def load_history_orders_by_ticket(self, id: str) -> List[MetatraderOrder]:
+        """Returns history orders by ticket id, reading history orders removed from memory in file IO thread.
+
+        Args:
+            id: Ticket id.
+
+        Returns:
+            A coroutine resolving with history orders found.
+        """
+        history_orders = list(self._historyOrdersByTicket[id].values()) if id in self._historyOrdersByTicket else []
+        return self._merge_history_orders(history_orders, await self._load_cold_history(
+            'historyOrders', field='id', value=id), True)
+
+    async def load_history_orders_by_position(self, position_id: str) -> List[MetatraderOrder]:
+        """Returns history orders by position id, reading history orders removed from memory in file IO thread.
+
+        Args:
+            position_id: Position id.
+
+        Returns:
+            A coroutine resolving with history orders found.
+        """
+        history_orders = list(self._historyOrdersByPosition[position_id].values()) if position_id in \
+            self._historyOrdersByPosition else []
+        return self._merge_history_orders(history_orders, await self._load_cold_history(
+            'historyOrders', field='positionId', value=position_id), True)
+
+    async def load_history_orders_by_time_range(self, start_time: datetime,
+                                                end_time: datetime) -> List[MetatraderOrder]:
+        """Returns history orders by time range, reading history orders removed from memory in file IO thread.
+
+        Args:
+            start_time: Start time, inclusive.
+            end_time: End time, inclusive.
+
+        Returns:
+            A coroutine resolving with history orders found.
+        """
+        history_orders = self._historyOrdersByTime.between_bounds({'doneTime': start_time}, {'doneTime': end_time})
+        return self._merge_history_orders(history_orders, await self._load_cold_history(
+            'historyOrders', start_time, end_time))
 
     async def on_deals_synchronized(self, instance_index: str, synchronization_id: str):
         """Invoked when a synchronization of history deals on a MetaTrader account have finished to indicate progress
@@ -204,108 +342,240 @@ class MemoryHistoryStorage(MemoryHistoryStorageModel):
             return o['doneTime'].timestamp() if 'doneTime' in o else 0, int(o['id']), o['type'], o['state']
 
         self._historyOrdersComparator = history_orders_comparator
-        self._historyOrdersByTime = HistoryItemsMemoryStorage(self._historyOrdersComparator)
+        self._historyOrdersByTime = HistoryItemsMemoryStorage(self._historyOrdersComparator, 'doneTime')
 
         def deals_comparator(d):
             return d['time'].timestamp() if 'time' in d else 0, int(d['id']), d['entryType'] if 'entryType' in d else ''
 
         self._dealsComparator = deals_comparator
-        self._dealsByTime = HistoryItemsMemoryStorage(self._dealsComparator)
+        self._dealsByTime = HistoryItemsMemoryStorage(self._dealsComparator, 'time')
         self._maxHistoryOrderTime = date(0)
         self._maxDealTime = date(0)
-        self._newHistoryOrders = []
-        self._newDeals = []
-        if self._flushTimeout is not None:
-            self._flushTimeout.cancel()
-        self._flushTimeout = None
+        self._coldHistoryUntil = {'deals': None, 'historyOrders': None}
 
     async def _add_deal(self, deal, existing=False):
         key = self._get_deal_key(deal)
+        new_deal = not existing and (deal['id'] not in self._dealsByTicket or
+                                     key not in self._dealsByTicket[deal['id']])
+        record = HistoryRecord(deal)
+        self._index_deal(key, record)
+        self._dealsByTime.insert(key, record)
+
+        if new_deal:
+            self._flushScheduler.add_deal(self._historyDatabase, self._accountId, self._application, deal)
+            self._schedule_eviction()
+
+    def _add_existing_deals(self, deals: List[MetatraderDeal]):
+        keys_and_deals = list(map(lambda deal: (self._get_deal_key(deal), HistoryRecord(deal)), deals))
+        for key, deal in keys_and_deals:
+            self._index_deal(key, deal)
+        self._dealsByTime.insert_many(keys_and_deals)
+
+    def _index_deal(self, key: tuple, deal: HistoryRecord):
         self._dealsByTicket[deal['id']] = self._dealsByTicket[deal['id']] if deal['id'] in self._dealsByTicket \
             else {}
-        new_deal = not existing and key not in self._dealsByTicket[deal['id']]
         self._dealsByTicket[deal['id']][key] = deal
         if 'positionId' in deal:
             self._dealsByPosition[deal['positionId']] = self._dealsByPosition[deal['positionId']] if \
                 deal['positionId'] in self._dealsByPosition else {}
             self._dealsByPosition[deal['positionId']][key] = deal
-
-        self._dealsByTime.delete(deal)
-        self._dealsByTime.insert(deal, deal)
         if 'time' in deal and (self._maxDealTime is None or self._maxDealTime.timestamp() < deal['time'].timestamp()):
             self._maxDealTime = deal['time']
 
-        if new_deal:
-            self._newDeals.append(deal)
-            if self._flushTimeout is not None:
-                self._flushTimeout.cancel()
-            self._flushTimeout = asyncio.create_task(self._flush_database_job(5))
-
-    def _get_deal_key(self, deal):
-        return format_date(deal['time'] or datetime.utcfromtimestamp(0)) + ':' + deal['id'] + ':' + (
-            deal['entryType'] if 'entryType' in deal else '')
+    def _get_deal_key(self, deal) -> tuple:
+        return deal['time'] or datetime.utcfromtimestamp(0), deal['id'], deal['entryType'] if 'entryType' in deal \
+            else ''
 
     async def _add_history_order(self, history_order, existing=False):
         key = self._get_history_order_key(history_order)
+        new_history_order = not existing and (history_order['id'] not in self._historyOrdersByTicket or
+                                              key not in self._historyOrdersByTicket[history_order['id']])
+        record = HistoryRecord(history_order)
+        self._index_history_order(key, record)
+        self._historyOrdersByTime.insert(key, record)
+
+        if new_history_order:
+            self._flushScheduler.add_history_order(self._historyDatabase, self._accountId, self._application,
+                                                   history_order)
+            self._schedule_eviction()
+
+    def _add_existing_history_orders(self, history_orders: List[MetatraderOrder]):
+        keys_and_history_orders = list(map(lambda history_order: (self._get_history_order_key(history_order),
+                                                                  HistoryRecord(history_order)), history_orders))
+        for key, history_order in keys_and_history_orders:
+            self._index_history_order(key, history_order)
+        self._historyOrdersByTime.insert_many(keys_and_history_orders)
+
+    def _index_history_order(self, key: tuple, history_order: HistoryRecord):
         self._historyOrdersByTicket[history_order['id']] = self._historyOrdersByTicket[history_order['id']] if \
             history_order['id'] in self._historyOrdersByTicket else {}
-        new_history_order = not existing and key not in self._historyOrdersByTicket[history_order['id']]
         self._historyOrdersByTicket[history_order['id']][key] = history_order
         if 'positionId' in history_order:
             self._historyOrdersByPosition[history_order['positionId']] = \
                 self._historyOrdersByPosition[history_order['positionId']] if history_order['positionId'] in \
                 self._historyOrdersByPosition else {}
             self._historyOrdersByPosition[history_order['positionId']][key] = history_order
-
-        self._historyOrdersByTime.delete(history_order)
-        self._historyOrdersByTime.insert(history_order, history_order)
         if 'doneTime' in history_order and (self._maxHistoryOrderTime is None or
                                             self._maxHistoryOrderTime.timestamp() <
                                             history_order['doneTime'].timestamp()):
             self._maxHistoryOrderTime = history_order['doneTime']
 
-        if new_history_order:
-            self._newHistoryOrders.append(history_order)
-            if self._flushTimeout is not None:
-                self._flushTimeout.cancel()
-            self._flushTimeout = asyncio.create_task(self._flush_database_job(5))
+    def _get_history_order_key(self, history_order) -> tuple:
+        return history_order['doneTime'] if 'doneTime' in history_order else date(0), history_order['id'], \
+            history_order['type'], history_order['state']
+
+    def _split_cold_deals(self, deals: List[MetatraderDeal]) -> Tuple[List[MetatraderDeal], List[MetatraderDeal]]:
+        cold_until = self._coldHistoryUntil['deals']
+        if cold_until is None:
+            return deals, []
+        hot_deals = []
+        cold_deals = []
+        for deal in deals:
+            if self._is_in_time_range(deal.get('time'), None, cold_until):
+                cold_deals.append(deal)
+                if 'time' in deal and self._maxDealTime.timestamp() < deal['time'].timestamp():
+                    self._maxDealTime = deal['time']
+            else:
+                hot_deals.append(deal)
+        return hot_deals, cold_deals
+
+    def _merge_deals(self, hot_deals: List[HistoryRecord], cold_deals: List[MetatraderDeal],
+                     sort: bool = False) -> List[MetatraderDeal]:
+        if not len(cold_deals):
+            return self._to_dicts(sorted(hot_deals, key=self._dealsComparator) if sort else hot_deals)
+        deals = dict(map(lambda deal: (self._get_deal_key(deal), deal), cold_deals))
+        deals.update(map(lambda deal: (self._get_deal_key(deal), deal.to_dict()), hot_deals))
+        return sorted(deals.values(), key=self._dealsComparator)
+
+    def _split_cold_history_orders(self, history_orders: List[MetatraderOrder]) -> \
+            Tuple[List[MetatraderOrder], List[MetatraderOrder]]:
+        cold_until = self._coldHistoryUntil['historyOrders']
+        if cold_until is None:
+            return history_orders, []
+        hot_history_orders = []
+        cold_history_orders = []
+        for history_order in history_orders:
+            if self._is_in_time_range(history_order.get('doneTime'), None, cold_until):
+                cold_history_orders.append(history_order)
+                if 'doneTime' in history_order and \
+                        self._maxHistoryOrderTime.timestamp() < history_order['doneTime'].timestamp():
+                    self._maxHistoryOrderTime = history_order['doneTime']
+            else:
+                hot_history_orders.append(history_order)
+        return hot_history_orders, cold_history_orders
+
+    def _merge_history_orders(self, hot_history_orders: List[HistoryRecord], cold_history_orders: List[MetatraderOrder],
+                              sort: bool = False) -> List[MetatraderOrder]:
+        if not len(cold_history_orders):
+            return self._to_dicts(sorted(hot_history_orders, key=self._historyOrdersComparator) if sort else
+                                  hot_history_orders)
+        history_orders = dict(map(lambda history_order: (self._get_history_order_key(history_order), history_order),
+                                  cold_history_orders))
+        history_orders.update(map(lambda history_order: (self._get_history_order_key(history_order),
+                                                         history_order.to_dict()), hot_history_orders))
+        return sorted(history_orders.values(), key=self._historyOrdersComparator)
+
+    def _get_cold_history_query(self, history_type: str, start_time: Optional[datetime],
+                                end_time: Optional[datetime], field: Optional[str], value: Optional[str]) -> \
+            Optional[tuple]:
+        """Returns history database query arguments for the part of a query which may include records removed from
+        memory. Records later than the last removed record are kept in memory, so the query is limited to the time
+        of the last removed record.
 
-    def _get_history_order_key(self, history_order):
-        return format_date(history_order['doneTime'] if 'doneTime' in history_order else date(0))\
-            + ':' + history_order['id'] + ':' + history_order['type'] + ':' + history_order['state']
+        Args:
+            history_type: History type, either deals or historyOrders.
+            start_time: Start time, inclusive, or None.
+            end_time: End time, inclusive, or None.
+            field: Indexed field to filter records by or None.
+            value: Field value to filter records by.
 
-    async def _flush_database(self):
-        if self._flushPromise:
-            await self._flushPromise
-        if self._flushRunning:
+        Returns:
+            Query arguments or None if the query does not include records removed from memory.
+        """
+        cold_until = self._coldHistoryUntil[history_type]
+        if cold_until is None or (start_time is not None and start_time.timestamp() > cold_until.timestamp()):
+            return None
+        return self._accountId, self._application, history_type, \
+            start_time if start_time is not None and start_time.timestamp() > date(0).timestamp() else None, \
+            end_time if end_time is not None and self._is_in_time_range(end_time, None, cold_until) else cold_until, \
+            field, value
+
+    def _read_cold_history(self, history_type: str, start_time: datetime = None, end_time: datetime = None,
+                           field: str = None, value: str = None) -> List[Dict]:
+        query = self._get_cold_history_query(history_type, start_time, end_time, field, value)
+        return self._historyDatabase.read_history(*query) if query else []
+
+    async def _load_cold_history(self, history_type: str, start_time: datetime = None, end_time: datetime = None,
+                                 field: str = None, value: str = None) -> List[Dict]:
+        query = self._get_cold_history_query(history_type, start_time, end_time, field, value)
+        return await self._historyDatabase.query_history(*query) if query else []
+
+    def _schedule_eviction(self):
+        if self._maxRecordsInMemory is not None and (self._evictionTask is None or self._evictionTask.done()) and \
+                (len(self._dealsByTime) > self._maxRecordsInMemory or
+                 len(self._historyOrdersByTime) > self._maxRecordsInMemory):
+            self._evictionTask = asyncio.create_task(self._flush_database())
+
+    def _get_eviction_count(self, records: HistoryItemsMemoryStorage) -> int:
+        # a tenth of the limit is evicted at once, so that history is not flushed for every new record
+        if len(records) <= self._maxRecordsInMemory:
+            return 0
+        return len(records) - self._maxRecordsInMemory + self._maxRecordsInMemory // 10
+
+    async def _evict_history(self):
+        """Removes oldest records above the limit from memory once they are written to the history database. The
+        tickets and position ids of the records are written to the key index of the history database before the
+        records are removed, so that queries find them on disk."""
+        if self._maxRecordsInMemory is None or self._flushScheduler.has_pending_history(
+                self._historyDatabase, self._accountId, self._application):
             return
-        self._flushRunning = True
-        self._flushPromise = asyncio.Future()
-
-        try:
-            for i in range(len(self._newHistoryOrders)):
-                history_order = copy(self._newHistoryOrders[i])
-                history_order['time'] = format_date(history_order['time'])
-                if 'doneTime' in history_order:
-                    history_order['doneTime'] = format_date(history_order['doneTime'])
-                self._newHistoryOrders[i] = history_order
-            for i in range(len(self._newDeals)):
-                deal = copy(self._newDeals[i])
-                deal['time'] = format_date(deal['time'])
-                self._newDeals[i] = deal
-            await self._historyDatabase.flush(self._accountId, self._application, self._newHistoryOrders,
-                                              self._newDeals)
-            self._newHistoryOrders = []
-            self._newDeals = []
-            self._logger.debug(f'{self._accountId}: flushed history db')
-        except Exception as err:
-            self._logger.warn(f'{self._accountId}: error flushing history db ' + string_format_error(err))
-            self._flushTimeout = asyncio.create_task(self._flush_database_job(15))
-        finally:
-            self._flushPromise.set_result(True)
-            self._flushPromise = None
-            self._flushRunning = False
-
-    async def _flush_database_job(self, time: float):
-        await asyncio.sleep(time)
-        await self._flush_database()
+        deals = self._dealsByTime.get_oldest(self._get_eviction_count(self._dealsByTime))
+        history_orders = self._historyOrdersByTime.get_oldest(self._get_eviction_count(self._historyOrdersByTime))
+        if not len(deals) and not len(history_orders):
+            return
+        await self._historyDatabase.index_history(self._accountId, self._application,
+                                                  list(map(lambda item: item[1].to_dict(), deals)),
+                                                  list(map(lambda item: item[1].to_dict(), history_orders)))
+        # records replaced while the index was written are kept in memory
+        self._dealsByTime.delete_many(deals)
+        for key, deal in deals:
+            if self._remove_from_index(self._dealsByTicket, deal['id'], key, deal):
+                self._remove_from_index(self._dealsByPosition, deal.get('positionId'), key, deal)
+                self._extend_cold_history('deals', deal.get('time'))
+        self._historyOrdersByTime.delete_many(history_orders)
+        for key, history_order in history_orders:
+            if self._remove_from_index(self._historyOrdersByTicket, history_order['id'], key, history_order):
+                self._remove_from_index(self._historyOrdersByPosition, history_order.get('positionId'), key,
+                                        history_order)
+                self._extend_cold_history('historyOrders', history_order.get('doneTime'))
+
+    def _extend_cold_history(self, history_type: str, time: Optional[datetime]):
+        time = time or date(0)
+        cold_until = self._coldHistoryUntil[history_type]
+        if cold_until is None or cold_until.timestamp() < time.timestamp():
+            self._coldHistoryUntil[history_type] = time
+
+    @staticmethod
+    def _to_dicts(records: List[HistoryRecord]) -> List[Dict]:
+        return list(map(HistoryRecord.to_dict, records))
+
+    @staticmethod
+    def _remove_from_index(index: dict, index_key: str, key: tuple, record: HistoryRecord) -> bool:
+        if index_key in index and index[index_key].get(key) is record:
+            del index[index_key][key]
+            if not len(index[index_key]):
+                del index[index_key]
+            return True
+        return False
+
+    @staticmethod
+    def _is_in_time_range(time: datetime, start_time: datetime = None, end_time: datetime = None,
+                          end_inclusive: bool = True) -> bool:
+        timestamp = (time or date(0)).timestamp()
+        return (start_time is None or timestamp >= start_time.timestamp()) and \
+            (end_time is None or timestamp < end_time.timestamp() or
+             (end_inclusive and timestamp == end_time.timestamp()))
+
+    async def _flush_database(self):
+        await self._flushScheduler.flush_account(self._historyDatabase, self._accountId, self._application)
+        await self._evict_history()
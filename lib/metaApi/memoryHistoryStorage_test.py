@@ -1,18 +1,31 @@
 from .memoryHistoryStorage import MemoryHistoryStorage
+from .historyFlushScheduler import HistoryFlushScheduler
+from .memoryHistoryStorageModel import MemoryHistoryStorageModel
+from .sqliteHistoryStorage import SqliteHistoryStorage
 from .models import date
-from mock import AsyncMock, patch
+from mock import AsyncMock, MagicMock, patch
 import pytest
-from asyncio import sleep
+from asyncio import sleep, create_task
+from datetime import datetime
 start_time = '2020-10-10 00:00:01.000'
 storage: MemoryHistoryStorage = None
 db = AsyncMock()
 
 
+def mock_load_history_in_batches(*batches):
+    async def load_history_in_batches(account_id, application):
+        for batch in batches:
+            yield batch
+    return load_history_in_batches
+
+
 @pytest.fixture(autouse=True)
 async def run_around_tests(mocker):
     global storage
     storage = MemoryHistoryStorage()
     storage._historyDatabase = db
+    storage._flushScheduler = HistoryFlushScheduler()
+    db.load_history_in_batches = mock_load_history_in_batches()
     await storage.initialize('accountId', 'MetaApi')
     await storage.clear()
     await storage.on_connected('vint-hill:1:ps-mpa-1', 1)
@@ -29,11 +42,46 @@ class TestMemoryHistoryStorage:
                       'magic': 0, 'time': date(5000000), 'doneTime': date(1000000), 'currentPrice': 1, 'volume': 0.01,
                       'currentVolume': 0,
                       'positionId': '61206630', 'platform': 'mt5', 'comment': 'AS_AUDNZD_5YyM6KS7Fv:'}
-        db.load_history = AsyncMock(return_value={'deals': [test_deal], 'historyOrders': [test_order]})
+        db.load_history_in_batches = mock_load_history_in_batches({'deals': [test_deal], 'historyOrders': []},
+                                                                  {'deals': [], 'historyOrders': [test_order]})
         await storage.initialize('accountId', 'MetaApi')
         assert storage.deals == [test_deal]
         assert storage.history_orders == [test_order]
 
+    @pytest.mark.asyncio
+    async def test_load_data_in_batches(self):
+        """Should load data in batches and yield to event loop between batches."""
+        deals = [{'id': str(i), 'type': 'DEAL_TYPE_BUY', 'time': date(1000000 + (i * 7919) % 1000),
+                  'entryType': 'DEAL_ENTRY_IN'} for i in range(1000)]
+        batches = [{'deals': deals[i:i + 100], 'historyOrders': []} for i in range(0, 1000, 100)]
+        db.load_history_in_batches = mock_load_history_in_batches(*batches)
+        ticks = 0
+
+        async def count_ticks():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await sleep(0)
+
+        task = create_task(count_ticks())
+        await sleep(0)
+        await storage.initialize('accountId', 'MetaApi')
+        task.cancel()
+        assert ticks >= 10
+        assert storage.deals == sorted(deals, key=lambda deal: (deal['time'], int(deal['id'])))
+        assert await storage.last_deal_time() == date(1000999)
+
+    @pytest.mark.asyncio
+    async def test_replace_updated_deal(self):
+        """Should replace a deal updated with the same time, id and entry type."""
+        deal = {'id': '37863643', 'type': 'DEAL_TYPE_BALANCE', 'time': date(1000000), 'entryType': 'DEAL_ENTRY_IN',
+                'profit': 10000}
+        updated_deal = {**deal, 'profit': 20000}
+        await storage.on_deal_added('vint-hill:1:ps-mpa-1', deal)
+        await storage.on_deal_added('vint-hill:1:ps-mpa-1', updated_deal)
+        assert storage.deals == [updated_deal]
+        assert storage.get_deals_by_ticket('37863643') == [updated_deal]
+
     @pytest.mark.asyncio
     async def test_clear_storage(self):
         """Should clear db storage."""
@@ -239,51 +287,144 @@ class TestMemoryHistoryStorage:
     @pytest.mark.asyncio
     async def test_flush_db_when_sync_ends(self):
         """Should flush db when synchronization ends."""
-        db.flush = AsyncMock()
-        await storage.on_history_order_added('vint-hill:1:ps-mpa-1', {
-            'id': '1', 'positionId': '1', 'time': date('2020-01-01T00:00:00.000Z'),
-            'doneTime': date('2020-01-01T00:00:00.000Z'), 'type': 'ORDER_TYPE_SELL', 'state': 'ORDER_STATE_FILLED'})
-        await storage.on_deal_added('vint-hill:1:ps-mpa-1', {'id': '1', 'time': date('2020-01-01T00:00:00.000Z'),
-                                                             'positionId': '1',
-                                                             'type': 'DEAL_TYPE_SELL', 'entryType': 'DEAL_ENTRY_IN'})
+        db.flush_many = AsyncMock()
+        history_order = {'id': '1', 'positionId': '1', 'time': date('2020-01-01T00:00:00.000Z'),
+                         'doneTime': date('2020-01-01T00:00:00.000Z'), 'type': 'ORDER_TYPE_SELL',
+                         'state': 'ORDER_STATE_FILLED'}
+        deal = {'id': '1', 'time': date('2020-01-01T00:00:00.000Z'), 'positionId': '1', 'type': 'DEAL_TYPE_SELL',
+                'entryType': 'DEAL_ENTRY_IN'}
+        await storage.on_history_order_added('vint-hill:1:ps-mpa-1', history_order)
+        await storage.on_deal_added('vint-hill:1:ps-mpa-1', deal)
         await storage.on_deals_synchronized('vint-hill:1:ps-mpa-1', 'synchronizationId')
-        db.flush.assert_called_with('accountId', 'MetaApi', [
-            {'id': '1', 'positionId': '1', 'time': '2020-01-01T00:00:00.000Z',
-             'doneTime': '2020-01-01T00:00:00.000Z',
-             'type': 'ORDER_TYPE_SELL', 'state': 'ORDER_STATE_FILLED'}], [
-            {'id': '1', 'time': '2020-01-01T00:00:00.000Z', 'positionId': '1',
-             'type': 'DEAL_TYPE_SELL', 'entryType': 'DEAL_ENTRY_IN'}])
+        db.flush_many.assert_called_with([{'accountId': 'accountId', 'application': 'MetaApi',
+                                           'historyOrders': [history_order], 'deals': [deal]}])
 
     @pytest.mark.asyncio
     async def test_flush_db(self):
         """Should flush db when new record arrives."""
-        with patch('lib.metaApi.memoryHistoryStorage.asyncio.sleep', new=lambda x: sleep(x / 60)):
+        with patch('lib.metaApi.historyFlushScheduler.asyncio.sleep', new=lambda x: sleep(x / 60)):
             await storage.on_deals_synchronized('vint-hill:1:ps-mpa-1', 'synchronizationId')
-            db.flush = AsyncMock()
-            await storage.on_history_order_added('vint-hill:1:ps-mpa-1', {
-                'id': '1', 'positionId': '1', 'time': date('2020-01-01T00:00:00.000Z'),
-                'doneTime': date('2020-01-01T00:00:00.000Z'),
-                'type': 'ORDER_TYPE_SELL', 'state': 'ORDER_STATE_FILLED'})
+            db.flush_many = AsyncMock()
+            history_order = {'id': '1', 'positionId': '1', 'time': date('2020-01-01T00:00:00.000Z'),
+                             'doneTime': date('2020-01-01T00:00:00.000Z'), 'type': 'ORDER_TYPE_SELL',
+                             'state': 'ORDER_STATE_FILLED'}
+            await storage.on_history_order_added('vint-hill:1:ps-mpa-1', history_order)
             await sleep(0.1)
-            db.flush.assert_called_with('accountId', 'MetaApi', [{
-                'id': '1', 'positionId': '1', 'time': '2020-01-01T00:00:00.000Z',
-                'doneTime': '2020-01-01T00:00:00.000Z', 'type': 'ORDER_TYPE_SELL',
-                'state': 'ORDER_STATE_FILLED'}], [])
+            db.flush_many.assert_called_with([{'accountId': 'accountId', 'application': 'MetaApi',
+                                               'historyOrders': [history_order], 'deals': []}])
 
     @pytest.mark.asyncio
-    async def test_throttle_db_flush(self):
-        """Should throttle db flush."""
-        with patch('lib.metaApi.memoryHistoryStorage.asyncio.sleep', new=lambda x: sleep(x / 50)):
+    async def test_batch_db_flush(self):
+        """Should write records arriving within max latency in a single flush."""
+        with patch('lib.metaApi.historyFlushScheduler.asyncio.sleep', new=lambda x: sleep(x / 50)):
             await storage.on_deals_synchronized('vint-hill:1:ps-mpa-1', 'synchronizationId')
-            db.flush = AsyncMock()
-            await storage.on_history_order_added('vint-hill:1:ps-mpa-1', {
-                'id': '1', 'positionId': '1', 'time': date('2020-01-01T00:00:00.000Z'),
-                'doneTime': date('2020-01-01T00:00:00.000Z'),
-                'type': 'ORDER_TYPE_SELL', 'state': 'ORDER_STATE_FILLED'})
-            await sleep(0.1)
-            await storage.on_history_order_added('vint-hill:1:ps-mpa-1', {
-                'id': '2', 'positionId': '1', 'time': date('2020-01-01T00:00:00.000Z'),
-                'doneTime': date('2020-01-01T00:00:00.000Z'),
-                'type': 'ORDER_TYPE_SELL', 'state': 'ORDER_STATE_FILLED'})
+            db.flush_many = AsyncMock()
+            history_orders = [{'id': str(i), 'positionId': '1', 'time': date('2020-01-01T00:00:00.000Z'),
+                               'doneTime': date('2020-01-01T00:00:00.000Z'), 'type': 'ORDER_TYPE_SELL',
+                               'state': 'ORDER_STATE_FILLED'} for i in range(2)]
+            await storage.on_history_order_added('vint-hill:1:ps-mpa-1', history_orders[0])
+            await sleep(0.05)
+            await storage.on_history_order_added('vint-hill:1:ps-mpa-1', history_orders[1])
+            db.flush_many.assert_not_called()
             await sleep(0.1)
-            db.flush.assert_not_called()
+            db.flush_many.assert_called_once_with([{'accountId': 'accountId', 'application': 'MetaApi',
+                                                    'historyOrders': history_orders, 'deals': []}])
+
+    def test_receive_prices_in_batches_only(self):
+        """Should receive prices in batches only, keeping per-symbol price events for custom history storages."""
+
+        class CustomHistoryStorage(MemoryHistoryStorageModel):
+            pass
+
+        assert MemoryHistoryStorage.batched_prices_only
+        assert SqliteHistoryStorage.batched_prices_only
+        assert not CustomHistoryStorage.batched_prices_only
+
+    @pytest.mark.asyncio
+    async def test_keep_old_history_on_disk(self):
+        """Should keep only the latest records in memory and read older history from disk."""
+        now = datetime.now().timestamp()
+        older_deal = {'id': '0', 'type': 'DEAL_TYPE_BUY', 'time': date(now - 20 * 24 * 60 * 60),
+                      'entryType': 'DEAL_ENTRY_IN'}
+        old_deal = {'id': '1', 'type': 'DEAL_TYPE_BUY', 'time': date(now - 10 * 24 * 60 * 60),
+                    'entryType': 'DEAL_ENTRY_IN', 'positionId': '1'}
+        new_deal = {'id': '2', 'type': 'DEAL_TYPE_SELL', 'time': date(now - 60), 'entryType': 'DEAL_ENTRY_OUT',
+                    'positionId': '1'}
+        db.load_history_in_batches = mock_load_history_in_batches({'deals': [old_deal, new_deal],
+                                                                   'historyOrders': []},
+                                                                  {'deals': [older_deal], 'historyOrders': []})
+        db.clear_index = AsyncMock()
+        db.index_history = AsyncMock()
+        db.read_history = MagicMock(return_value=[old_deal])
+        db.query_history = AsyncMock(return_value=[older_deal, old_deal])
+        hot_storage = MemoryHistoryStorage(max_records_in_memory=1)
+        hot_storage._historyDatabase = db
+        hot_storage._flushScheduler = HistoryFlushScheduler()
+        await hot_storage.initialize('accountId', 'MetaApi')
+        db.clear_index.assert_called_once_with('accountId', 'MetaApi')
+        db.index_history.assert_any_call('accountId', 'MetaApi', [old_deal], [])
+        db.index_history.assert_any_call('accountId', 'MetaApi', [older_deal], [])
+        assert '0' not in hot_storage._dealsByTicket and '1' not in hot_storage._dealsByTicket
+        assert '1' in hot_storage._dealsByPosition
+        assert await hot_storage.last_deal_time() == new_deal['time']
+        assert hot_storage.deals == [new_deal]
+        assert hot_storage.get_deals_by_time_range(date(now - 2 * 60), date(now)) == [new_deal]
+        db.read_history.assert_not_called()
+        assert hot_storage.get_deals_by_position('1') == [old_deal, new_deal]
+        db.read_history.assert_called_with('accountId', 'MetaApi', 'deals', None, old_deal['time'], 'positionId',
+                                           '1')
+        assert hot_storage.get_deals_by_ticket('1') == [old_deal]
+        db.read_history.assert_called_with('accountId', 'MetaApi', 'deals', None, old_deal['time'], 'id', '1')
+        assert hot_storage.get_deals_by_time_range(date(now - 15 * 24 * 60 * 60), date(now)) == [old_deal, new_deal]
+        db.read_history.assert_called_with('accountId', 'MetaApi', 'deals', date(now - 15 * 24 * 60 * 60),
+                                           old_deal['time'], None, None)
+        assert await hot_storage.load_deals() == [older_deal, old_deal, new_deal]
+        db.query_history.assert_called_with('accountId', 'MetaApi', 'deals', None, old_deal['time'], None, None)
+        db.query_history = AsyncMock(return_value=[old_deal])
+        assert await hot_storage.load_deals_by_position('1') == [old_deal, new_deal]
+        db.query_history.assert_called_with('accountId', 'MetaApi', 'deals', None, old_deal['time'], 'positionId',
+                                            '1')
+        assert await hot_storage.load_deals_by_time_range(date(now - 2 * 60), date(now)) == [new_deal]
+        db.query_history.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_evict_flushed_history(self):
+        """Should remove oldest records above the limit from memory once they are written to database."""
+        now = datetime.now().timestamp()
+        old_orders = [{'id': str(i), 'type': 'ORDER_TYPE_BUY', 'state': 'ORDER_STATE_FILLED', 'positionId': '1',
+                       'doneTime': date(now - (20 - i) * 24 * 60 * 60)} for i in range(10)]
+        new_order = {'id': '10', 'type': 'ORDER_TYPE_SELL', 'state': 'ORDER_STATE_FILLED', 'positionId': '1',
+                     'doneTime': date(now - 60)}
+        flushes = []
+
+        async def flush_many(flush_data):
+            flushes.append(flush_data)
+            if len(flushes) == 1:
+                raise Exception('test')
+
+        db.flush_many = flush_many
+        db.clear_index = AsyncMock()
+        db.index_history = AsyncMock()
+        db.read_history = MagicMock(return_value=[old_orders[0]])
+        db.query_history = AsyncMock(return_value=old_orders[:2])
+        hot_storage = MemoryHistoryStorage(max_records_in_memory=10)
+        hot_storage._historyDatabase = db
+        hot_storage._flushScheduler = HistoryFlushScheduler()
+        await hot_storage.initialize('accountId', 'MetaApi')
+        for history_order in old_orders:
+            await hot_storage.on_history_order_added('vint-hill:1:ps-mpa-1', history_order)
+        assert hot_storage._evictionTask is None
+        await hot_storage.on_history_order_added('vint-hill:1:ps-mpa-1', new_order)
+        assert hot_storage._evictionTask is not None
+        await hot_storage.on_deals_synchronized('vint-hill:1:ps-mpa-1', 'synchronizationId')
+        assert len(hot_storage.history_orders) == 11
+        db.index_history.assert_not_called()
+        await hot_storage.on_deals_synchronized('vint-hill:1:ps-mpa-1', 'synchronizationId')
+        db.index_history.assert_called_once_with('accountId', 'MetaApi', [], old_orders[:2])
+        assert '0' not in hot_storage._historyOrdersByTicket and '1' not in hot_storage._historyOrdersByTicket
+        assert hot_storage.history_orders == old_orders[2:] + [new_order]
+        assert hot_storage.get_history_orders_by_ticket('0') == [old_orders[0]]
+        db.read_history.assert_called_with('accountId', 'MetaApi', 'historyOrders', None, old_orders[1]['doneTime'],
+                                           'id', '0')
+        assert await hot_storage.load_history_orders() == old_orders + [new_order]
+        assert await hot_storage.last_history_order_time() == new_order['doneTime']
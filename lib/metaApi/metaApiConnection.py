@@ -28,6 +28,8 @@ class MetaApiConnectionDict(TypedDict, total=False):
 class MetaApiConnection(SynchronizationListener, ReconnectListener):
     """Exposes MetaApi MetaTrader API connection to consumers."""
 
+    batched_prices_only = True
+
     def __init__(self, websocket_client: MetaApiWebsocketClient, account: MetatraderAccountModel,
                  application: str = None):
         """Inits MetaApi MetaTrader Api connection.
@@ -1,6 +1,6 @@
-from datetime import datetime
+from datetime import datetime, timezone
 from typing_extensions import TypedDict
-from typing import List, Optional
+from typing import List, Optional, Callable
 import iso8601
 import random
 import string
@@ -16,7 +16,12 @@ def date(date_time: str or float or int) -> datetime:
     if isinstance(date_time, float) or isinstance(date_time, int):
         return datetime.fromtimestamp(max(date_time, 100000)).astimezone(pytz.utc)
     else:
-        return iso8601.parse_date(date_time)
+        # datetime.fromisoformat is much faster than iso8601, use iso8601 only for formats it does not support
+        try:
+            result = datetime.fromisoformat(date_time[:-1] + '+00:00' if date_time.endswith('Z') else date_time)
+            return result if result.tzinfo is not None else result.replace(tzinfo=timezone.utc)
+        except (ValueError, AttributeError):
+            return iso8601.parse_date(date_time)
 
 
 def format_date(date: datetime) -> str:
@@ -99,8 +104,68 @@ async def promise_any(coroutines):
     return exception_task.result()
 
 
+def _create_terminal_data_encoder(encode_float: Callable[[float], str], encode_g1_string: bool):
+    def encode(obj, ensure_ascii: bool = False) -> str:
+        if encode_g1_string:
+            def encode_string(value: str) -> str:
+                return '"' + value.replace('\\', '\\\\').replace('/', '\\/') + '"'
+        else:
+            encode_string = json.encoder.encode_basestring_ascii if ensure_ascii else json.encoder.encode_basestring
+
+        def encode_value(value) -> str:
+            value_type = type(value)
+            if value_type is str:
+                return encode_string(value)
+            elif value_type is float:
+                return encode_float(value)
+            elif value_type is dict:
+                return '{' + ','.join(['"' + key + '":' + encode_value(item) for key, item in value.items()]) + '}'
+            elif value_type is list:
+                return '[' + ','.join([encode_value(item) for item in value]) + ']'
+            elif value_type is bool:
+                return 'true' if value else 'false'
+            elif value_type is int:
+                return int.__repr__(value)
+            elif value is None:
+                return 'null'
+            elif isinstance(value, datetime):
+                return '"' + format_date(value) + '"'
+            # fallbacks for dict, list, float and str subclasses
+            elif isinstance(value, float):
+                return encode_float(value)
+            elif isinstance(value, dict):
+                return '{' + ','.join(['"' + key + '":' + encode_value(item) for key, item in value.items()]) + '}'
+            elif isinstance(value, list):
+                return '[' + ','.join([encode_value(item) for item in value]) + ']'
+            elif isinstance(value, str):
+                return encode_string(value)
+            return ''.join(json.JSONEncoder(ensure_ascii=ensure_ascii).iterencode(value))
+
+        return encode_value(obj)
+    return encode
+
+
+encode_g1 = _create_terminal_data_encoder(lambda value: '%.8f' % value, True)
+"""Encodes cloud-g1 account terminal data into a JSON string. Produces the same output as G1Encoder, but joins
+encoded values directly instead of yielding every token from recursive generators."""
+
+
+def _encode_g2_float(value: float) -> str:
+    result = ('%.8f' % value).rstrip('0.')
+    # values which round to zero have no digits left after trailing zeros are removed
+    return result if result not in ['', '-'] else '0'
+
+
+encode_g2 = _create_terminal_data_encoder(_encode_g2_float, False)
+"""Encodes cloud-g2 account terminal data into a JSON string. Produces the same output as G2Encoder, but joins
+encoded values directly instead of yielding every token from recursive generators."""
+
+
 class G1Encoder(json.JSONEncoder):
     """A JSON encoder used to encode cloud-g1 account terminal data."""
+    def encode(self, obj):
+        return super().encode(obj) if isinstance(obj, str) else encode_g1(obj, self.ensure_ascii)
+
     def iterencode(self, obj, _one_shot=False):
         if isinstance(obj, datetime):
             yield '"' + format_date(obj) + '"'
@@ -141,6 +206,9 @@ class G1Encoder(json.JSONEncoder):
 
 class G2Encoder(json.JSONEncoder):
     """A JSON encoder used to encode cloud-g2 account terminal data."""
+    def encode(self, obj):
+        return super().encode(obj) if isinstance(obj, str) else encode_g2(obj, self.ensure_ascii)
+
     def iterencode(self, obj, _one_shot=False):
         if isinstance(obj, datetime):
             yield '"' + format_date(obj) + '"'
@@ -151,9 +219,9 @@ class G2Encoder(json.JSONEncoder):
                 yield 'false'
         elif isinstance(obj, float):
             result = format(obj, '.8f')
-            while result[-1] in ['0', '.']:
+            while len(result) and result[-1] in ['0', '.']:
                 result = result[:-1]
-            yield result
+            yield result if result not in ['', '-'] else '0'
         elif isinstance(obj, dict):
             last_index = len(obj) - 1
             yield '{'
@@ -0,0 +1,101 @@
+from .models import G1Encoder, G2Encoder, encode_g1, encode_g2, date
+import json
+from collections import OrderedDict
+import random
+
+specification = {
+    'symbol': 'EURUSD/m',
+    'description': 'Euro vs \\ US Dollar "€"',
+    'tickSize': 0.00001,
+    'contractSize': 100000.0,
+    'maxVolume': 200.5,
+    'minVolume': 0.0001,
+    'digits': 5,
+    'hedgedMarginUsesLargerLeg': False,
+    'tradeAllowed': True,
+    'expirationTime': date('2020-04-15T02:45:06.521Z'),
+    'tradeSessions': {'MONDAY': [{'from': '00:00', 'to': '23:59'}], 'SUNDAY': []},
+    'fillingModes': ['SYMBOL_FILLING_FOK', 'SYMBOL_FILLING_IOC'],
+    'swapLong': -0.5,
+    'marginCurrency': None,
+    'empty': {}
+}
+
+
+def legacy_encode(encoder_class, obj) -> str:
+    return ''.join(encoder_class(ensure_ascii=False).iterencode(obj))
+
+
+def create_specifications(count: int):
+    rng = random.Random(1)
+    return [{
+        'symbol': f'SYMBOL{i}',
+        'tickSize': rng.choice([0.00001, 0.001, 0.25, 1.0, 10.0]),
+        'contractSize': rng.choice([1, 100, 100000]),
+        'maxVolume': rng.uniform(0, 10000),
+        'digits': rng.randint(0, 5),
+        'swapLong': rng.uniform(-100, 100),
+        'tradeAllowed': rng.random() > 0.5,
+        'path': f'Forex\\Majors/SYMBOL{i}',
+        'tradeSessions': {'MONDAY': [{'from': '00:00', 'to': '23:59'}]}
+    } for i in range(count)]
+
+
+class TestTerminalDataEncoders:
+
+    def test_encode_g1(self):
+        """Should encode cloud-g1 terminal data."""
+        assert encode_g1([specification]) == (
+            '[{"symbol":"EURUSD\\/m","description":"Euro vs \\\\ US Dollar "€"","tickSize":0.00001000,'
+            '"contractSize":100000.00000000,"maxVolume":200.50000000,"minVolume":0.00010000,"digits":5,'
+            '"hedgedMarginUsesLargerLeg":false,"tradeAllowed":true,"expirationTime":"2020-04-15T02:45:06.521Z",'
+            '"tradeSessions":{"MONDAY":[{"from":"00:00","to":"23:59"}],"SUNDAY":[]},'
+            '"fillingModes":["SYMBOL_FILLING_FOK","SYMBOL_FILLING_IOC"],"swapLong":-0.50000000,'
+            '"marginCurrency":null,"empty":{}}]')
+
+    def test_encode_g2(self):
+        """Should encode cloud-g2 terminal data."""
+        assert encode_g2([specification]) == (
+            '[{"symbol":"EURUSD/m","description":"Euro vs \\\\ US Dollar \\"€\\"","tickSize":0.00001,'
+            '"contractSize":1,"maxVolume":200.5,"minVolume":0.0001,"digits":5,'
+            '"hedgedMarginUsesLargerLeg":false,"tradeAllowed":true,"expirationTime":"2020-04-15T02:45:06.521Z",'
+            '"tradeSessions":{"MONDAY":[{"from":"00:00","to":"23:59"}],"SUNDAY":[]},'
+            '"fillingModes":["SYMBOL_FILLING_FOK","SYMBOL_FILLING_IOC"],"swapLong":-0.5,'
+            '"marginCurrency":null,"empty":{}}]')
+
+    def test_encode_same_as_generator_encoders(self):
+        """Should produce the same output as generator-based encoders."""
+        specifications = create_specifications(1000)
+        assert encode_g1(specifications) == legacy_encode(G1Encoder, specifications)
+        assert encode_g2(specifications) == legacy_encode(G2Encoder, specifications)
+        assert encode_g1(specification) == legacy_encode(G1Encoder, specification)
+        assert encode_g2(specification) == legacy_encode(G2Encoder, specification)
+
+    def test_encode_g2_edge_case_numbers(self):
+        """Should encode numbers which round to zero or have trailing zeros the same way as G2Encoder."""
+        values = [0.0, -0.0, 0.000000001, -0.000000001, 0.5, -0.5, 10.0, -10.0, 100.25, 0, -1, 1e20]
+        assert encode_g2(values) == '[0,0,0,0,0.5,-0.5,1,-1,100.25,0,-1,1]'
+        assert encode_g2(values) == legacy_encode(G2Encoder, values)
+        assert json.loads(encode_g2({'volume': 0.0})) == {'volume': 0}
+
+    def test_encode_subclasses(self):
+        """Should encode dict, list, float and str subclasses the same way as generator-based encoders."""
+        class Text(str):
+            pass
+
+        class Number(float):
+            pass
+
+        class Prices(list):
+            pass
+
+        value = OrderedDict([('symbol', Text('EURUSD/m')), ('prices', Prices([Number(1.5), True, None]))])
+        assert encode_g1(value) == legacy_encode(G1Encoder, value)
+        assert encode_g2(value) == legacy_encode(G2Encoder, value)
+
+    def test_encode_with_json_dumps(self):
+        """Should use single-pass encoding in json.dumps."""
+        assert json.dumps([specification], cls=G1Encoder, ensure_ascii=False) == encode_g1([specification])
+        assert json.dumps([specification], cls=G2Encoder, ensure_ascii=False) == encode_g2([specification])
+        assert json.dumps(specification, cls=G2Encoder) == ''.join(G2Encoder().iterencode(specification))
+        assert json.dumps('EURUSD/m', cls=G1Encoder) == '"EURUSD/m"'
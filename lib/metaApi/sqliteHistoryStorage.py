@@ -0,0 +1,288 @@
+import asyncio
+import json
+import os
+import sqlite3
+from datetime import datetime
+from typing import Dict, List
+from .historyStorage import HistoryStorage
+from .models import MetatraderDeal, MetatraderOrder, date, format_date, convert_iso_time_to_date, \
+    string_format_error
+from ..logger import LoggerManager
+
+_schema = [
+    'CREATE TABLE IF NOT EXISTS deals (account_id TEXT NOT NULL, application TEXT NOT NULL, id TEXT NOT NULL, '
+    'entry_type TEXT NOT NULL, time REAL NOT NULL, sort_time REAL NOT NULL, position_id TEXT, data TEXT NOT NULL, '
+    'PRIMARY KEY (account_id, application, time, id, entry_type))',
+    'CREATE INDEX IF NOT EXISTS deals_by_id ON deals (account_id, application, id)',
+    'CREATE INDEX IF NOT EXISTS deals_by_position_id ON deals (account_id, application, position_id)',
+    'CREATE INDEX IF NOT EXISTS deals_by_time ON deals (account_id, application, time)',
+    'CREATE TABLE IF NOT EXISTS history_orders (account_id TEXT NOT NULL, application TEXT NOT NULL, '
+    'id TEXT NOT NULL, type TEXT NOT NULL, state TEXT NOT NULL, done_time REAL NOT NULL, sort_time REAL NOT NULL, '
+    'position_id TEXT, data TEXT NOT NULL, '
+    'PRIMARY KEY (account_id, application, done_time, id, type, state))',
+    'CREATE INDEX IF NOT EXISTS history_orders_by_id ON history_orders (account_id, application, id)',
+    'CREATE INDEX IF NOT EXISTS history_orders_by_position_id ON history_orders (account_id, application, '
+    'position_id)',
+    'CREATE INDEX IF NOT EXISTS history_orders_by_done_time ON history_orders (account_id, application, done_time)'
+]
+_deals_order = ' ORDER BY sort_time, CAST(id AS INTEGER), entry_type'
+_history_orders_order = ' ORDER BY sort_time, CAST(id AS INTEGER), type, state'
+_connections: Dict[str, sqlite3.Connection] = {}
+
+
+class SqliteHistoryStorage(HistoryStorage):
+    """History storage which stores MetaTrader history in an SQLite database. History is not kept in RAM, queries
+    by ticket, position and time range use database indexes. Storages of all accounts with the same database path
+    share a single database connection."""
+
+    batched_prices_only = True
+
+    def __init__(self, db_path: str = None, commit_interval: float = 1):
+        """Inits the SQLite history storage instance.
+
+        Args:
+            db_path: Path to database file, default is .metaapi/history.sqlite.
+            commit_interval: Maximum time in seconds new history stays uncommitted.
+        """
+        super().__init__()
+        self._dbPath = db_path or '.metaapi/history.sqlite'
+        self._commitInterval = commit_interval
+        self._connection = None
+        self._commitHandle = None
+        self._logger = LoggerManager.get_logger('SqliteHistoryStorage')
+
+    async def initialize(self, account_id: str, application: str = 'MetaApi'):
+        """Initializes the storage and opens the database.
+
+        Args:
+            account_id: Account id.
+            application: Application.
+
+        Returns:
+            A coroutine resolving when history storage is initialized.
+        """
+        await super().initialize(account_id, application)
+        self._connection = self._get_connection(self._dbPath)
+
+    async def clear(self):
+        """Clears the storage and deletes persistent data.
+
+        Returns:
+            A coroutine resolving when history storage is cleared
+        """
+        self._connection.execute('DELETE FROM deals WHERE account_id = ? AND application = ?',
+                                 (self._accountId, self._application))
+        self._connection.execute('DELETE FROM history_orders WHERE account_id = ? AND application = ?',
+                                 (self._accountId, self._application))
+        self._commit()
+
+    async def last_history_order_time(self, instance_number: int = None) -> datetime:
+        """Returns the time of the last history order record stored in the history storage.
+
+        Args:
+            instance_number: Index of an account instance connected.
+
+        Returns:
+            The time of the last history order record stored in the history storage.
+        """
+        return self._get_max_time('history_orders')
+
+    async def last_deal_time(self, instance_number: int = None) -> datetime:
+        """Returns the time of the last history deal record stored in the history storage.
+
+        Args:
+            instance_number: Index of an account instance connected.
+
+        Returns:
+            The time of the last history deal record stored in the history storage.
+        """
+        return self._get_max_time('deals')
+
+    async def on_history_order_added(self, instance_index: str, history_order: MetatraderOrder):
+        """Invoked when a new MetaTrader history order is added.
+
+        Args:
+            instance_index: Index of an account instance connected.
+            history_order: New MetaTrader history order.
+
+        Returns:
+            A coroutine which resolves when the asynchronous event is processed.
+        """
+        done_time = history_order.get('doneTime')
+        self._connection.execute(
+            'INSERT OR REPLACE INTO history_orders (account_id, application, id, type, state, done_time, sort_time, '
+            'position_id, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (self._accountId, self._application, history_order['id'], history_order['type'], history_order['state'],
+             (done_time or date(0)).timestamp(), done_time.timestamp() if done_time else 0,
+             history_order.get('positionId'), self._serialize(history_order)))
+        self._schedule_commit()
+
+    async def on_deal_added(self, instance_index: str, deal: MetatraderDeal):
+        """Invoked when a new MetaTrader history deal is added.
+
+        Args:
+            instance_index: Index of an account instance connected.
+            deal: New MetaTrader history deal.
+
+        Returns:
+            A coroutine which resolves when the asynchronous event is processed.
+        """
+        time = deal.get('time')
+        self._connection.execute(
+            'INSERT OR REPLACE INTO deals (account_id, application, id, entry_type, time, sort_time, position_id, '
+            'data) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (self._accountId, self._application, deal['id'], deal.get('entryType', ''),
+             (time or date(0)).timestamp(), time.timestamp() if time else 0, deal.get('positionId'),
+             self._serialize(deal)))
+        self._schedule_commit()
+
+    async def on_deals_synchronized(self, instance_index: str, synchronization_id: str):
+        """Invoked when a synchronization of history deals on a MetaTrader account have finished to indicate progress
+        of an initial terminal state synchronization.
+
+        Args:
+            instance_index: Index of an account instance connected.
+            synchronization_id: Synchronization request id.
+
+        Returns:
+            A coroutine which resolves when the asynchronous event is processed.
+        """
+        self._commit()
+        await super().on_deals_synchronized(instance_index, synchronization_id)
+
+    @property
+    def deals(self) -> List[MetatraderDeal]:
+        """Returns all deals stored in history storage.
+
+        Returns:
+            All deals stored in history storage.
+        """
+        return self._query('deals', '', (), _deals_order)
+
+    def get_deals_by_ticket(self, id: str) -> List[MetatraderDeal]:
+        """Returns deals by ticket id.
+
+        Args:
+            id: Ticket id.
+
+        Returns:
+            Deals found.
+        """
+        return self._query('deals', ' AND id = ?', (id,), _deals_order)
+
+    def get_deals_by_position(self, position_id: str) -> List[MetatraderDeal]:
+        """Returns deals by position id.
+
+        Args:
+            position_id: Position id.
+
+        Returns:
+            Deals found.
+        """
+        return self._query('deals', ' AND position_id = ?', (position_id,), _deals_order)
+
+    def get_deals_by_time_range(self, start_time: datetime, end_time: datetime) -> List[MetatraderDeal]:
+        """Returns deals by time range.
+
+        Args:
+            start_time: Start time, inclusive.
+            end_time: End time, inclusive.
+
+        Returns:
+            Deals found.
+        """
+        return self._query('deals', ' AND time >= ? AND time <= ?', (start_time.timestamp(), end_time.timestamp()),
+                           _deals_order)
+
+    @property
+    def history_orders(self) -> List[MetatraderOrder]:
+        """Returns all history orders stored in history storage.
+
+        Returns:
+            All history orders stored in history storage.
+        """
+        return self._query('history_orders', '', (), _history_orders_order)
+
+    def get_history_orders_by_ticket(self, id: str) -> List[MetatraderOrder]:
+        """Returns history orders by ticket id.
+
+        Args:
+            id: Ticket id.
+
+        Returns:
+            History orders found.
+        """
+        return self._query('history_orders', ' AND id = ?', (id,), _history_orders_order)
+
+    def get_history_orders_by_position(self, position_id: str) -> List[MetatraderOrder]:
+        """Returns history orders by position id.
+
+        Args:
+            position_id: Position id.
+
+        Returns:
+            History orders found.
+        """
+        return self._query('history_orders', ' AND position_id = ?', (position_id,), _history_orders_order)
+
+    def get_history_orders_by_time_range(self, start_time: datetime, end_time: datetime) -> List[MetatraderOrder]:
+        """Returns history orders by time range.
+
+        Args:
+            start_time: Start time, inclusive.
+            end_time: End time, inclusive.
+
+        Returns:
+            History orders found.
+        """
+        return self._query('history_orders', ' AND done_time >= ? AND done_time <= ?',
+                           (start_time.timestamp(), end_time.timestamp()), _history_orders_order)
+
+    @staticmethod
+    def _get_connection(db_path: str) -> sqlite3.Connection:
+        if db_path not in _connections:
+            directory = os.path.dirname(db_path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            connection = sqlite3.connect(db_path)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in _schema:
+                connection.execute(statement)
+            connection.commit()
+            _connections[db_path] = connection
+        return _connections[db_path]
+
+    def _query(self, table: str, condition: str, parameters: tuple, order: str) -> List[Dict]:
+        rows = self._connection.execute(f'SELECT data FROM {table} WHERE account_id = ? AND application = ?' +
+                                        condition + order, (self._accountId, self._application) + parameters)
+        return list(map(lambda row: self._deserialize(row[0]), rows))
+
+    def _get_max_time(self, table: str) -> datetime:
+        row = self._connection.execute(f'SELECT MAX(sort_time) FROM {table} WHERE account_id = ? AND '
+                                       'application = ?', (self._accountId, self._application)).fetchone()
+        return date(row[0]) if row[0] else date(0)
+
+    def _schedule_commit(self):
+        if self._commitHandle is None:
+            self._commitHandle = asyncio.get_event_loop().call_later(self._commitInterval, self._commit)
+
+    def _commit(self):
+        if self._commitHandle is not None:
+            self._commitHandle.cancel()
+            self._commitHandle = None
+        try:
+            self._connection.commit()
+        except Exception as err:
+            self._logger.error(f'{self._accountId}: failed to commit history database ' + string_format_error(err))
+
+    @staticmethod
+    def _serialize(item: Dict) -> str:
+        return json.dumps(item, default=lambda value: format_date(value) if isinstance(value, datetime) else
+                          str(value), separators=(',', ':'))
+
+    @staticmethod
+    def _deserialize(data: str) -> Dict:
+        item = json.loads(data)
+        convert_iso_time_to_date(item)
+        return item
@@ -0,0 +1,99 @@
+from .sqliteHistoryStorage import SqliteHistoryStorage
+from .models import date
+from asyncio import sleep
+import pytest
+storage: SqliteHistoryStorage = None
+db_path = None
+
+
+@pytest.fixture(autouse=True)
+async def run_around_tests(tmp_path):
+    global storage, db_path
+    db_path = str(tmp_path / 'history.sqlite')
+    storage = SqliteHistoryStorage(db_path, 0.05)
+    await storage.initialize('accountId', 'MetaApi')
+    await storage.on_connected('vint-hill:1:ps-mpa-1', 1)
+
+
+class TestSqliteHistoryStorage:
+
+    @pytest.mark.asyncio
+    async def test_load_data_from_database(self):
+        """Should load data saved by another storage instance."""
+        deal = {'id': '37863643', 'type': 'DEAL_TYPE_BALANCE', 'magic': 0, 'time': date(1000000),
+                'entryType': 'DEAL_ENTRY_IN', 'profit': 10000, 'platform': 'mt5', 'comment': 'Demo deposit 1'}
+        order = {'id': '61210463', 'type': 'ORDER_TYPE_SELL', 'state': 'ORDER_STATE_FILLED', 'symbol': 'AUDNZD',
+                 'time': date(5000000), 'doneTime': date(1000000), 'volume': 0.01, 'positionId': '61206630'}
+        await storage.on_deal_added('vint-hill:1:ps-mpa-1', deal)
+        await storage.on_history_order_added('vint-hill:1:ps-mpa-1', order)
+        await sleep(0.1)
+        new_storage = SqliteHistoryStorage(db_path)
+        await new_storage.initialize('accountId', 'MetaApi')
+        assert new_storage.deals == [deal]
+        assert new_storage.history_orders == [order]
+        other_account_storage = SqliteHistoryStorage(db_path)
+        await other_account_storage.initialize('accountId2', 'MetaApi')
+        assert other_account_storage.deals == []
+
+    @pytest.mark.asyncio
+    async def test_return_deals_by_indexes(self):
+        """Should return deals by ticket, position and time range sorted by time and id."""
+        deals = [
+            {'id': '2', 'positionId': '1', 'time': date('2020-01-02T00:00:00.000Z'), 'entryType': 'DEAL_ENTRY_OUT'},
+            {'id': '10', 'positionId': '1', 'time': date('2020-01-01T00:00:00.000Z'), 'entryType': 'DEAL_ENTRY_IN'},
+            {'id': '3', 'positionId': '2', 'time': date('2020-01-01T00:00:00.000Z'), 'entryType': 'DEAL_ENTRY_IN'},
+            {'id': '10', 'positionId': '1', 'time': date('2020-01-03T00:00:00.000Z'), 'entryType': 'DEAL_ENTRY_OUT'}
+        ]
+        for deal in deals:
+            await storage.on_deal_added('vint-hill:1:ps-mpa-1', deal)
+        assert storage.deals == [deals[2], deals[1], deals[0], deals[3]]
+        assert storage.get_deals_by_ticket('10') == [deals[1], deals[3]]
+        assert storage.get_deals_by_position('1') == [deals[1], deals[0], deals[3]]
+        assert storage.get_deals_by_time_range(date('2020-01-01T12:00:00.000Z'),
+                                               date('2020-01-03T00:00:00.000Z')) == [deals[0], deals[3]]
+        assert await storage.last_deal_time() == date('2020-01-03T00:00:00.000Z')
+
+    @pytest.mark.asyncio
+    async def test_return_history_orders_by_indexes(self):
+        """Should return history orders by ticket, position and time range sorted by done time and id."""
+        orders = [
+            {'id': '2', 'positionId': '1', 'doneTime': date('2020-01-02T00:00:00.000Z'), 'type': 'ORDER_TYPE_BUY',
+             'state': 'ORDER_STATE_FILLED'},
+            {'id': '1', 'positionId': '2', 'doneTime': date('2020-01-01T00:00:00.000Z'), 'type': 'ORDER_TYPE_SELL',
+             'state': 'ORDER_STATE_FILLED'},
+            {'id': '3', 'type': 'ORDER_TYPE_BUY', 'state': 'ORDER_STATE_CANCELED'}
+        ]
+        for order in orders:
+            await storage.on_history_order_added('vint-hill:1:ps-mpa-1', order)
+        assert storage.history_orders == [orders[2], orders[1], orders[0]]
+        assert storage.get_history_orders_by_ticket('2') == [orders[0]]
+        assert storage.get_history_orders_by_position('2') == [orders[1]]
+        assert storage.get_history_orders_by_time_range(date('2020-01-01T12:00:00.000Z'),
+                                                        date('2020-01-03T00:00:00.000Z')) == [orders[0]]
+        assert storage.get_history_orders_by_time_range(date(0), date('2020-01-01T12:00:00.000Z')) == \
+            [orders[2], orders[1]]
+        assert await storage.last_history_order_time() == date('2020-01-02T00:00:00.000Z')
+
+    @pytest.mark.asyncio
+    async def test_replace_updated_deal(self):
+        """Should replace a deal updated with the same time, id and entry type."""
+        deal = {'id': '1', 'type': 'DEAL_TYPE_BALANCE', 'time': date(1000000), 'entryType': 'DEAL_ENTRY_IN',
+                'profit': 10000}
+        updated_deal = {**deal, 'profit': 20000}
+        await storage.on_deal_added('vint-hill:1:ps-mpa-1', deal)
+        await storage.on_deal_added('vint-hill:1:ps-mpa-1', updated_deal)
+        assert storage.deals == [updated_deal]
+
+    @pytest.mark.asyncio
+    async def test_clear_storage(self):
+        """Should clear storage."""
+        await storage.on_deal_added('vint-hill:1:ps-mpa-1', {'id': '1', 'time': date(1000000),
+                                                             'entryType': 'DEAL_ENTRY_IN'})
+        await storage.on_history_order_added('vint-hill:1:ps-mpa-1', {'id': '1', 'doneTime': date(1000000),
+                                                                      'type': 'ORDER_TYPE_SELL',
+                                                                      'state': 'ORDER_STATE_FILLED'})
+        await storage.clear()
+        assert storage.deals == []
+        assert storage.history_orders == []
+        assert await storage.last_deal_time() == date(0)
+        assert await storage.last_history_order_time() == date(0)
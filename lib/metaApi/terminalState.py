@@ -1,8 +1,7 @@
 from ..clients.metaApi.synchronizationListener import SynchronizationListener
 from .models import MetatraderAccountInformation, MetatraderPosition, MetatraderOrder, \
-    MetatraderSymbolSpecification, MetatraderSymbolPrice, G1Encoder, G2Encoder, QuoteTime
+    MetatraderSymbolSpecification, MetatraderSymbolPrice, QuoteTime, encode_g1, encode_g2
 from ..clients.metaApi.clientApi_client import ClientApiClient
-import functools
 from typing import List, Dict, Optional, Union
 from typing_extensions import TypedDict
 import asyncio
@@ -11,7 +10,8 @@ from hashlib import md5
 from copy import copy, deepcopy
 from ..logger import LoggerManager
 from operator import itemgetter
-import json
+
+_profit_fields = ('unrealizedProfit', 'swap', 'commission')
 
 
 class TerminalStateDict(TypedDict, total=False):
@@ -19,8 +19,17 @@ class TerminalStateDict(TypedDict, total=False):
     connected: bool
     connectedToBroker: bool
     accountInformation: Optional[dict]
-    positions: List[dict]
-    orders: List[dict]
+    positions: Dict[str, dict]
+    orders: Dict[str, dict]
+    positionsList: Optional[List[dict]]
+    ordersList: Optional[List[dict]]
+    positionsBySymbol: Dict[str, Dict[str, dict]]
+    ordersBySymbol: Dict[str, Dict[str, dict]]
+    uninitializedProfitSymbols: set
+    positionProfitTerms: Dict[str, tuple]
+    profitTotals: Dict[str, int]
+    hashEncodingsParameters: Optional[tuple]
+    hashEncodings: Dict[str, Dict[str, str]]
     specificationsBySymbol: dict
     pricesBySymbol: dict
     completedOrders: dict
@@ -45,6 +54,8 @@ class TerminalStateHashes(TypedDict):
 class TerminalState(SynchronizationListener):
     """Responsible for storing a local copy of remote terminal state."""
 
+    batched_prices_only = True
+
     def __init__(self, account_id: str, client_api_client: ClientApiClient):
         """Inits the instance of terminal state class
 
@@ -59,8 +70,17 @@ class TerminalState(SynchronizationListener):
         self._waitForPriceResolves = {}
         self._combinedState = {
             'accountInformation': None,
-            'positions': [],
-            'orders': [],
+            'positions': {},
+            'orders': {},
+            'positionsList': None,
+            'ordersList': None,
+            'positionsBySymbol': {},
+            'ordersBySymbol': {},
+            'uninitializedProfitSymbols': set(),
+            'positionProfitTerms': {},
+            'profitTotals': dict.fromkeys(_profit_fields, 0),
+            'hashEncodingsParameters': None,
+            'hashEncodings': {'specifications': {}, 'positions': {}, 'orders': {}},
             'specificationsBySymbol': {},
             'pricesBySymbol': {},
             'completedOrders': {},
@@ -71,6 +91,7 @@ class TerminalState(SynchronizationListener):
             'lastQuoteTime': None,
             'lastQuoteBrokerTime': None
         }
+        self._checkEquityConsistency = False
         self._logger = LoggerManager.get_logger('TerminalState')
 
     @property
@@ -107,7 +128,7 @@ class TerminalState(SynchronizationListener):
         Returns:
             A local copy of MetaTrader positions opened.
         """
-        return self._combinedState['positions']
+        return self._get_positions_list(self._combinedState)
 
     @property
     def orders(self) -> List[MetatraderOrder]:
@@ -116,7 +137,7 @@ class TerminalState(SynchronizationListener):
         Returns:
             A local copy of MetaTrader orders opened.
         """
-        return self._combinedState['orders']
+        return self._get_orders_list(self._combinedState)
 
     @property
     def specifications(self) -> List[MetatraderSymbolSpecification]:
@@ -149,95 +170,36 @@ class TerminalState(SynchronizationListener):
             instance_number_states,
             key=lambda instance_key: itemgetter('lastSyncUpdateTime')(self._stateByInstanceIndex[instance_key]))
         state = self._get_state(instance_number_states[0])
+        self._refresh_hash_encodings_parameters(state, account_type, hash_fields)
 
-        specifications = copy(list(state['specificationsBySymbol'].values()))
-        for i in range(len(specifications)):
-            specifications[i] = copy(specifications[i])
-        specifications = sorted(specifications, key=lambda s: s['symbol'])
-        specification: dict
-        for specification in specifications:
-            if account_type == 'cloud-g1':
-                for field in hash_fields['g1']['specification']:
-                    if field in specification:
-                        del specification[field]
-                for key in list(specification.keys()):
-                    if isinstance(specification[key], int) and not isinstance(specification[key], bool) and \
-                            key != 'digits':
-                        specification[key] = float(specification[key])
-            elif account_type == 'cloud-g2':
-                for field in hash_fields['g2']['specification']:
-                    if field in specification:
-                        del specification[field]
-
-        specifications_hash = state['specificationsHash'] or self._get_hash(specifications, account_type) if \
-            len(specifications) else None
+        specifications_hash = state['specificationsHash'] or self._get_items_hash(
+            state, 'specifications', sorted(state['specificationsBySymbol'].items()), account_type, hash_fields,
+            'digits') if len(state['specificationsBySymbol']) else None
         state['specificationsHash'] = specifications_hash
 
-        positions = copy(state['positions'])
-        for i in range(len(positions)):
-            positions[i] = copy(positions[i])
-        if account_type == 'cloud-g1':
-            positions = sorted(positions, key=lambda p: int(p['id']))
-        elif account_type == 'cloud-g2':
-            positions = sorted(positions, key=lambda p: p['id'])
-
-        position: dict
-        for position in positions:
-            if account_type == 'cloud-g1':
-                for field in hash_fields['g1']['position']:
-                    if field in position:
-                        del position[field]
-                for key in list(position.keys()):
-                    if isinstance(position[key], int) and not isinstance(position[key], bool) and \
-                            key != 'magic':
-                        position[key] = float(position[key])
-            elif account_type == 'cloud-g2':
-                for field in hash_fields['g2']['position']:
-                    if field in position:
-                        del position[field]
-
-        positions_hash = (state['positionsHash'] or self._get_hash(positions, account_type)) if \
-            state['positionsInitialized'] else None
+        positions_hash = (state['positionsHash'] or self._get_items_hash(
+            state, 'positions', self._sort_items_for_hash(state['positions'], account_type), account_type,
+            hash_fields, 'magic')) if state['positionsInitialized'] else None
         state['positionsHash'] = positions_hash
 
-        orders = copy(state['orders'])
-        for i in range(len(orders)):
-            orders[i] = copy(orders[i])
-        if account_type == 'cloud-g1':
-            orders = sorted(orders, key=lambda p: int(p['id']))
-        elif account_type == 'cloud-g2':
-            orders = sorted(orders, key=lambda p: p['id'])
-
-        order: dict
-        for order in orders:
-            if account_type == 'cloud-g1':
-                for field in hash_fields['g1']['order']:
-                    if field in order:
-                        del order[field]
-                for key in list(order.keys()):
-                    if isinstance(order[key], int) and not isinstance(order[key], bool) and \
-                            key != 'magic':
-                        order[key] = float(order[key])
-            elif account_type == 'cloud-g2':
-                for field in hash_fields['g2']['order']:
-                    if field in order:
-                        del order[field]
-
-        orders_hash = (state['ordersHash'] or self._get_hash(orders, account_type)) if \
-            state['ordersInitialized'] else None
+        orders_hash = (state['ordersHash'] or self._get_items_hash(
+            state, 'orders', self._sort_items_for_hash(state['orders'], account_type), account_type, hash_fields,
+            'magic')) if state['ordersInitialized'] else None
         state['ordersHash'] = orders_hash
 
-        if requested_state != state:
+        if requested_state is not state:
             requested_state['specificationsBySymbol'] = copy(state['specificationsBySymbol'])
             requested_state['specificationsHash'] = specifications_hash
-            requested_state['positions'] = copy(state['positions']) or []
-            for i in range(len(requested_state['positions'])):
-                requested_state['positions'][i] = copy(requested_state['positions'][i])
+            requested_state['positions'] = {position_id: copy(position) for position_id, position in
+                                            state['positions'].items()}
+            self._index_positions(requested_state)
             requested_state['positionsHash'] = positions_hash
-            requested_state['orders'] = copy(state['orders']) or []
-            for i in range(len(requested_state['orders'])):
-                requested_state['orders'][i] = copy(requested_state['orders'][i])
+            requested_state['orders'] = {order_id: copy(order) for order_id, order in state['orders'].items()}
+            self._index_orders(requested_state)
             requested_state['ordersHash'] = orders_hash
+            requested_state['hashEncodingsParameters'] = state['hashEncodingsParameters']
+            requested_state['hashEncodings'] = {kind: copy(encodings) for kind, encodings in
+                                                state['hashEncodings'].items()}
 
         return {
             'specificationsMd5': specifications_hash,
@@ -371,12 +333,14 @@ class TerminalState(SynchronizationListener):
         state['accountInformation'] = None
         state['pricesBySymbol'] = {}
         if positions_updated:
-            state['positions'] = []
+            state['positions'] = {}
+            self._index_positions(state)
             state['removedPositions'] = {}
             state['positionsInitialized'] = False
             state['positionsHash'] = None
         if orders_updated:
-            state['orders'] = []
+            state['orders'] = {}
+            self._index_orders(state)
             state['completedOrders'] = {}
             state['ordersInitialized'] = False
             state['ordersHash'] = None
@@ -385,6 +349,7 @@ class TerminalState(SynchronizationListener):
                                'on synchronization start')
             state['specificationsBySymbol'] = {}
             state['specificationsHash'] = None
+            state['hashEncodings']['specifications'] = {}
         else:
             self._logger.debug(
                 f'{self._accountId}:${instance_index}:${synchronization_id}: no need to clear ' +
@@ -421,7 +386,8 @@ class TerminalState(SynchronizationListener):
         """
         state = self._get_state(instance_index)
         self._refresh_state_update_time(instance_index)
-        state['positions'] = positions
+        state['positions'] = {position['id']: position for position in positions or []}
+        self._index_positions(state)
         state['positionsHash'] = None
 
     async def on_positions_synchronized(self, instance_index: str, synchronization_id: str):
@@ -451,14 +417,13 @@ class TerminalState(SynchronizationListener):
         instance_state['positionsHash'] = None
 
         def update_position(state):
-            is_exists = False
-            for i in range(len(state['positions'])):
-                if state['positions'][i]['id'] == position['id']:
-                    state['positions'][i] = position
-                    is_exists = True
-                    break
-            if (not is_exists) and (position['id'] not in state['removedPositions']):
-                state['positions'].append(position)
+            if position['id'] in state['positions']:
+                self._remove_position_from_index(state, state['positions'][position['id']])
+                state['positions'][position['id']] = position
+                self._add_position_to_index(state, position)
+            elif position['id'] not in state['removedPositions']:
+                state['positions'][position['id']] = position
+                self._add_position_to_index(state, position)
         update_position(instance_state)
         update_position(self._combinedState)
 
@@ -477,7 +442,7 @@ class TerminalState(SynchronizationListener):
         instance_state['positionsHash'] = None
 
         def remove_position(state):
-            position = next((p for p in state['positions'] if p['id'] == position_id), None)
+            position = state['positions'].get(position_id)
             if position is None:
                 for key in list(state['removedPositions'].keys()):
                     e = state['removedPositions'][key]
@@ -485,7 +450,8 @@ class TerminalState(SynchronizationListener):
                         del state['removedPositions'][key]
                 state['removedPositions'][position_id] = datetime.now().timestamp()
             else:
-                state['positions'] = list(filter(lambda p: p['id'] != position_id, state['positions']))
+                del state['positions'][position_id]
+                self._remove_position_from_index(state, position)
         remove_position(instance_state)
         remove_position(self._combinedState)
 
@@ -503,7 +469,8 @@ class TerminalState(SynchronizationListener):
         state = self._get_state(instance_index)
         self._refresh_state_update_time(instance_index)
         state['ordersHash'] = None
-        state['orders'] = orders
+        state['orders'] = {order['id']: order for order in orders or []}
+        self._index_orders(state)
 
     async def on_pending_orders_synchronized(self, instance_index: str, synchronization_id: str):
         """Invoked when pending order synchronization finished to indicate progress of an initial terminal state
@@ -523,13 +490,12 @@ class TerminalState(SynchronizationListener):
         self._combinedState['accountInformation'] = copy(state['accountInformation']) if state['accountInformation'] \
             else None
 
-        self._combinedState['positions'] = state['positions'] or []
-        for i in range(len(self._combinedState['positions'])):
-            self._combinedState['positions'][i] = copy(self._combinedState['positions'][i])
+        self._combinedState['positions'] = {position_id: copy(position) for position_id, position in
+                                            state['positions'].items()}
+        self._index_positions(self._combinedState)
 
-        self._combinedState['orders'] = state['orders'] or []
-        for i in range(len(self._combinedState['orders'])):
-            self._combinedState['orders'][i] = copy(self._combinedState['orders'][i])
+        self._combinedState['orders'] = {order_id: copy(order) for order_id, order in state['orders'].items()}
+        self._index_orders(self._combinedState)
 
         self._combinedState['specificationsBySymbol'] = copy(state['specificationsBySymbol'])
 
@@ -561,14 +527,13 @@ class TerminalState(SynchronizationListener):
         instance_state['ordersHash'] = None
 
         def update_pending_order(state):
-            is_exists = False
-            for i in range(len(state['orders'])):
-                if state['orders'][i]['id'] == order['id']:
-                    state['orders'][i] = order
-                    is_exists = True
-                    break
-            if (not is_exists) and (order['id'] not in state['completedOrders']):
-                state['orders'].append(order)
+            if order['id'] in state['orders']:
+                self._remove_order_from_index(state, state['orders'][order['id']])
+                state['orders'][order['id']] = order
+                self._add_order_to_index(state, order)
+            elif order['id'] not in state['completedOrders']:
+                state['orders'][order['id']] = order
+                self._add_order_to_index(state, order)
 
         update_pending_order(instance_state)
         update_pending_order(self._combinedState)
@@ -588,7 +553,7 @@ class TerminalState(SynchronizationListener):
         instance_state['ordersHash'] = None
 
         def complete_order(state):
-            order = next((p for p in state['orders'] if p['id'] == order_id), None)
+            order = state['orders'].get(order_id)
             if order is None:
                 for key in list(state['completedOrders'].keys()):
                     e = state['completedOrders'][key]
@@ -596,7 +561,8 @@ class TerminalState(SynchronizationListener):
                         del state['completedOrders'][key]
                 state['completedOrders'][order_id] = datetime.now().timestamp()
             else:
-                state['orders'] = list(filter(lambda o: o['id'] != order_id, state['orders']))
+                del state['orders'][order_id]
+                self._remove_order_from_index(state, order)
         complete_order(instance_state)
         complete_order(self._combinedState)
 
@@ -620,9 +586,11 @@ class TerminalState(SynchronizationListener):
         def update_specifications(state):
             for specification in specifications:
                 state['specificationsBySymbol'][specification['symbol']] = specification
+                state['hashEncodings']['specifications'].pop(specification['symbol'], None)
             for symbol in removed_symbols:
                 if symbol in state['specificationsBySymbol']:
                     del state['specificationsBySymbol'][symbol]
+                    state['hashEncodings']['specifications'].pop(symbol, None)
 
         update_specifications(instance_state)
         update_specifications(self._combinedState)
@@ -672,20 +640,10 @@ class TerminalState(SynchronizationListener):
                         state['lastQuoteBrokerTime'] = price['brokerTime']
 
                     state['pricesBySymbol'][price['symbol']] = price
-                    positions = list(filter(lambda p: p['symbol'] == price['symbol'], state['positions']))
-                    other_positions = list(filter(lambda p: p['symbol'] != price['symbol'], state['positions']))
-                    orders = list(filter(lambda o: o['symbol'] == price['symbol'], state['orders']))
-                    prices_initialized = True
-                    for position in other_positions:
-                        if position['symbol'] in state['pricesBySymbol']:
-                            p = state['pricesBySymbol'][position['symbol']]
-                            if 'unrealizedProfit' not in position:
-                                self._update_position_profits(position, p)
-                        else:
-                            prices_initialized = False
-                    for position in positions:
+                    for position in state['positionsBySymbol'].get(price['symbol'], {}).values():
                         self._update_position_profits(position, price)
-                    for order in orders:
+                        self._update_profit_terms(state, position)
+                    for order in state['ordersBySymbol'].get(price['symbol'], {}).values():
                         order['currentPrice'] = price['ask'] if (order['type'] == 'ORDER_TYPE_BUY' or
                                                                  order['type'] == 'ORDER_TYPE_BUY_LIMIT' or
                                                                  order['type'] == 'ORDER_TYPE_BUY_STOP' or
@@ -699,27 +657,22 @@ class TerminalState(SynchronizationListener):
                             if not resolve.done():
                                 resolve.set_result(True)
                         del self._waitForPriceResolves[price['symbol']]
+            if price_updated:
+                prices_initialized = self._initialize_position_profits(state)
             if price_updated and state['accountInformation']:
                 if state['positionsInitialized'] and prices_initialized:
+                    if equity is None and self._checkEquityConsistency:
+                        self._check_profit_totals(state)
+                    # profit totals are kept in cents, so that incremental updates do not accumulate rounding errors
+                    totals = state['profitTotals']
                     if state['accountInformation']['platform'] == 'mt5':
                         state['accountInformation']['equity'] = equity if equity is not None else \
                             state['accountInformation']['balance'] + \
-                            functools.reduce(lambda a, b: a + round((b['unrealizedProfit'] if
-                                                                     'unrealizedProfit' in b and
-                                                                     b['unrealizedProfit'] is not None
-                                                                     else 0) * 100) / 100 +
-                                             round((b['swap'] if 'swap' in b and b['swap'] is not None
-                                                    else 0) * 100) / 100, state['positions'], 0)
+                            (totals['unrealizedProfit'] + totals['swap']) / 100
                     else:
                         state['accountInformation']['equity'] = equity if equity is not None else \
                             state['accountInformation']['balance'] + \
-                            functools.reduce(
-                            lambda a, b: a + round((b['swap'] if 'swap' in b and b['swap'] is not None
-                                                    else 0) * 100) / 100 +
-                            round((b['commission'] if 'commission' in b and b['commission'] is not None
-                                   else 0) * 100) / 100 +
-                            round((b['unrealizedProfit'] if 'unrealizedProfit' in b and b['unrealizedProfit'] is
-                                                            not None else 0) * 100) / 100, state['positions'], 0)
+                            (totals['swap'] + totals['commission'] + totals['unrealizedProfit']) / 100
                     state['accountInformation']['equity'] = round(state['accountInformation']['equity'] * 100) / 100
                 else:
                     state['accountInformation']['equity'] = equity if equity else (
@@ -796,6 +749,105 @@ class TerminalState(SynchronizationListener):
             position['currentPrice'] = new_position_price
             position['currentTickValue'] = current_tick_value
 
+    def _initialize_position_profits(self, state: TerminalStateDict) -> bool:
+        for symbol in list(state['uninitializedProfitSymbols']):
+            if symbol in state['pricesBySymbol']:
+                initialized = True
+                for position in state['positionsBySymbol'].get(symbol, {}).values():
+                    if 'unrealizedProfit' not in position:
+                        self._update_position_profits(position, state['pricesBySymbol'][symbol])
+                        initialized = initialized and 'unrealizedProfit' in position
+                    # the position may be shared with another state which has already initialized its profits
+                    self._update_profit_terms(state, position)
+                if initialized:
+                    state['uninitializedProfitSymbols'].discard(symbol)
+        return all(symbol in state['pricesBySymbol'] for symbol in state['positionsBySymbol'])
+
+    @staticmethod
+    def _get_positions_list(state: TerminalStateDict) -> List[dict]:
+        if state['positionsList'] is None:
+            state['positionsList'] = list(state['positions'].values())
+        return state['positionsList']
+
+    @staticmethod
+    def _get_orders_list(state: TerminalStateDict) -> List[dict]:
+        if state['ordersList'] is None:
+            state['ordersList'] = list(state['orders'].values())
+        return state['ordersList']
+
+    def _index_positions(self, state: TerminalStateDict):
+        state['positionsBySymbol'] = {}
+        state['uninitializedProfitSymbols'] = set()
+        state['positionProfitTerms'] = {}
+        state['profitTotals'] = dict.fromkeys(_profit_fields, 0)
+        state['positionsList'] = None
+        state['hashEncodings']['positions'] = {}
+        for position in state['positions'].values():
+            self._add_position_to_index(state, position)
+
+    def _add_position_to_index(self, state: TerminalStateDict, position: Dict):
+        state['positionsList'] = None
+        state['hashEncodings']['positions'].pop(position['id'], None)
+        state['positionsBySymbol'].setdefault(position.get('symbol'), {})[position['id']] = position
+        if 'unrealizedProfit' not in position:
+            state['uninitializedProfitSymbols'].add(position.get('symbol'))
+        self._update_profit_terms(state, position)
+
+    def _remove_position_from_index(self, state: TerminalStateDict, position: Dict):
+        state['positionsList'] = None
+        state['hashEncodings']['positions'].pop(position['id'], None)
+        self._remove_from_symbol_index(state['positionsBySymbol'], position)
+        terms = state['positionProfitTerms'].pop(position['id'], None)
+        if terms is not None:
+            for field, value in zip(_profit_fields, terms):
+                state['profitTotals'][field] -= value
+
+    def _update_profit_terms(self, state: TerminalStateDict, position: Dict):
+        terms = self._get_profit_terms(position)
+        previous_terms = state['positionProfitTerms'].get(position['id'])
+        if terms != previous_terms:
+            state['positionProfitTerms'][position['id']] = terms
+            for i in range(len(_profit_fields)):
+                state['profitTotals'][_profit_fields[i]] += terms[i] - (previous_terms[i] if previous_terms else 0)
+
+    @staticmethod
+    def _get_profit_terms(position: Dict) -> tuple:
+        return tuple(round((position.get(field) or 0) * 100) for field in _profit_fields)
+
+    def _check_profit_totals(self, state: TerminalStateDict):
+        profit_totals = dict.fromkeys(_profit_fields, 0)
+        for position in state['positions'].values():
+            for field, value in zip(_profit_fields, self._get_profit_terms(position)):
+                profit_totals[field] += value
+        if profit_totals != state['profitTotals']:
+            raise Exception(f'{self._accountId}:{state["instanceIndex"]}: running profit totals '
+                            f'{state["profitTotals"]} do not match recomputed totals {profit_totals}')
+
+    def _index_orders(self, state: TerminalStateDict):
+        state['ordersBySymbol'] = {}
+        state['ordersList'] = None
+        state['hashEncodings']['orders'] = {}
+        for order in state['orders'].values():
+            self._add_order_to_index(state, order)
+
+    def _add_order_to_index(self, state: TerminalStateDict, order: Dict):
+        state['ordersList'] = None
+        state['hashEncodings']['orders'].pop(order['id'], None)
+        state['ordersBySymbol'].setdefault(order.get('symbol'), {})[order['id']] = order
+
+    def _remove_order_from_index(self, state: TerminalStateDict, order: Dict):
+        state['ordersList'] = None
+        state['hashEncodings']['orders'].pop(order['id'], None)
+        self._remove_from_symbol_index(state['ordersBySymbol'], order)
+
+    @staticmethod
+    def _remove_from_symbol_index(items_by_symbol: Dict[str, Dict[str, dict]], item: Dict):
+        items = items_by_symbol.get(item.get('symbol'))
+        if items is not None and item['id'] in items:
+            del items[item['id']]
+            if not len(items):
+                del items_by_symbol[item.get('symbol')]
+
     def _get_state(self, instance_index: str) -> TerminalStateDict:
         if str(instance_index) not in self._stateByInstanceIndex:
             self._logger.debug(f'{self._accountId}:{instance_index}: constructed new state')
@@ -808,8 +860,17 @@ class TerminalState(SynchronizationListener):
             'connected': False,
             'connectedToBroker': False,
             'accountInformation': None,
-            'positions': [],
-            'orders': [],
+            'positions': {},
+            'orders': {},
+            'positionsList': None,
+            'ordersList': None,
+            'positionsBySymbol': {},
+            'ordersBySymbol': {},
+            'uninitializedProfitSymbols': set(),
+            'positionProfitTerms': {},
+            'profitTotals': dict.fromkeys(_profit_fields, 0),
+            'hashEncodingsParameters': None,
+            'hashEncodings': {'specifications': {}, 'positions': {}, 'orders': {}},
             'specificationsBySymbol': {},
             'pricesBySymbol': {},
             'completedOrders': {},
@@ -825,11 +886,56 @@ class TerminalState(SynchronizationListener):
             'lastQuoteBrokerTime': None
         }
 
-    def _get_hash(self, obj, account_type: str):
-        json_item = ''
+    def _refresh_hash_encodings_parameters(self, state: TerminalStateDict, account_type: str, hash_fields: Dict):
+        generation = 'g1' if account_type == 'cloud-g1' else ('g2' if account_type == 'cloud-g2' else None)
+        parameters = (account_type,) + (tuple(tuple(hash_fields[generation][kind]) for kind in
+                                              ['specification', 'position', 'order']) if generation else ())
+        if state['hashEncodingsParameters'] != parameters:
+            state['hashEncodingsParameters'] = parameters
+            state['hashEncodings'] = {'specifications': {}, 'positions': {}, 'orders': {}}
+
+    @staticmethod
+    def _sort_items_for_hash(items_by_id: Dict[str, dict], account_type: str) -> List[tuple]:
         if account_type == 'cloud-g1':
-            json_item = json.dumps(obj, cls=G1Encoder, ensure_ascii=False)
+            return sorted(items_by_id.items(), key=lambda item: int(item[1]['id']))
         elif account_type == 'cloud-g2':
-            json_item = json.dumps(obj, cls=G2Encoder, ensure_ascii=False)
+            return sorted(items_by_id.items(), key=lambda item: item[1]['id'])
+        return list(items_by_id.items())
+
+    def _get_items_hash(self, state: TerminalStateDict, kind: str, items: List[tuple], account_type: str,
+                        hash_fields: Dict, integer_field: str) -> str:
+        encodings = state['hashEncodings'][kind]
+        item_encodings = []
+        if account_type in ['cloud-g1', 'cloud-g2']:
+            for key, item in items:
+                encoding = encodings.get(key)
+                if encoding is None:
+                    encoding = self._encode_hashed_item(item, account_type, hash_fields, kind[:-1], integer_field)
+                    encodings[key] = encoding
+                item_encodings.append(encoding)
+        return self._get_hash(item_encodings, account_type)
+
+    @staticmethod
+    def _encode_hashed_item(item: Dict, account_type: str, hash_fields: Dict, kind: str, integer_field: str) -> str:
+        item = copy(item)
+        if account_type == 'cloud-g1':
+            for field in hash_fields['g1'][kind]:
+                if field in item:
+                    del item[field]
+            for key in list(item.keys()):
+                if isinstance(item[key], int) and not isinstance(item[key], bool) and key != integer_field:
+                    item[key] = float(item[key])
+            return encode_g1(item)
+        else:
+            for field in hash_fields['g2'][kind]:
+                if field in item:
+                    del item[field]
+            return encode_g2(item)
+
+    def _get_hash(self, item_encodings: List[str], account_type: str):
+        json_item = ''
+        # items are encoded separately, so that unchanged items are not encoded again on the next hash request
+        if account_type in ['cloud-g1', 'cloud-g2']:
+            json_item = '[' + ','.join(item_encodings) + ']'
         json_item = json_item.encode('utf8')
         return md5(json_item).hexdigest()
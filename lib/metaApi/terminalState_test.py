@@ -78,6 +78,7 @@ def run_around_tests():
     })
     global state
     state = TerminalState('accountId', client_api_client)
+    state._checkEquityConsistency = True
     yield
 
 
@@ -125,6 +126,22 @@ class TestTerminalState:
         assert len(state.positions) == 1
         assert state.positions == [{'id': '1', 'profit': 11}]
 
+    @pytest.mark.asyncio
+    async def test_cache_positions_and_orders_lists(self):
+        """Should cache positions and orders lists until they are modified."""
+        await state.on_position_updated('vint-hill:1:ps-mpa-1', {'id': '1', 'profit': 10})
+        await state.on_pending_order_updated('vint-hill:1:ps-mpa-1', {'id': '1', 'openPrice': 10})
+        positions = state.positions
+        orders = state.orders
+        assert state.positions is positions
+        assert state.orders is orders
+        await state.on_position_updated('vint-hill:1:ps-mpa-1', {'id': '2', 'profit': 11})
+        await state.on_pending_order_completed('vint-hill:1:ps-mpa-1', '1')
+        assert state.positions == [{'id': '1', 'profit': 10}, {'id': '2', 'profit': 11}]
+        assert state.orders == []
+        await state.on_position_updated('vint-hill:1:ps-mpa-1', {'id': '1', 'profit': 12})
+        assert state.positions == [{'id': '1', 'profit': 12}, {'id': '2', 'profit': 11}]
+
     @pytest.mark.asyncio
     async def test_return_orders(self):
         """Should return orders."""
@@ -232,6 +249,61 @@ class TestTerminalState:
         assert list(map(lambda p: p['currentPrice'], state.positions)) == [10, 10]
         assert state.account_information['equity'] == 1200
 
+    @pytest.mark.asyncio
+    async def test_apply_price_to_positions_of_updated_symbol(self):
+        """Should apply price only to positions of the updated symbol and initialize profits of other positions."""
+        await state.on_symbol_specifications_updated('vint-hill:1:ps-mpa-1', [
+            {'symbol': 'EURUSD', 'tickSize': 0.01, 'digits': 5}, {'symbol': 'AUDUSD', 'tickSize': 0.01, 'digits': 5}],
+                                                     [])
+        await state.on_symbol_prices_updated('vint-hill:1:ps-mpa-1', [{
+            'time': datetime.now(), 'brokerTime': '2022-01-01 02:00:00.000', 'symbol': 'AUDUSD',
+            'profitTickValue': 0.5, 'lossTickValue': 0.5, 'bid': 10, 'ask': 11}])
+        for position_id, symbol in [('1', 'GBPUSD'), ('1', 'EURUSD'), ('2', 'AUDUSD')]:
+            await state.on_position_updated('vint-hill:1:ps-mpa-1', {
+                'id': position_id, 'symbol': symbol, 'type': 'POSITION_TYPE_BUY', 'currentPrice': 9,
+                'currentTickValue': 0.5, 'openPrice': 8, 'profit': 100, 'volume': 2})
+        await state.on_symbol_prices_updated('vint-hill:1:ps-mpa-1', [{
+            'time': datetime.now(), 'brokerTime': '2022-01-01 02:00:00.000', 'symbol': 'EURUSD',
+            'profitTickValue': 0.5, 'lossTickValue': 0.5, 'bid': 10, 'ask': 11}])
+        assert list(map(lambda p: p['profit'], state.positions)) == [200, 200]
+        await state.on_position_removed('vint-hill:1:ps-mpa-1', '2')
+        await state.on_symbol_prices_updated('vint-hill:1:ps-mpa-1', [{
+            'time': datetime.now(), 'brokerTime': '2022-01-01 02:00:00.000', 'symbol': 'AUDUSD',
+            'profitTickValue': 0.5, 'lossTickValue': 0.5, 'bid': 12, 'ask': 13}])
+        assert list(map(lambda p: p['currentPrice'], state.positions)) == [10]
+        assert list(state._combinedState['positionsBySymbol'].keys()) == ['EURUSD']
+
+    @pytest.mark.asyncio
+    async def test_update_equity_incrementally(self):
+        """Should keep equity up to date when positions are added, updated and removed."""
+        await state.on_account_information_updated('vint-hill:1:ps-mpa-1', {'balance': 800, 'platform': 'mt5'})
+        await state.on_symbol_specifications_updated('vint-hill:1:ps-mpa-1', [
+            {'symbol': 'EURUSD', 'tickSize': 0.01, 'digits': 5}, {'symbol': 'AUDUSD', 'tickSize': 0.01, 'digits': 5}],
+                                                     [])
+        await state.on_positions_replaced('vint-hill:1:ps-mpa-1', [
+            {'id': '1', 'symbol': 'EURUSD', 'type': 'POSITION_TYPE_BUY', 'unrealizedProfit': 100.004,
+             'realizedProfit': 0, 'profit': 100, 'swap': 1.5, 'openPrice': 8, 'volume': 2},
+            {'id': '2', 'symbol': 'AUDUSD', 'type': 'POSITION_TYPE_SELL', 'unrealizedProfit': -50,
+             'realizedProfit': 0, 'profit': -50, 'commission': -3, 'openPrice': 8, 'volume': 2}])
+        await state.on_pending_orders_synchronized('vint-hill:1:ps-mpa-1', 'synchronizationId')
+
+        async def update_prices(symbol, bid):
+            await state.on_symbol_prices_updated('vint-hill:1:ps-mpa-1', [{
+                'time': datetime.now(), 'brokerTime': '2022-01-01 02:00:00.000', 'symbol': symbol,
+                'profitTickValue': 0.5, 'lossTickValue': 0.5, 'bid': bid, 'ask': bid}])
+
+        await update_prices('EURUSD', 9)
+        await update_prices('AUDUSD', 9)
+        assert state.account_information['equity'] == 800 + 100 + 1.5 - 100
+        await state.on_position_updated('vint-hill:1:ps-mpa-1', {
+            'id': '1', 'symbol': 'EURUSD', 'type': 'POSITION_TYPE_BUY', 'unrealizedProfit': 100, 'realizedProfit': 0,
+            'profit': 100, 'swap': 2.5, 'openPrice': 8, 'volume': 2})
+        await update_prices('EURUSD', 10)
+        assert state.account_information['equity'] == 800 + 200 + 2.5 - 100
+        await state.on_position_removed('vint-hill:1:ps-mpa-1', '2')
+        await update_prices('EURUSD', 10.5)
+        assert state.account_information['equity'] == 800 + 250 + 2.5
+
     @pytest.mark.asyncio
     async def test_update_margin_fields(self):
         """Should update margin fields on price update."""
@@ -474,6 +546,36 @@ class TestTerminalState:
         assert hashes['positionsMd5'] == positions_hash
         assert hashes['ordersMd5'] == orders_hash
 
+    @pytest.mark.asyncio
+    async def test_encode_only_changed_items_for_hash(self):
+        """Should encode only changed items when calculating hashes."""
+        encode_mock = MagicMock(side_effect=state._encode_hashed_item)
+        state._encode_hashed_item = encode_mock
+        await state.on_positions_replaced('vint-hill:1:ps-mpa-1', [
+            {'id': '2', 'type': 'POSITION_TYPE_BUY', 'symbol': 'EURUSD', 'magic': 1000, 'openPrice': 1.1},
+            {'id': '10', 'type': 'POSITION_TYPE_SELL', 'symbol': 'GBPUSD', 'magic': 1000, 'openPrice': 1.3}])
+        await state.on_positions_synchronized('vint-hill:1:ps-mpa-1', 'synchronizationId')
+        await state.get_hashes('cloud-g1', 'vint-hill:1:ps-mpa-1')
+        assert encode_mock.call_count == 2
+        await state.on_position_updated('vint-hill:1:ps-mpa-1', {
+            'id': '10', 'type': 'POSITION_TYPE_SELL', 'symbol': 'GBPUSD', 'magic': 1000, 'openPrice': 1.2})
+        hashes = await state.get_hashes('cloud-g1', 'vint-hill:1:ps-mpa-1')
+        assert encode_mock.call_count == 3
+        assert hashes['positionsMd5'] == md5(
+            ('[{"id":"2","type":"POSITION_TYPE_BUY","symbol":"EURUSD","magic":1000,"openPrice":1.10000000},'
+             '{"id":"10","type":"POSITION_TYPE_SELL","symbol":"GBPUSD","magic":1000,"openPrice":1.20000000}]'
+             ).encode()).hexdigest()
+        await state.on_synchronization_started('vint-hill:1:ps-mpa-2', False, False, False)
+        assert (await state.get_hashes('cloud-g1', 'vint-hill:1:ps-mpa-2'))['positionsMd5'] == \
+            hashes['positionsMd5']
+        assert encode_mock.call_count == 3
+        assert state._stateByInstanceIndex['vint-hill:1:ps-mpa-2']['hashEncodings'] == \
+            state._stateByInstanceIndex['vint-hill:1:ps-mpa-1']['hashEncodings']
+        await state.on_position_updated('vint-hill:1:ps-mpa-1', {
+            'id': '2', 'type': 'POSITION_TYPE_BUY', 'symbol': 'EURUSD', 'magic': 1000, 'openPrice': 1.2})
+        await state.get_hashes('cloud-g2', 'vint-hill:1:ps-mpa-1')
+        assert encode_mock.call_count == 5
+
     @pytest.mark.asyncio
     async def test_cache_specifications_hash(self):
         """Should cache specifications hash."""